@@ -4,10 +4,12 @@ import random
 import pandas as pd
 import requests
 
+from dataset import DATASET_SIZES
+
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Generate A/B traffic.")
-    parser.add_argument("--dataset", default="100k", choices=["100k", "1m"])
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
     parser.add_argument("--samples", type=int, default=50)
     parser.add_argument("--api-base", default="http://127.0.0.1:8000")
     args = parser.parse_args()
@@ -0,0 +1,371 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.candidates import Candidates  # noqa: E402
+from src.features import USER_SCHEMA, FeatureEncoder  # noqa: E402
+from src.model.utils.evaluation import batched_embeddings, blocked_top_k  # noqa: E402
+from dataset import DATASET_SIZES  # noqa: E402
+from evaluate import load_signature_fn  # noqa: E402
+
+try:
+    import faiss  # type: ignore
+    _has_faiss = True
+except Exception:
+    _has_faiss = False
+
+try:
+    import scann  # type: ignore
+    _has_scann = True
+except Exception:
+    _has_scann = False
+
+# A built index, as (search(queries, k, search params) -> indices, size in bytes).
+# Search-time settings (nprobe, efSearch, leaves searched) are applied per call,
+# so that one index is built for every value of them.
+Built = Tuple[Callable[[np.ndarray, int, Dict[str, Any]], np.ndarray], int]
+
+
+# ---------------- Index builders ----------------
+
+def _faiss_size(index: Any) -> int:
+    return int(faiss.serialize_index(index).nbytes)
+
+
+def _build_brute(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    return (lambda queries, k, params: blocked_top_k(queries, vectors, k)), int(vectors.nbytes)
+
+
+def _build_flat(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors)
+    return (lambda queries, k, params: index.search(queries, k)[1]), _faiss_size(index)
+
+
+def _ivf_search(index: Any) -> Callable[[np.ndarray, int, Dict[str, Any]], np.ndarray]:
+    def search(queries: np.ndarray, k: int, params: Dict[str, Any]) -> np.ndarray:
+        index.nprobe = params["nprobe"]
+        return index.search(queries, k)[1]
+
+    return search
+
+
+def _build_ivf_flat(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    dim = vectors.shape[1]
+    index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, params["nlist"], faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    return _ivf_search(index), _faiss_size(index)
+
+
+def _build_ivf_pq(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    dim = vectors.shape[1]
+    index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, params["nlist"], params["m"], 8, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    return _ivf_search(index), _faiss_size(index)
+
+
+def _build_hnsw(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    index = faiss.IndexHNSWFlat(vectors.shape[1], params["M"], faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = params["efConstruction"]
+    index.add(vectors)
+
+    def search(queries: np.ndarray, k: int, search_params: Dict[str, Any]) -> np.ndarray:
+        index.hnsw.efSearch = search_params["efSearch"]
+        return index.search(queries, k)[1]
+
+    return search, _faiss_size(index)
+
+
+def _build_scann(vectors: np.ndarray, params: Dict[str, Any]) -> Built:
+    searcher = (
+        scann.scann_ops_pybind.builder(vectors, 10, "dot_product")
+        .tree(
+            num_leaves=params["num_leaves"],
+            num_leaves_to_search=params["num_leaves"],
+            training_sample_size=len(vectors),
+        )
+        .score_ah(2, anisotropic_quantization_threshold=0.2)
+        .reorder(100)
+        .build()
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        searcher.serialize(tmp)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+
+    def search(queries: np.ndarray, k: int, search_params: Dict[str, Any]) -> np.ndarray:
+        return searcher.search_batched(
+            queries,
+            final_num_neighbors=k,
+            leaves_to_search=search_params["leaves_to_search"],
+        )[0]
+
+    return search, size
+
+
+def _configurations(
+    args: argparse.Namespace,
+    n_items: int,
+    dim: int,
+) -> Iterator[Tuple[str, Dict[str, Any], List[Dict[str, Any]]]]:
+    """Yield every (backend, build params, search params to sweep) of the sweep that is valid for the data."""
+    yield "brute", {}, [{}]
+
+    if _has_faiss:
+        yield "faiss_flat", {}, [{}]
+        for nlist in args.nlist:
+            if nlist > n_items:
+                continue
+            searches = [{"nprobe": nprobe} for nprobe in args.nprobe if nprobe <= nlist]
+            if not searches:
+                continue
+            yield "faiss_ivf_flat", {"nlist": nlist}, searches
+            for m in args.pq_m:
+                if dim % m == 0 and n_items >= 256:
+                    yield "faiss_ivf_pq", {"nlist": nlist, "m": m}, searches
+        for M in args.hnsw_m:
+            yield "faiss_hnsw", {"M": M, "efConstruction": args.ef_construction}, [
+                {"efSearch": ef_search} for ef_search in args.ef_search
+            ]
+    else:
+        print("FAISS not available; skipping FAISS backends.")
+
+    if _has_scann:
+        for num_leaves in args.scann_leaves:
+            if num_leaves > n_items:
+                continue
+            searches = [
+                {"leaves_to_search": leaves_to_search}
+                for leaves_to_search in args.scann_leaves_to_search if leaves_to_search <= num_leaves
+            ]
+            if searches:
+                yield "scann", {"num_leaves": num_leaves}, searches
+    else:
+        print("ScaNN not available; skipping ScaNN backend.")
+
+
+BUILDERS: Dict[str, Callable[[np.ndarray, Dict[str, Any]], Built]] = {
+    "brute": _build_brute,
+    "faiss_flat": _build_flat,
+    "faiss_ivf_flat": _build_ivf_flat,
+    "faiss_ivf_pq": _build_ivf_pq,
+    "faiss_hnsw": _build_hnsw,
+    "scann": _build_scann,
+}
+
+
+# ---------------- Measurement ----------------
+
+def _recall(approximate: np.ndarray, exact: np.ndarray) -> float:
+    k = exact.shape[1]
+    hits = (approximate[:, :, None] == exact[:, None, :]).any(axis=2)
+    return float(hits.sum() / (len(exact) * k))
+
+
+def _benchmark_search(
+    search: Callable[[np.ndarray, int, Dict[str, Any]], np.ndarray],
+    params: Dict[str, Any],
+    queries: np.ndarray,
+    exact: np.ndarray,
+    k: int,
+    single_queries: int,
+) -> Dict[str, Any]:
+    # Single-query latency, the way `infer.retrieve` searches.
+    latencies: List[float] = []
+    for query in queries[:single_queries]:
+        t0 = time.perf_counter()
+        search(query[None, :], k, params)
+        latencies.append(time.perf_counter() - t0)
+    latencies_ms = np.array(latencies) * 1_000
+
+    # One batched call over the whole query sample.
+    t0 = time.perf_counter()
+    approximate = np.asarray(search(queries, k, params))
+    batch_seconds = time.perf_counter() - t0
+
+    return {
+        f"recall@{k}": _recall(approximate, exact),
+        "single_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "single_p99_ms": float(np.percentile(latencies_ms, 99)),
+        "batch_qps": len(queries) / batch_seconds,
+    }
+
+
+def _pareto(results: List[Dict[str, Any]], k: int) -> None:
+    """Flag the configurations not beaten on both recall and single-query latency."""
+    for result in results:
+        result["pareto"] = not any(
+            other[f"recall@{k}"] >= result[f"recall@{k}"]
+            and other["single_p50_ms"] < result["single_p50_ms"]
+            for other in results
+            if other is not result
+        )
+
+
+def _load_queries(args: argparse.Namespace) -> np.ndarray:
+    if args.queries:
+        return np.load(args.queries).astype(np.float32)
+
+    users = pd.read_parquet(f"data/raw/{args.dataset}-users.parquet")
+    users = users.sample(n=min(args.num_queries, len(users)), random_state=args.seed)
+    return batched_embeddings(load_signature_fn(args.query_tower), FeatureEncoder(USER_SCHEMA).encode_frame(users))
+
+
+def _format_params(params: Dict[str, Any]) -> str:
+    return ", ".join(f"{name}={value}" for name, value in params.items()) or "-"
+
+
+def _write_report(path: str, builds: List[Dict[str, Any]], results: List[Dict[str, Any]], k: int) -> None:
+    lines = [
+        "| backend | build params | build s | index MB |",
+        "|---|---|---|---|",
+    ]
+    for b in builds:
+        lines.append(
+            f"| {b['backend']} | {_format_params(b['params'])} | {b['build_seconds']:.2f} | "
+            f"{b['index_bytes'] / 2**20:.2f} |"
+        )
+    lines += [
+        "",
+        f"| backend | build params | search params | recall@{k} | p50 ms | p99 ms | batch QPS | pareto |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for r in sorted(results, key=lambda r: (r["backend"], -r[f"recall@{k}"])):
+        lines.append(
+            f"| {r['backend']} | {_format_params(builds[r['build']]['params'])} | {_format_params(r['params'])} | "
+            f"{r[f'recall@{k}']:.4f} | {r['single_p50_ms']:.3f} | {r['single_p99_ms']:.3f} | "
+            f"{r['batch_qps']:.0f} | {'*' if r['pareto'] else ''} |"
+        )
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _run_name(backend: str, *params: Dict[str, Any]) -> str:
+    return backend + "".join(f"_{key}{value}" for p in params for key, value in p.items())
+
+
+def _log_mlflow(
+    experiment: str,
+    builds: List[Dict[str, Any]],
+    results: List[Dict[str, Any]],
+    config: Dict[str, Any],
+    artifacts: List[str],
+) -> None:
+    import mlflow
+
+    mlflow.set_experiment(experiment)
+    with mlflow.start_run(run_name="ann_sweep"):
+        mlflow.log_params(config)
+        # One run per built index, with a nested run per search setting.
+        for i, build in enumerate(builds):
+            with mlflow.start_run(run_name=_run_name(build["backend"], build["params"]), nested=True):
+                mlflow.log_params({"backend": build["backend"], **build["params"]})
+                mlflow.log_metrics({"build_seconds": build["build_seconds"], "index_bytes": float(build["index_bytes"])})
+                for result in (result for result in results if result["build"] == i):
+                    with mlflow.start_run(run_name=_run_name(build["backend"], build["params"], result["params"]), nested=True):
+                        mlflow.log_params({"backend": build["backend"], **build["params"], **result["params"]})
+                        mlflow.log_metrics({
+                            key: float(value) for key, value in result.items()
+                            if isinstance(value, (int, float, bool)) and key != "build"
+                        })
+        for path in artifacts:
+            mlflow.log_artifact(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall-vs-latency sweep of the ANN retrieval backends.")
+    parser.add_argument("--candidates", default="checkpoints/retrieval/candidates", help="Candidate artifact directory.")
+    parser.add_argument("--queries", default=None, help="Query embeddings (.npy). Defaults to query tower outputs.")
+    parser.add_argument("--query-tower", default="checkpoints/retrieval/query_tower")
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
+    parser.add_argument("--num-queries", type=int, default=1_000)
+    parser.add_argument("--single-queries", type=int, default=200, help="Queries timed one at a time.")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--no-normalize", action="store_true", help="Use raw inner product instead of cosine.")
+    parser.add_argument("--nlist", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--hnsw-m", type=int, nargs="+", default=[16, 32])
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--scann-leaves", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--scann-leaves-to-search", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--threads", type=int, default=None, help="FAISS OpenMP threads.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="ann_benchmark.json")
+    parser.add_argument("--report", default="ann_benchmark.md")
+    parser.add_argument("--mlflow-experiment", default="ann_benchmark")
+    parser.add_argument("--no-mlflow", action="store_true")
+    args = parser.parse_args()
+
+    if _has_faiss and args.threads:
+        faiss.omp_set_num_threads(args.threads)
+
+    vectors = np.array(Candidates(args.candidates).embeddings, dtype=np.float32)
+    queries = np.ascontiguousarray(_load_queries(args), dtype=np.float32)
+    if not args.no_normalize:
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+
+    k = min(args.k, len(vectors))
+    exact = blocked_top_k(queries, vectors, k)
+    print(f"{len(vectors)} candidates x {len(queries)} queries, dim={vectors.shape[1]}, k={k}")
+
+    # Every index is built once per build-time setting; the search-time
+    # settings are then swept on it.
+    builds: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    for backend, build_params, searches in _configurations(args, len(vectors), vectors.shape[1]):
+        try:
+            start = time.perf_counter()
+            search, size = BUILDERS[backend](vectors, build_params)
+            build_seconds = time.perf_counter() - start
+        except Exception as exc:
+            print(f"{backend} {build_params}: build failed ({exc})")
+            continue
+        builds.append({"backend": backend, "params": build_params, "build_seconds": build_seconds, "index_bytes": size})
+        print(f"{backend:<16} {json.dumps(build_params):<40} built in {build_seconds:.2f}s, {size / 2**20:.2f} MB")
+
+        for search_params in searches:
+            try:
+                result = _benchmark_search(search, search_params, queries, exact, k, args.single_queries)
+            except Exception as exc:
+                print(f"{backend} {build_params} {search_params}: failed ({exc})")
+                continue
+            results.append({"backend": backend, "build": len(builds) - 1, "params": search_params, **result})
+            print(
+                f"{'':<16} {json.dumps(search_params):<40} recall@{k}={result[f'recall@{k}']:.4f} "
+                f"p50={result['single_p50_ms']:.3f}ms qps={result['batch_qps']:.0f}"
+            )
+
+    _pareto(results, k)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"builds": builds, "results": results}, f, indent=2)
+    _write_report(args.report, builds, results, k)
+    print(f"Report written to {args.report}")
+
+    if not args.no_mlflow:
+        config = {
+            "candidates": len(vectors),
+            "queries": len(queries),
+            "dim": vectors.shape[1],
+            "k": k,
+            "normalized": not args.no_normalize,
+        }
+        _log_mlflow(args.mlflow_experiment, builds, results, config, [args.output, args.report])
+
+
+if __name__ == "__main__":
+    main()
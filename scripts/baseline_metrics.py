@@ -1,4 +1,6 @@
 import argparse
+import os
+import sys
 import time
 from typing import Dict, Any, List, Tuple
 
@@ -7,6 +9,12 @@ import pandas as pd
 import requests
 import tensorflow as tf
 
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.features import MOVIE_SCHEMA, USER_SCHEMA, FeatureEncoder  # noqa: E402
+from dataset import DATASET_SIZES  # noqa: E402
+
 
 def _load_users(path: str) -> pd.DataFrame:
     users = pd.read_parquet(path)
@@ -27,54 +35,10 @@ def _load_movies(path: str) -> pd.DataFrame:
     return movies
 
 
-def _to_user_tensors(user: Dict[str, Any]) -> Dict[str, tf.Tensor]:
-    return {k: tf.convert_to_tensor([v]) for k, v in user.items()}
-
-def _to_jsonable(value: Any) -> Any:
-    if isinstance(value, (np.generic,)):
-        return value.item()
-    if isinstance(value, np.ndarray):
-        return value.tolist()
-    return value
-
-def _jsonify_dict(data: Dict[str, Any]) -> Dict[str, Any]:
-    return {k: _to_jsonable(v) for k, v in data.items()}
-
-def _filter_user_fields(user: Dict[str, Any]) -> Dict[str, Any]:
-    allowed = {
-        "user_id",
-        "user_gender",
-        "user_zip_code",
-        "user_bucketized_age",
-        "user_occupation_label",
-    }
-    filtered = {k: v for k, v in user.items() if k in allowed}
-    if "user_id" in filtered:
-        filtered["user_id"] = str(filtered["user_id"])
-    if "user_zip_code" in filtered:
-        filtered["user_zip_code"] = str(filtered["user_zip_code"])
-    if "user_gender" in filtered:
-        filtered["user_gender"] = int(filtered["user_gender"])
-    if "user_bucketized_age" in filtered:
-        filtered["user_bucketized_age"] = float(filtered["user_bucketized_age"])
-    if "user_occupation_label" in filtered:
-        filtered["user_occupation_label"] = int(filtered["user_occupation_label"])
-    return filtered
-
-def _filter_movie_fields(movie: Dict[str, Any]) -> Dict[str, Any]:
-    allowed = {
-        "movie_id",
-        "movie_title",
-        "movie_release_year",
-    }
-    filtered = {k: v for k, v in movie.items() if k in allowed}
-    if "movie_id" in filtered:
-        filtered["movie_id"] = str(filtered["movie_id"])
-    if "movie_title" in filtered:
-        filtered["movie_title"] = str(filtered["movie_title"])
-    if "movie_release_year" in filtered:
-        filtered["movie_release_year"] = str(filtered["movie_release_year"])
-    return filtered
+def _records(df: pd.DataFrame, schema: Dict[str, Any]) -> Dict[Any, Dict[str, Any]]:
+    """JSON-ready features of every row, typed by the schema, by index value."""
+    encoder = FeatureEncoder(schema)
+    return dict(zip(df.index, encoder.to_records(encoder.encode_frame(df))))
 
 
 def _retrieval_hit_rate(
@@ -84,6 +48,8 @@ def _retrieval_hit_rate(
     top_k: int,
 ) -> float:
     model = tf.saved_model.load(brute_model_path)
+    encoder = FeatureEncoder.for_signature(USER_SCHEMA, model.signatures["call"])
+    user_records = _records(users, USER_SCHEMA)
     hits = 0
     total = 0
 
@@ -93,8 +59,7 @@ def _retrieval_hit_rate(
         if user_id not in users.index:
             continue
 
-        user = _filter_user_fields(_jsonify_dict(users.loc[user_id].to_dict()))
-        user_tensors = _to_user_tensors(user)
+        user_tensors = {k: tf.convert_to_tensor(v) for k, v in encoder.encode([user_records[user_id]]).items()}
         result = model.signatures["call"](**user_tensors, k=top_k)
         retrieved = result["output_0"].numpy().tolist()[0]
         if str(movie_id) in [str(x) for x in retrieved]:
@@ -122,13 +87,15 @@ def _api_latency(
 ) -> Dict[str, Dict[str, float]]:
     retrieval_times = []
     ranking_times = []
+    user_records = _records(users, USER_SCHEMA)
+    movie_records = _records(movies, MOVIE_SCHEMA)
 
     for _, row in ratings.iterrows():
         user_id = row["user_id"]
         if user_id not in users.index:
             continue
 
-        user = _jsonify_dict(users.loc[user_id].to_dict())
+        user = user_records[user_id]
 
         start = time.perf_counter()
         response = requests.get(
@@ -136,6 +103,7 @@ def _api_latency(
             params={"approximate": False, "top_k": top_k},
             json=user,
             timeout=30,
+            headers={"X-Request-Timeout": "30"},
         )
         response.raise_for_status()
         retrieval_times.append(time.perf_counter() - start)
@@ -144,14 +112,15 @@ def _api_latency(
         movie_list = []
         for movie_id in movie_ids:
             movie_id = str(movie_id)
-            if movie_id in movies.index:
-                movie_list.append(_filter_movie_fields(_jsonify_dict(movies.loc[movie_id].to_dict())))
+            if movie_id in movie_records:
+                movie_list.append(movie_records[movie_id])
 
         start = time.perf_counter()
         response = requests.get(
             url=f"{api_base}/api/v1/ranking",
             json={"movies": movie_list, "user": user},
             timeout=30,
+            headers={"X-Request-Timeout": "30"},
         )
         response.raise_for_status()
         ranking_times.append(time.perf_counter() - start)
@@ -167,7 +136,7 @@ def _api_latency(
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Compute baseline metrics.")
-    parser.add_argument("--dataset", default="100k", choices=["100k", "1m"])
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
     parser.add_argument("--sample-size", type=int, default=200)
     parser.add_argument("--seed", type=int, default=42)
     parser.add_argument("--top-k", type=int, default=10)
@@ -0,0 +1,497 @@
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+import tensorflow as tf  # noqa: E402
+import tensorflow_recommenders as tfrs  # noqa: E402
+
+from src.model.tower import Tower  # noqa: E402
+from src.model.embedding import Embedding  # noqa: E402
+from src.model.ranking import PointwiseRanking  # noqa: E402
+from src.model.export import (  # noqa: E402
+    QueryTowerExport,
+    RankingExport,
+    TopKExport,
+    feature_signature,
+)
+from src.model.utils.feature_store import MOVIE_FEATURES, USER_FEATURES  # noqa: E402
+from src.candidates import Candidates, write_candidates  # noqa: E402
+
+DEFAULT_BASELINE: str = os.path.join(ROOT, "benchmarks", "baseline.json")
+SLATE_SIZES: Tuple[int, ...] = (1, 10, 100)
+BATCH_SIZES: Tuple[int, ...] = (1, 256)
+
+# The title embedding is precomputed before export and looked up by movie id.
+CANDIDATE_SIGNATURE = feature_signature(MOVIE_FEATURES, exclude=['movie_title'])
+
+
+# ---------------- Synthetic data and models ----------------
+
+def _synthetic_data(
+    n_users: int,
+    n_movies: int,
+    seed: int,
+) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+    rng = np.random.default_rng(seed)
+    words = np.array(["the", "last", "night", "love", "story", "return", "city", "dark", "blue", "king"])
+
+    users = {
+        'user_id':               np.array([str(i) for i in range(n_users)]),
+        'user_gender':           rng.integers(0, 2, n_users).astype(np.int32),
+        'user_zip_code':         np.array([f"{z:05d}" for z in rng.integers(0, 1_000, n_users)]),
+        'user_bucketized_age':   rng.choice([1.0, 18.0, 25.0, 35.0, 45.0, 50.0, 56.0], n_users).astype(np.float32),
+        'user_occupation_label': rng.integers(0, 22, n_users).astype(np.int32),
+    }
+    movies = {
+        'movie_id':              np.array([str(i) for i in range(n_movies)]),
+        'movie_title':           np.array([" ".join(rng.choice(words, 3)) for _ in range(n_movies)]),
+        'movie_release_year':    np.array([str(y) for y in rng.integers(1950, 2000, n_movies)]),
+    }
+    return users, movies
+
+
+def _build_models(
+    users: Dict[str, np.ndarray],
+    movies: Dict[str, np.ndarray],
+    embedding_dim: int,
+) -> Dict[str, Any]:
+    users_dataset  = tf.data.Dataset.from_tensor_slices(users)
+    movies_dataset = tf.data.Dataset.from_tensor_slices(movies)
+
+    user_embedding_model = Embedding(
+        dataset             = users_dataset.batch(1_000),
+        str_features        = ['user_id', 'user_zip_code'],
+        int_features        = ['user_gender', 'user_bucketized_age', 'user_occupation_label'],
+        embedding_dim       = embedding_dim,
+    )
+    # Same features through one shared table (`FusedEmbedding`).
+    fused_user_embedding_model = Embedding(
+        dataset             = users_dataset.batch(1_000),
+        str_features        = ['user_id', 'user_zip_code'],
+        int_features        = ['user_gender', 'user_bucketized_age', 'user_occupation_label'],
+        embedding_dim       = embedding_dim,
+        fused               = True,
+    )
+    movie_embedding_model = Embedding(
+        dataset             = movies_dataset.batch(1_000),
+        str_features        = ['movie_release_year'],
+        text_features       = ['movie_title'],
+        embedding_dim       = embedding_dim,
+    )
+
+    query_tower = Tower(
+        embedding_model             = user_embedding_model,
+        cross_layer_projection_dim  = user_embedding_model.embeddings_output_dim // 2,
+        dense_layers                = [32],
+    )
+    candidate_tower = Tower(
+        embedding_model             = movie_embedding_model,
+        cross_layer_projection_dim  = movie_embedding_model.embeddings_output_dim // 2,
+        dense_layers                = [32],
+    )
+    ranking_model = PointwiseRanking(
+        query_tower     = query_tower,
+        candidate_tower = candidate_tower,
+        task            = tfrs.tasks.Ranking(loss=tf.keras.losses.MeanSquaredError()),
+    )
+
+    return {
+        "user_embedding": user_embedding_model,
+        "user_embedding_fused": fused_user_embedding_model,
+        "movie_embedding": movie_embedding_model,
+        "query_tower": query_tower,
+        "candidate_tower": candidate_tower,
+        "ranking": ranking_model,
+        "movies_dataset": movies_dataset,
+    }
+
+
+def _export_artifacts(models: Dict[str, Any], export_dir: str, k: int) -> Dict[str, str]:
+    """
+        Export the synthetic models the same way the training notebooks do and
+        return the environment variables `infer.py` expects.
+    """
+    movies_dataset = models["movies_dataset"]
+    candidates = tf.data.Dataset.zip(
+        (
+            movies_dataset.map(lambda movie: movie['movie_id']).batch(100),
+            movies_dataset.batch(100).map(models["candidate_tower"]),
+        )
+    )
+    paths = {
+        "BRUTE_PATH": os.path.join(export_dir, "retrieval/brute"),
+        "SCANN_PATH": os.path.join(export_dir, "retrieval/scann"),
+        "RANKING_PATH": os.path.join(export_dir, "ranking/pointwise"),
+        "RANKING_XLA_PATH": os.path.join(export_dir, "ranking/pointwise_xla"),
+        "QUERY_TOWER_PATH": os.path.join(export_dir, "retrieval/query_tower"),
+        "CANDIDATE_TOWER_PATH": os.path.join(export_dir, "retrieval/candidate_tower"),
+        "FAISS_INDEX_PATH": os.path.join(export_dir, "retrieval/faiss/index.ivf"),
+        "CANDIDATES_PATH": os.path.join(export_dir, "retrieval/candidates"),
+    }
+
+    brute_layer = tfrs.layers.factorized_top_k.BruteForce(models["query_tower"], k=k)
+    brute_layer.index_from_dataset(candidates)
+    brute = TopKExport(brute_layer)
+    tf.saved_model.save(brute, paths["BRUTE_PATH"], signatures={'call': brute.call})
+
+    try:
+        scann_layer = tfrs.layers.factorized_top_k.ScaNN(models["query_tower"], k=k)
+        scann_layer.index_from_dataset(candidates)
+        scann = TopKExport(scann_layer)
+        tf.saved_model.save(
+            scann,
+            paths["SCANN_PATH"],
+            signatures={'call': scann.call},
+            options=tf.saved_model.SaveOptions(namespace_whitelist=["Scann"]),
+        )
+    except Exception as exc:
+        print(f"ScaNN not available ({exc}); skipping ScaNN benchmarks.")
+
+    # Exported before the titles are precomputed: it embeds movies added to the catalog.
+    candidate_tower = QueryTowerExport(models["candidate_tower"], feature_signature(MOVIE_FEATURES))
+    tf.saved_model.save(candidate_tower, paths["CANDIDATE_TOWER_PATH"], signatures={'call': candidate_tower.call})
+
+    models["movie_embedding"].precompute_text_features(movies_dataset, key_feature='movie_id')
+    ranking = RankingExport(models["ranking"], candidate_signature=CANDIDATE_SIGNATURE)
+    tf.saved_model.save(ranking, paths["RANKING_PATH"], signatures={'call': ranking.call})
+    ranking_xla = RankingExport(models["ranking"], candidate_signature=CANDIDATE_SIGNATURE, jit_compile=True)
+    tf.saved_model.save(ranking_xla, paths["RANKING_XLA_PATH"], signatures={'call': ranking_xla.call})
+
+    query_tower = QueryTowerExport(models["query_tower"])
+    tf.saved_model.save(query_tower, paths["QUERY_TOWER_PATH"], signatures={'call': query_tower.call})
+
+    movie_ids: List[bytes] = []
+    vectors_list: List[np.ndarray] = []
+    for ids, emb in candidates:
+        movie_ids.extend(ids.numpy().tolist())
+        vectors_list.append(emb.numpy())
+    write_candidates(paths["CANDIDATES_PATH"], movie_ids, np.vstack(vectors_list))
+
+    try:
+        import faiss  # type: ignore
+    except Exception as exc:
+        print(f"FAISS not available ({exc}); skipping FAISS benchmarks.")
+        return paths
+
+    vectors = np.array(Candidates(paths["CANDIDATES_PATH"]).embeddings)
+    faiss.normalize_L2(vectors)
+
+    nlist = min(100, max(10, int(len(movie_ids) ** 0.5)))
+    index = faiss.IndexIVFFlat(faiss.IndexFlatIP(vectors.shape[1]), vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+
+    os.makedirs(os.path.dirname(paths["FAISS_INDEX_PATH"]), exist_ok=True)
+    faiss.write_index(index, paths["FAISS_INDEX_PATH"])
+
+    return paths
+
+
+class _NullCursor:
+    """Cursor that builds the statement like psycopg2 would but never sends it."""
+
+    class _Connection:
+        encoding = "UTF8"
+
+    connection = _Connection()
+
+    def __init__(self):
+        self.statements = 0
+
+    def __enter__(self) -> '_NullCursor':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def mogrify(self, template: bytes, args: Tuple[Any, ...]) -> bytes:
+        return template % tuple(repr(a).encode("utf-8") for a in args)
+
+    def execute(self, statement: bytes) -> None:
+        self.statements += 1
+
+
+class _NullConnection:
+
+    def __init__(self):
+        self._cursor = _NullCursor()
+
+    def cursor(self) -> _NullCursor:
+        return self._cursor
+
+    def commit(self) -> None:
+        return None
+
+    def close(self) -> None:
+        return None
+
+
+# ---------------- Timing ----------------
+
+def _measure(
+    fn: Callable[[], Any],
+    min_time: float,
+    warmup: int = 3,
+    min_iterations: int = 5,
+    max_iterations: int = 100_000,
+) -> Dict[str, float]:
+    """
+        Time a callable repeatedly until `min_time` seconds have elapsed.
+
+        Returns:
+            - (Dict[str, float]): Iteration count and latency statistics in microseconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    times: List[float] = []
+    started = time.perf_counter()
+    while len(times) < max_iterations and (
+        len(times) < min_iterations or time.perf_counter() - started < min_time
+    ):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    values = np.array(times) * 1e6
+    return {
+        "iterations": len(values),
+        "median_us": float(np.median(values)),
+        "p95_us": float(np.percentile(values, 95)),
+        "mean_us": float(values.mean()),
+        "min_us": float(values.min()),
+    }
+
+
+@contextlib.contextmanager
+def _patched(module: Any, **attrs: Any) -> Iterator[None]:
+    original = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(module, name, value)
+
+
+def _batch(features: Dict[str, np.ndarray], size: int) -> Dict[str, tf.Tensor]:
+    return {k: tf.convert_to_tensor(v[:size]) for k, v in features.items()}
+
+
+def _row(features: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    return {k: v[i].item() for k, v in features.items()}
+
+
+def _collect_benchmarks(
+    models: Dict[str, Any],
+    users: Dict[str, np.ndarray],
+    movies: Dict[str, np.ndarray],
+    k: int,
+) -> Dict[str, Callable[[], Any]]:
+    import infer
+    import db
+
+    user = _row(users, 0)
+    slate = [_row(movies, i) for i in range(max(SLATE_SIZES))]
+
+    benchmarks: Dict[str, Callable[[], Any]] = {}
+
+    # Retrieval, one entry per backend `infer.retrieve` can dispatch to.
+    benchmarks["infer.retrieve[brute]"] = lambda: infer.retrieve(user, k, approximate=False)
+    if infer.catalog is not None:
+        def _exact() -> Any:
+            with _patched(infer, brute_retrieval=None):
+                return infer.retrieve(user, k, approximate=False)
+        benchmarks["infer.retrieve[exact]"] = _exact
+    if infer.catalog is not None and infer.catalog.index is not None:
+        benchmarks["infer.retrieve[faiss]"] = lambda: infer.retrieve(user, k, approximate=True)
+    if infer.scann_retrieval is not None:
+        def _scann() -> Any:
+            with _patched(infer, catalog=None):
+                return infer.retrieve(user, k, approximate=True)
+        benchmarks["infer.retrieve[scann]"] = _scann
+
+    # Ranking, the way `/api/v1/ranking` scores a slate.
+    for size in SLATE_SIZES:
+        benchmarks[f"infer.rank[slate={size}]"] = (
+            lambda size=size: [infer.rank(user, movie) for movie in slate[:size]]
+        )
+        benchmarks[f"infer.rank_movies[slate={size}]"] = (
+            lambda size=size: infer.rank_movies(user, slate[:size])
+        )
+
+    # Batched ranking: the whole slate in one call of the exported signature.
+    for variant, path in (("", os.environ["RANKING_PATH"]), ("xla,", os.environ["RANKING_XLA_PATH"])):
+        signature = tf.saved_model.load(path).signatures['call']
+        for size in SLATE_SIZES:
+            pairs = {
+                **{name: tf.constant([user[name]] * size) for name in USER_FEATURES},
+                **{name: tf.convert_to_tensor(movies[name][:size]) for name in CANDIDATE_SIGNATURE},
+            }
+            benchmarks[f"ranking.signature[{variant}slate={size}]"] = (
+                lambda signature=signature, pairs=pairs: signature(**pairs)
+            )
+
+    # Model building blocks.
+    for size in BATCH_SIZES:
+        user_batch = _batch(users, size)
+        benchmarks[f"Embedding.call[batch={size}]"] = (
+            lambda user_batch=user_batch: models["user_embedding"](user_batch)
+        )
+        benchmarks[f"Embedding.call[fused,batch={size}]"] = (
+            lambda user_batch=user_batch: models["user_embedding_fused"](user_batch)
+        )
+        benchmarks[f"Tower.call[batch={size}]"] = (
+            lambda user_batch=user_batch: models["query_tower"](user_batch)
+        )
+
+    # Candidate artifact: opening the memory maps and mapping search results to ids.
+    if infer.catalog is not None:
+        benchmarks["Candidates.load"] = lambda: Candidates(os.environ["CANDIDATES_PATH"])
+        indices = np.arange(k)
+        benchmarks[f"Candidates.take[k={k}]"] = lambda: infer.catalog.candidates.take(indices).tolist()
+
+        # Catalog update, from the candidate tower to the delta log (fsync included).
+        if infer.candidate_tower is not None:
+            new_movie = {**slate[0], "movie_id": "benchmark"}
+            def _update() -> Any:
+                infer.add_movies([new_movie])
+                return infer.remove_movies([new_movie["movie_id"]])
+            benchmarks["infer.add_movies+remove_movies[n=1]"] = _update
+
+    # Raw ANN search, without query tower inference.
+    if infer.catalog is not None and infer.catalog.index is not None:
+        rng = np.random.default_rng(0)
+        for size in (1, 64):
+            queries = rng.standard_normal((size, infer.catalog.index.d)).astype("float32")
+            benchmarks[f"faiss.search[batch={size}]"] = (
+                lambda queries=queries: infer.catalog.index.search(queries, k)
+            )
+
+    # Prediction logging, client side only.
+    items = [(movie["movie_id"], 0.5) for movie in slate]
+    connection = _NullConnection()
+    benchmarks["db.insert_predictions[items=100]"] = lambda: db.insert_predictions(
+        user_id=user["user_id"],
+        model_version="A",
+        items=items,
+        conn=connection,
+    )
+
+    return benchmarks
+
+
+def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    tf.random.set_seed(args.seed)
+    users, movies = _synthetic_data(args.users, args.movies, args.seed)
+    models = _build_models(users, movies, args.embedding_dim)
+
+    with tempfile.TemporaryDirectory() as export_dir:
+        os.environ.update(_export_artifacts(models, export_dir, args.top_k))
+        os.environ.setdefault("PROMETHEUS_SERVER_PORT", "0")
+        os.environ.setdefault("API_PORT", "0")
+
+        benchmarks = _collect_benchmarks(models, users, movies, args.top_k)
+        pattern = re.compile(args.filter) if args.filter else None
+
+        results: Dict[str, Dict[str, float]] = {}
+        for name, fn in benchmarks.items():
+            if pattern and not pattern.search(name):
+                continue
+            results[name] = _measure(fn, min_time=args.min_time)
+            print(f"{name:<40} {results[name]['median_us']:>12.1f} us  (p95 {results[name]['p95_us']:.1f} us)")
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "users": args.users,
+            "movies": args.movies,
+            "embedding_dim": args.embedding_dim,
+            "top_k": args.top_k,
+            "tensorflow": tf.__version__,
+        },
+        "benchmarks": results,
+    }
+
+
+def _compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> List[str]:
+    """
+        Compare median timings against a baseline.
+
+        Returns:
+            - (List[str]): Names of the benchmarks that regressed by more than `tolerance`.
+    """
+    regressions: List[str] = []
+    for name, result in current["benchmarks"].items():
+        reference = baseline["benchmarks"].get(name)
+        if reference is None:
+            print(f"{name:<40} new (no baseline)")
+            continue
+        ratio = result["median_us"] / reference["median_us"]
+        status = "REGRESSION" if ratio > 1.0 + tolerance else "ok"
+        print(f"{name:<40} {ratio:>6.2f}x baseline  {status}")
+        if status == "REGRESSION":
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="In-process micro-benchmarks for the serving hot path.")
+    parser.add_argument("command", choices=["run", "check"])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results of `run` as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown of the median, e.g. 0.2 for 20%%.")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks matching this regex.")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds spent timing each benchmark.")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--movies", type=int, default=1_000)
+    parser.add_argument("--embedding-dim", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if args.command == "check" and not os.path.isfile(args.baseline):
+        parser.error(f"no baseline at {args.baseline}; create one with `run --save-baseline`")
+
+    results = _run(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.command == "run" and args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.command == "check":
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = _compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed beyond {args.tolerance:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,86 +1,332 @@
-import tensorflow_datasets as tfds
-
-# Dataset size (options: 100k, 1m, 10m, 20m, 25m)
-DATASET_SIZE: str = '1m'
-
-ratings_dataset, ratings_dataset_info = tfds.load(
-    name = f'movielens/{DATASET_SIZE}-ratings',
-    # MovieLens dataset is not splitted into `train` and `test` sets by default.
-    # So TFDS has put it all into `train` split. We load it completely and split
-    # it manually.
-    split = 'train',
-    # `with_info=True` makes the `load` function return a `tfds.core.DatasetInfo`
-    # object containing dataset metadata like version, description, homepage,
-    # citation, etc.
-    with_info = True
-)
-
-# Convert the tf.data.DataFrame into a DataFrame.
-df = tfds.as_dataframe(ratings_dataset, ratings_dataset_info)
-
-# Convert byte values to strings.
-df = df.map(lambda x: x.decode('utf-8') if isinstance(x, bytes) else x)
-
-# ---------------- Ratings Dataset ----------------
-ratings_df_columns = [
-    'user_id',
-    'movie_id',
-    'timestamp',
-    'user_rating',
-]
-ratings_df = df.loc[:, ratings_df_columns]
+import argparse
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-# Remove duplicates
-ratings_df.drop_duplicates(inplace=True)
+# Dataset sizes and where their raw files live once `ml-<size>.zip` is extracted.
+RAW_DIRECTORIES: Dict[str, str] = {
+    "100k": "ml-100k",
+    "1m": "ml-1m",
+    "10m": "ml-10M100K",
+    "20m": "ml-20m",
+    "25m": "ml-25m",
+}
 
-ratings_df.to_parquet(f'data/raw/{DATASET_SIZE}-ratings.parquet', compression='brotli')
+# Every size the pipeline (ingestion, feature stores, evaluation) accepts.
+DATASET_SIZES: List[str] = list(RAW_DIRECTORIES)
 
-# ---------------- Movies Dataset ----------------
+# Sizes published on TFDS (`movielens/<size>-ratings`); 10m is only available as raw files.
+TFDS_SIZES: List[str] = ["100k", "1m", "20m", "25m"]
 
-movies_df_columns = [
-    'movie_id',
-    'movie_title',
-    'movie_genres',
+# `ClassLabel` names of TFDS, so both sources encode genres and occupations the same way.
+GENRES: List[str] = [
+    "Action", "Adventure", "Animation", "Children", "Comedy", "Crime", "Documentary",
+    "Drama", "Fantasy", "Film-Noir", "Horror", "IMAX", "Musical", "Mystery", "Romance",
+    "Sci-Fi", "Thriller", "Unknown", "War", "Western", "(no genres listed)",
+]
+OCCUPATIONS: List[str] = [
+    "academic/educator", "artist", "clerical/admin", "customer service", "doctor/health care",
+    "entertainment", "executive/managerial", "farmer", "homemaker", "lawyer", "librarian",
+    "other/not specified", "programmer", "retired", "sales/marketing", "scientist",
+    "self-employed", "student", "technician/engineer", "tradesman/craftsman", "unemployed", "writer",
 ]
-movies_df = df.loc[:, movies_df_columns]
 
-# Extract the release years into a separate column.
-movies_df['movie_release_year'] = movies_df['movie_title'].str.extract(r'\((\d{4})\)')
+# Column order of the 19 genre flags in 100k's `u.item`.
+ML_100K_GENRES: List[str] = [
+    "Unknown", "Action", "Adventure", "Animation", "Children", "Comedy", "Crime", "Documentary",
+    "Drama", "Fantasy", "Film-Noir", "Horror", "Musical", "Mystery", "Romance", "Sci-Fi",
+    "Thriller", "War", "Western",
+]
+ML_100K_OCCUPATIONS: Dict[str, str] = {
+    "administrator": "clerical/admin", "artist": "artist", "doctor": "doctor/health care",
+    "educator": "academic/educator", "engineer": "technician/engineer", "entertainment": "entertainment",
+    "executive": "executive/managerial", "healthcare": "doctor/health care", "homemaker": "homemaker",
+    "lawyer": "lawyer", "librarian": "librarian", "marketing": "sales/marketing",
+    "none": "other/not specified", "other": "other/not specified", "programmer": "programmer",
+    "retired": "retired", "salesman": "sales/marketing", "scientist": "scientist", "student": "student",
+    "technician": "technician/engineer", "writer": "writer",
+}
+# Occupation codes of 1m's `users.dat`; both student codes map to "student".
+ML_1M_OCCUPATIONS: List[str] = [
+    "other/not specified", "academic/educator", "artist", "clerical/admin", "student",
+    "customer service", "doctor/health care", "executive/managerial", "farmer", "homemaker",
+    "student", "lawyer", "programmer", "retired", "sales/marketing", "scientist", "self-employed",
+    "technician/engineer", "tradesman/craftsman", "unemployed", "writer",
+]
+AGE_BUCKETS: List[int] = [1, 18, 25, 35, 45, 50, 56]
 
-# Remove the release years from the movie titles.
-movies_df['movie_title'] = movies_df['movie_title'].str.replace(r'\s*\(\d{4}\)\s*', '', regex=True)
+# 10m and newer releases carry no demographics. Their users get one "unknown"
+# value per feature, so that every size has the columns of the feature schema;
+# the models then embed these features as a constant.
+MISSING_USER_FEATURES: Dict[str, Any] = {
+    "user_gender": -1,
+    "user_zip_code": "unknown",
+    "user_bucketized_age": -1.0,
+    "user_occupation_label": OCCUPATIONS.index("other/not specified"),
+}
 
-# Convert the genres into a tuple.
-movies_df['movie_genres'] = movies_df['movie_genres'].apply(tuple)
+RATING_COLUMNS: List[str] = ["user_id", "movie_id", "timestamp", "user_rating"]
+MOVIE_COLUMNS: List[str] = ["movie_id", "movie_title", "movie_genres"]
+USER_COLUMNS: List[str] = ["user_id", "user_gender", "user_zip_code", "bucketized_user_age", "user_occupation_label"]
 
-# Remove duplicates
-movies_df.drop_duplicates(inplace=True)
+RATINGS_SCHEMA = pa.schema([
+    ("user_id", pa.string()),
+    ("movie_id", pa.string()),
+    ("timestamp", pa.int64()),
+    ("user_rating", pa.float32()),
+])
 
-movies_df.to_parquet(f'data/raw/{DATASET_SIZE}-movies.parquet', compression='brotli')
 
-# ---------------- Users Dataset ----------------
+def _decode(values: np.ndarray) -> pa.Array:
+    """Decode a column of UTF-8 bytes in one vectorized cast."""
+    return pa.array(values, type=pa.binary()).cast(pa.string())
 
-users_df_columns = [
-    'user_id',
-    'user_gender',
-    # 'raw_user_age',
-    'user_zip_code',
-    'bucketized_user_age',
-    # 'user_occupation_text',
-    'user_occupation_label',
-]
-users_df = df.loc[:, users_df_columns]
 
-users_df.rename(
-    columns = {
-        'bucketized_user_age': 'user_bucketized_age'
-    },
-    inplace = True
-)
+def _genre_codes(genres: pd.Series) -> pd.Series:
+    """Map `|`-separated genre names to TFDS `ClassLabel` codes."""
+    index = {name: code for code, name in enumerate(GENRES)}
+    index["Children's"] = index["Children"]
+    return genres.str.split("|").map(lambda names: tuple(index[name] for name in names))
+
+
+def _tfds_chunks(
+    dataset_size: str,
+    data_dir: Optional[str],
+    chunk_size: int,
+    download: bool,
+) -> Iterator[Dict[str, pa.Array]]:
+    import tensorflow as tf
+    import tensorflow_datasets as tfds
+
+    builder = tfds.builder(f"movielens/{dataset_size}-ratings", data_dir=data_dir)
+    if download:
+        builder.download_and_prepare()
+
+    columns = [name for name in RATING_COLUMNS + MOVIE_COLUMNS + USER_COLUMNS if name in builder.info.features]
+    dataset = builder.as_dataset(split="train").map(
+        lambda x: {name: x[name] for name in columns},
+        num_parallel_calls=tf.data.AUTOTUNE,
+    )
+
+    # Genres are variable-length, so batches are ragged.
+    for batch in dataset.ragged_batch(chunk_size).prefetch(2):
+        chunk: Dict[str, pa.Array] = {}
+        for name in columns:
+            values = batch[name]
+            if name == "movie_genres":
+                chunk[name] = pa.ListArray.from_arrays(
+                    values.row_splits.numpy().astype(np.int32),
+                    pa.array(values.values.numpy()),
+                )
+            elif values.dtype == tf.string:
+                chunk[name] = _decode(values.numpy())
+            else:
+                chunk[name] = pa.array(values.numpy())
+        yield chunk
+
+
+def _raw_ratings_chunks(dataset_size: str, raw_dir: str, chunk_size: int) -> Iterator[Dict[str, pa.Array]]:
+    if dataset_size == "100k":
+        reader = pd.read_csv(
+            os.path.join(raw_dir, "u.data"), sep="\t", header=None, names=RATING_COLUMNS[:2] + ["user_rating", "timestamp"],
+            dtype=str, chunksize=chunk_size,
+        )
+    elif dataset_size in ("1m", "10m"):
+        # `::` separated: splitting on `:` keeps the C parser and leaves empty columns between fields.
+        reader = pd.read_csv(
+            os.path.join(raw_dir, "ratings.dat"), sep=":", header=None, usecols=[0, 2, 4, 6],
+            names=["user_id", "_1", "movie_id", "_3", "user_rating", "_5", "timestamp"],
+            dtype=str, chunksize=chunk_size,
+        )
+    else:
+        reader = pd.read_csv(
+            os.path.join(raw_dir, "ratings.csv"), header=0, names=["user_id", "movie_id", "user_rating", "timestamp"],
+            dtype=str, chunksize=chunk_size,
+        )
+
+    for frame in reader:
+        yield {
+            "user_id": pa.array(frame["user_id"].to_numpy(), type=pa.string()),
+            "movie_id": pa.array(frame["movie_id"].to_numpy(), type=pa.string()),
+            "timestamp": pa.array(frame["timestamp"].to_numpy(dtype=np.int64)),
+            "user_rating": pa.array(frame["user_rating"].to_numpy(dtype=np.float32)),
+        }
+
+
+def _raw_movies(dataset_size: str, raw_dir: str) -> pd.DataFrame:
+    if dataset_size == "100k":
+        movies = pd.read_csv(os.path.join(raw_dir, "u.item"), sep="|", header=None, encoding="latin-1", dtype=str)
+        flags = movies.iloc[:, 5:].to_numpy() == "1"
+        codes = np.array([GENRES.index(name) for name in ML_100K_GENRES])
+        return pd.DataFrame({
+            "movie_id": movies[0],
+            "movie_title": movies[1],
+            "movie_genres": [tuple(codes[row]) for row in flags],
+        })
+
+    if dataset_size in ("1m", "10m"):
+        movies = pd.read_csv(
+            os.path.join(raw_dir, "movies.dat"), sep="::", header=None, engine="python",
+            names=MOVIE_COLUMNS, dtype=str, encoding="latin-1" if dataset_size == "1m" else "utf-8",
+        )
+    else:
+        movies = pd.read_csv(os.path.join(raw_dir, "movies.csv"), header=0, names=MOVIE_COLUMNS, dtype=str)
+
+    movies["movie_genres"] = _genre_codes(movies["movie_genres"])
+    return movies
+
+
+def _raw_users(dataset_size: str, raw_dir: str) -> Optional[pd.DataFrame]:
+    if dataset_size == "100k":
+        users = pd.read_csv(
+            os.path.join(raw_dir, "u.user"), sep="|", header=None, dtype=str,
+            names=["user_id", "age", "gender", "occupation", "user_zip_code"],
+        )
+        ages = users["age"].astype(int).to_numpy()
+        users["bucketized_user_age"] = np.array(AGE_BUCKETS)[np.searchsorted(AGE_BUCKETS, ages, side="right") - 1]
+        occupations = users["occupation"].map(ML_100K_OCCUPATIONS)
+    elif dataset_size == "1m":
+        users = pd.read_csv(
+            os.path.join(raw_dir, "users.dat"), sep="::", header=None, engine="python", dtype=str,
+            names=["user_id", "gender", "bucketized_user_age", "occupation", "user_zip_code"],
+        )
+        occupations = users["occupation"].astype(int).map(lambda code: ML_1M_OCCUPATIONS[code])
+    else:
+        # 10m and newer releases carry no demographics.
+        return None
+
+    users["user_gender"] = (users["gender"] == "M").astype(np.int64)
+    users["bucketized_user_age"] = users["bucketized_user_age"].astype(np.float32)
+    users["user_occupation_label"] = occupations.map(OCCUPATIONS.index).astype(np.int64)
+    return users.loc[:, USER_COLUMNS]
+
+
+class _Distinct:
+    """Collects the first row of every key seen across chunks."""
+
+    def __init__(self, key: str, columns: List[str]) -> '_Distinct':
+        self.key = key
+        self.columns = columns
+        self._seen: set = set()
+        self._tables: List[pa.Table] = []
+
+
+    def update(self, chunk: Dict[str, pa.Array]) -> None:
+        keys = chunk[self.key].to_numpy(zero_copy_only=False)
+        _, first = np.unique(keys, return_index=True)
+        new = np.array([i for i in first if keys[i] not in self._seen], dtype=np.int64)
+        if len(new) == 0:
+            return
+        self._seen.update(keys[new])
+        table = pa.table({name: chunk[name] for name in self.columns if name in chunk})
+        self._tables.append(table.take(pa.array(new)))
+
+
+    def to_pandas(self) -> pd.DataFrame:
+        return pa.concat_tables(self._tables).to_pandas()
+
+
+def _write_ratings(
+    chunks: Iterator[Dict[str, pa.Array]],
+    path: str,
+    on_chunk: Optional[Callable[[Dict[str, pa.Array]], None]] = None,
+) -> int:
+    """Stream rating chunks into a Parquet file, one row group per chunk."""
+    rows = 0
+    with pq.ParquetWriter(path, RATINGS_SCHEMA, compression="brotli") as writer:
+        for chunk in chunks:
+            if on_chunk is not None:
+                on_chunk(chunk)
+            table = pa.table({name: chunk[name] for name in RATINGS_SCHEMA.names}).cast(RATINGS_SCHEMA)
+            # Duplicates are removed within each chunk; MovieLens has none across chunks.
+            table = pa.Table.from_pandas(table.to_pandas().drop_duplicates(), RATINGS_SCHEMA, preserve_index=False)
+            writer.write_table(table)
+            rows += table.num_rows
+            print(f"ratings: {rows} rows", end="\r", flush=True)
+    print()
+    return rows
+
+
+def _finalize_movies(movies: pd.DataFrame) -> pd.DataFrame:
+    movies = movies.loc[:, MOVIE_COLUMNS].copy()
+
+    # Extract the release years into a separate column.
+    movies["movie_release_year"] = movies["movie_title"].str.extract(r"\((\d{4})\)", expand=False)
+
+    # Remove the release years from the movie titles.
+    movies["movie_title"] = movies["movie_title"].str.replace(r"\s*\(\d{4}\)\s*", "", regex=True)
+
+    # Genres are stored as tuples of `ClassLabel` codes.
+    movies["movie_genres"] = movies["movie_genres"].map(lambda codes: tuple(int(c) for c in codes))
+
+    return movies.drop_duplicates(subset="movie_id").reset_index(drop=True)
+
+
+def _finalize_users(users: pd.DataFrame) -> pd.DataFrame:
+    users = users.rename(columns={"bucketized_user_age": "user_bucketized_age"})
+    for name, value in MISSING_USER_FEATURES.items():
+        if name not in users.columns:
+            users[name] = value
+    users["user_gender"] = users["user_gender"].astype(np.int64)  # Cast booleans to integers
+    users["user_bucketized_age"] = users["user_bucketized_age"].astype(np.float32)
+    return users.drop_duplicates(subset="user_id").reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Download (or read offline) MovieLens and write the raw parquet tables.")
+    parser.add_argument("--dataset-size", default="100k", choices=DATASET_SIZES)
+    parser.add_argument("--source", default="tfds", choices=["tfds", "raw"], help="Read from TFDS or from extracted MovieLens files.")
+    parser.add_argument("--data-dir", default=None, help="TFDS data directory (defaults to ~/tensorflow_datasets).")
+    parser.add_argument("--offline", action="store_true", help="Use an already prepared TFDS directory; never download.")
+    parser.add_argument("--raw-dir", default=None, help="Extracted MovieLens directory. Defaults to data/external/<ml-dir>.")
+    parser.add_argument("--output-dir", default="data/raw")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000, help="Ratings per chunk (and Parquet row group).")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    prefix = os.path.join(args.output_dir, args.dataset_size)
+    start = time.perf_counter()
+
+    if args.source == "tfds":
+        if args.dataset_size not in TFDS_SIZES:
+            parser.error(f"TFDS has no movielens/{args.dataset_size}-ratings; use --source raw.")
+
+        movies = _Distinct("movie_id", MOVIE_COLUMNS)
+        users = _Distinct("user_id", USER_COLUMNS)
+
+        def collect(chunk: Dict[str, pa.Array]) -> None:
+            movies.update(chunk)
+            users.update(chunk)
+
+        chunks = _tfds_chunks(args.dataset_size, args.data_dir, args.chunk_size, download=not args.offline)
+        rows = _write_ratings(chunks, f"{prefix}-ratings.parquet", on_chunk=collect)
+        movies_df, users_df = movies.to_pandas(), users.to_pandas()
+    else:
+        raw_dir = args.raw_dir or os.path.join("data/external", RAW_DIRECTORIES[args.dataset_size])
+        rows = _write_ratings(
+            _raw_ratings_chunks(args.dataset_size, raw_dir, args.chunk_size),
+            f"{prefix}-ratings.parquet",
+        )
+        movies_df = _raw_movies(args.dataset_size, raw_dir)
+        users_df = _raw_users(args.dataset_size, raw_dir)
+        if users_df is None:
+            users_df = pd.read_parquet(f"{prefix}-ratings.parquet", columns=["user_id"]).drop_duplicates()
+
+    movies_df = _finalize_movies(movies_df)
+    users_df = _finalize_users(users_df)
+    movies_df.to_parquet(f"{prefix}-movies.parquet", compression="brotli")
+    users_df.to_parquet(f"{prefix}-users.parquet", compression="brotli")
 
-users_df['user_gender'] = users_df['user_gender'].apply(lambda x: int(x))  # Cast booleans to integers
+    print(
+        f"{args.dataset_size}: {rows} ratings, {len(movies_df)} movies, {len(users_df)} users "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
 
-# Remove duplicates
-users_df.drop_duplicates(inplace=True)
 
-users_df.to_parquet(f'data/raw/{DATASET_SIZE}-users.parquet', compression='brotli')
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.candidates import Candidates  # noqa: E402
+from src.features import MOVIE_SCHEMA, USER_SCHEMA, FeatureEncoder  # noqa: E402
+from src.model.utils.evaluation import (  # noqa: E402
+    batched_embeddings,
+    blocked_top_k,
+    retrieval_metrics,
+    ranking_metrics,
+)
+from dataset import DATASET_SIZES  # noqa: E402
+
+
+def validation_split(dataset_size: str, train_size: float, random_state: int) -> Dict[str, np.ndarray]:
+    """Validation ratings, split from the feature store exactly like the training notebooks do."""
+    from src.model.utils.feature_store import load_feature_store
+    from src.model.utils.utilities import train_test_split
+
+    ratings = load_feature_store(os.path.join("data/processed", dataset_size, "ratings"))
+    _, validset = train_test_split(
+        dataset=ratings,
+        train_size=train_size,
+        by="example",
+        key=["user_id", "movie_id"],
+        random_state=random_state,
+    )
+    batches = list(validset.batch(65_536).as_numpy_iterator())
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+
+def load_signature_fn(path: str):
+    """Wrap the `call` signature of a SavedModel as a NumPy batch function."""
+    import tensorflow as tf
+
+    return signature_fn(tf.saved_model.load(path).signatures["call"])
+
+
+def signature_fn(signature: Any):
+    """Wrap a loaded SavedModel signature as a NumPy batch function."""
+    import tensorflow as tf
+
+    def call(batch: Dict[str, np.ndarray]) -> np.ndarray:
+        out = signature(**{k: tf.convert_to_tensor(v) for k, v in batch.items()})
+        out = out["embedding"] if "embedding" in out else list(out.values())[0]
+        return out.numpy()
+
+    return call
+
+
+def _load_candidates(path: str) -> Dict[str, Any]:
+    candidates = Candidates(path)
+    return {"ids": candidates.take(np.arange(len(candidates))), "embeddings": np.asarray(candidates.embeddings)}
+
+
+def _evaluate_retrieval(
+    args: argparse.Namespace,
+    users: pd.DataFrame,
+    ratings: pd.DataFrame,
+) -> Dict[str, float]:
+    candidates = _load_candidates(args.candidates)
+    item_index = pd.Index(candidates["ids"])
+
+    relevant = ratings[ratings["user_rating"] >= args.min_rating]
+    relevant = relevant[relevant["user_id"].isin(users["user_id"])]
+    eval_users = users[users["user_id"].isin(relevant["user_id"].unique())].reset_index(drop=True)
+
+    start = time.perf_counter()
+    queries = batched_embeddings(
+        load_signature_fn(args.query_tower),
+        FeatureEncoder(USER_SCHEMA).encode_frame(eval_users),
+        batch_size=args.batch_size,
+    )
+    embeddings = candidates["embeddings"]
+    if args.normalize:
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+        embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+    print(f"query tower: {len(queries)} users in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    top_k = blocked_top_k(
+        queries,
+        embeddings,
+        k=max(args.k),
+        block_size=args.block_size,
+        n_workers=args.workers,
+    )
+    print(f"top-k: {len(queries)} x {len(embeddings)} in {time.perf_counter() - start:.1f}s")
+
+    user_codes = pd.Index(eval_users["user_id"]).get_indexer(relevant["user_id"])
+    item_codes = item_index.get_indexer(relevant["movie_id"].astype(str))
+    known = item_codes >= 0
+
+    return retrieval_metrics(
+        top_k,
+        relevant_users=user_codes[known],
+        relevant_items=item_codes[known],
+        n_items=len(item_index),
+        ks=args.k,
+    )
+
+
+def _evaluate_ranking(
+    args: argparse.Namespace,
+    users: pd.DataFrame,
+    movies: pd.DataFrame,
+    ratings: pd.DataFrame,
+) -> Dict[str, float]:
+    import tensorflow as tf
+
+    examples = ratings.merge(users, on="user_id").merge(movies, on="movie_id")
+    signature = tf.saved_model.load(args.ranking).signatures["call"]
+    # Exports with precomputed text features (e.g. the movie title) take fewer inputs.
+    features = {
+        **FeatureEncoder.for_signature(USER_SCHEMA, signature).encode_frame(examples),
+        **FeatureEncoder.for_signature(MOVIE_SCHEMA, signature).encode_frame(examples),
+    }
+
+    start = time.perf_counter()
+    predictions = batched_embeddings(
+        lambda batch: signature(**{k: tf.convert_to_tensor(v) for k, v in batch.items()})["output_0"].numpy(),
+        features,
+        batch_size=args.batch_size,
+    )
+    print(f"ranking: {len(examples)} examples in {time.perf_counter() - start:.1f}s")
+
+    return ranking_metrics(
+        groups=pd.factorize(examples["user_id"])[0],
+        predictions=predictions,
+        labels=examples["user_rating"].to_numpy(),
+        k=args.ndcg_k,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline evaluation of retrieval and ranking on held-out ratings.")
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
+    parser.add_argument(
+        "--ratings",
+        default=None,
+        help="Held-out ratings parquet. Defaults to the validation split of the notebooks.",
+    )
+    parser.add_argument(
+        "--full-dataset",
+        action="store_true",
+        help="Evaluate on every rating, including those the models were trained on.",
+    )
+    parser.add_argument("--train-size", type=float, default=0.8, help="Train ratio of the notebooks' split.")
+    parser.add_argument("--random-state", type=int, default=42, help="Seed of the notebooks' split.")
+    parser.add_argument("--query-tower", default="checkpoints/retrieval/query_tower")
+    parser.add_argument("--candidates", default="checkpoints/retrieval/candidates", help="Candidate artifact directory.")
+    parser.add_argument("--ranking", default="checkpoints/ranking/pointwise")
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--ndcg-k", type=int, default=None)
+    parser.add_argument("--min-rating", type=float, default=4.0, help="Ratings at or above this are relevant.")
+    parser.add_argument("--normalize", action="store_true", help="Score by cosine similarity, as the FAISS index does.")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--block-size", type=int, default=1024)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--skip-ranking", action="store_true")
+    parser.add_argument("--output", default=None, help="Write metrics to this JSON file.")
+    args = parser.parse_args()
+
+    users = pd.read_parquet(f"data/raw/{args.dataset}-users.parquet")
+    movies = pd.read_parquet(f"data/raw/{args.dataset}-movies.parquet").drop(columns=["movie_genres"])
+    if args.ratings or args.full_dataset:
+        ratings = pd.read_parquet(args.ratings or f"data/raw/{args.dataset}-ratings.parquet")
+    else:
+        split = validation_split(args.dataset, args.train_size, args.random_state)
+        ratings = pd.DataFrame({name: split[name] for name in ("user_id", "movie_id", "user_rating")})
+        # The feature store holds strings as bytes.
+        for name in ("user_id", "movie_id"):
+            ratings[name] = ratings[name].to_numpy().astype(str)
+    print(f"evaluation: {len(ratings)} ratings")
+
+    users["user_id"] = users["user_id"].astype(str)
+    movies["movie_id"] = movies["movie_id"].astype(str)
+    movies = movies.fillna(value="-1")
+    ratings["user_id"] = ratings["user_id"].astype(str)
+    ratings["movie_id"] = ratings["movie_id"].astype(str)
+
+    metrics: Dict[str, Dict[str, float]] = {}
+    metrics["retrieval"] = _evaluate_retrieval(args, users, ratings)
+    if not args.skip_ranking:
+        metrics["ranking"] = _evaluate_ranking(args, users, movies, ratings)
+
+    for stage, values in metrics.items():
+        print(f"{stage}: " + ", ".join(f"{name}={value:.4f}" for name, value in values.items()))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(metrics, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
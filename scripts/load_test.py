@@ -0,0 +1,347 @@
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from dataset import DATASET_SIZES
+
+
+PERCENTILES: Dict[str, float] = {
+    "p50": 50.0,
+    "p95": 95.0,
+    "p99": 99.0,
+    "p99.9": 99.9,
+}
+
+
+def _to_jsonable(value: Any) -> Any:
+    if isinstance(value, (np.generic,)):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    return [
+        {k: _to_jsonable(v) for k, v in row.items()}
+        for row in df.to_dict(orient="records")
+    ]
+
+
+def _build_requests(
+    endpoint: str,
+    users: pd.DataFrame,
+    movies: pd.DataFrame,
+    n_payloads: int,
+    slate_size: int,
+    top_k: int,
+    approximate: bool,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    """
+        Pre-build request payloads so that no serialization work happens on
+        the send path.
+
+        Parameters:
+            - endpoint (str): `retrieval` or `ranking`.
+            - users (pd.DataFrame): Users to sample request bodies from.
+            - movies (pd.DataFrame): Movies to sample ranking slates from.
+            - n_payloads (int): Number of distinct payloads to cycle through.
+            - slate_size (int): Number of movies per ranking request.
+            - top_k (int): `top_k` query parameter of retrieval requests.
+            - approximate (bool): `approximate` query parameter of retrieval requests.
+            - seed (int): Sampling seed.
+
+        Returns:
+            - (List[Dict[str, Any]]): `httpx` request keyword arguments.
+    """
+    rng = np.random.default_rng(seed)
+    user_rows = _records(users.sample(n=n_payloads, replace=len(users) < n_payloads, random_state=seed))
+
+    if endpoint == "retrieval":
+        return [
+            {
+                "url": "/api/v1/retrieval",
+                "params": {"approximate": approximate, "top_k": top_k},
+                "json": user,
+            }
+            for user in user_rows
+        ]
+
+    movie_rows = _records(movies)
+    slate_size = min(slate_size, len(movie_rows))
+    payloads = []
+    for user in user_rows:
+        slate = rng.choice(len(movie_rows), size=slate_size, replace=False)
+        payloads.append(
+            {
+                "url": "/api/v1/ranking",
+                "json": {"movies": [movie_rows[i] for i in slate], "user": user},
+            }
+        )
+    return payloads
+
+
+def _prepare_frames(dataset: str) -> Dict[str, pd.DataFrame]:
+    users = pd.read_parquet(f"data/raw/{dataset}-users.parquet")
+    users["user_id"] = users["user_id"].astype(str)
+    users["user_zip_code"] = users["user_zip_code"].astype(str)
+
+    movies = pd.read_parquet(f"data/raw/{dataset}-movies.parquet")
+    movies = movies.loc[:, ["movie_id", "movie_title", "movie_release_year"]]
+    movies = movies.fillna("").astype(str)
+
+    return {"users": users, "movies": movies}
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    request: Dict[str, Any],
+    intended_start: float,
+    samples: List[Dict[str, Any]],
+) -> None:
+    """
+        Issue one request and record its timings.
+
+        The latency is measured from the *intended* start time rather than the
+        moment the request actually left the client, so that time spent
+        waiting behind a saturated server or connection pool is accounted for
+        (no coordinated omission).
+    """
+    sent = time.perf_counter()
+    error: Optional[str] = None
+    try:
+        response = await client.request("GET", **request)
+        if response.status_code >= 400:
+            error = f"http_{response.status_code}"
+    except httpx.TimeoutException:
+        error = "timeout"
+    except httpx.HTTPError as exc:
+        error = type(exc).__name__
+    finished = time.perf_counter()
+
+    samples.append(
+        {
+            "intended": intended_start,
+            "sent": sent,
+            "finished": finished,
+            "error": error,
+        }
+    )
+
+
+async def _open_loop(
+    client: httpx.AsyncClient,
+    requests: List[Dict[str, Any]],
+    qps: float,
+    duration: float,
+    arrival: str,
+    seed: int,
+) -> List[Dict[str, Any]]:
+    """
+        Generate load at a target rate, independently of how fast the server
+        answers. Arrivals follow a fixed schedule (`uniform`) or a Poisson
+        process (`poisson`).
+    """
+    rng = np.random.default_rng(seed)
+    n_arrivals = int(qps * duration)
+    if arrival == "poisson":
+        offsets = np.cumsum(rng.exponential(1.0 / qps, size=n_arrivals))
+    else:
+        offsets = np.arange(n_arrivals) / qps
+
+    samples: List[Dict[str, Any]] = []
+    tasks: List[asyncio.Task] = []
+    start = time.perf_counter()
+
+    for i, offset in enumerate(offsets):
+        intended = start + offset
+        delay = intended - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(
+            asyncio.create_task(
+                _send(client, requests[i % len(requests)], intended, samples)
+            )
+        )
+
+    await asyncio.gather(*tasks)
+    return samples
+
+
+async def _closed_loop(
+    client: httpx.AsyncClient,
+    requests: List[Dict[str, Any]],
+    concurrency: int,
+    duration: float,
+) -> List[Dict[str, Any]]:
+    """
+        Keep a fixed number of requests in flight. Each worker issues its next
+        request as soon as the previous one completes, so this mode measures
+        capacity rather than latency at a given arrival rate.
+    """
+    samples: List[Dict[str, Any]] = []
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int) -> None:
+        i = worker_id
+        while time.perf_counter() < deadline:
+            await _send(client, requests[i % len(requests)], time.perf_counter(), samples)
+            i += concurrency
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return samples
+
+
+def _summarize(
+    samples: List[Dict[str, Any]],
+    warmup: float,
+) -> Dict[str, Any]:
+    """
+        Aggregate raw samples into throughput and latency percentiles,
+        excluding requests scheduled during the warmup period.
+    """
+    if not samples:
+        return {"requests": 0}
+
+    start = min(s["intended"] for s in samples)
+    measured = [s for s in samples if s["intended"] >= start + warmup]
+    ok = [s for s in measured if s["error"] is None]
+
+    errors: Dict[str, int] = {}
+    for s in measured:
+        if s["error"] is not None:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+
+    summary: Dict[str, Any] = {
+        "requests": len(measured),
+        "succeeded": len(ok),
+        "errors": errors,
+    }
+    if not ok:
+        return summary
+
+    window_start = min(s["intended"] for s in measured)
+    window_end = max(s["finished"] for s in measured)
+    latency = np.array([s["finished"] - s["intended"] for s in ok]) * 1_000
+    service = np.array([s["finished"] - s["sent"] for s in ok]) * 1_000
+
+    summary["throughput_rps"] = len(ok) / max(window_end - window_start, 1e-9)
+    summary["latency_ms"] = {
+        name: float(np.percentile(latency, q)) for name, q in PERCENTILES.items()
+    }
+    summary["latency_ms"]["mean"] = float(latency.mean())
+    summary["latency_ms"]["max"] = float(latency.max())
+    summary["service_time_ms"] = {
+        name: float(np.percentile(service, q)) for name, q in PERCENTILES.items()
+    }
+    return summary
+
+
+async def _run(args: argparse.Namespace) -> Dict[str, Any]:
+    frames = _prepare_frames(args.dataset)
+    limits = httpx.Limits(
+        max_connections=args.max_connections,
+        max_keepalive_connections=args.max_connections,
+    )
+
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(
+        base_url=args.api_base,
+        timeout=args.timeout,
+        limits=limits,
+        # The server gives up on requests the client no longer waits for.
+        headers={"X-Request-Timeout": str(args.timeout)},
+    ) as client:
+        for endpoint in args.endpoints:
+            requests = _build_requests(
+                endpoint=endpoint,
+                users=frames["users"],
+                movies=frames["movies"],
+                n_payloads=args.payloads,
+                slate_size=args.slate_size,
+                top_k=args.top_k,
+                approximate=args.approximate,
+                seed=args.seed,
+            )
+            duration = args.warmup + args.duration
+            if args.qps:
+                samples = await _open_loop(client, requests, args.qps, duration, args.arrival, args.seed)
+            else:
+                samples = await _closed_loop(client, requests, args.concurrency, duration)
+            results[endpoint] = _summarize(samples, args.warmup)
+
+    return results
+
+
+def _print_report(results: Dict[str, Any]) -> None:
+    for endpoint, summary in results.items():
+        if not summary.get("succeeded"):
+            print(f"{endpoint}: no successful requests ({summary})")
+            continue
+        latency = summary["latency_ms"]
+        print(
+            f"{endpoint}: {summary['throughput_rps']:.1f} req/s, "
+            f"n={summary['succeeded']}, errors={sum(summary['errors'].values())} | "
+            + ", ".join(f"{name}={latency[name]:.2f}ms" for name in PERCENTILES)
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the recommendation API.")
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
+    parser.add_argument("--api-base", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--endpoints",
+        nargs="+",
+        default=["retrieval", "ranking"],
+        choices=["retrieval", "ranking"],
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--qps",
+        type=float,
+        default=None,
+        help="Open-loop mode: target arrival rate in requests per second.",
+    )
+    mode.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Closed-loop mode: number of requests kept in flight.",
+    )
+    parser.add_argument("--arrival", default="poisson", choices=["poisson", "uniform"])
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per endpoint.")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds excluded from the report.")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--max-connections", type=int, default=256)
+    parser.add_argument("--payloads", type=int, default=1_000)
+    parser.add_argument("--slate-size", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--approximate", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Write the JSON report to this path.")
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args))
+    _print_report(results)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "config": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
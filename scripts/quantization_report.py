@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Mapping, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.candidates import Candidates  # noqa: E402
+from src.features import MOVIE_SCHEMA, USER_SCHEMA, FeatureEncoder  # noqa: E402
+from src.model.quantization import QUANTIZATION_MODES  # noqa: E402
+from src.model.utils.evaluation import (  # noqa: E402
+    batched_embeddings,
+    blocked_top_k,
+    retrieval_metrics,
+    ranking_metrics,
+)
+from evaluate import signature_fn, validation_split  # noqa: E402
+from dataset import DATASET_SIZES  # noqa: E402
+
+
+def _load(
+    path: str,
+    examples: pd.DataFrame,
+    schemas: Sequence[Mapping[str, Any]],
+) -> Tuple[Callable[[Dict[str, np.ndarray]], np.ndarray], Dict[str, np.ndarray]]:
+    """The `call` signature of a SavedModel and its inputs, encoded from `examples`."""
+    import tensorflow as tf
+
+    signature = tf.saved_model.load(path).signatures["call"]
+    # Quantized exports may take fewer inputs (e.g. precomputed text features).
+    features: Dict[str, np.ndarray] = {}
+    for schema in schemas:
+        features.update(FeatureEncoder.for_signature(schema, signature).encode_frame(examples))
+    return signature_fn(signature), features
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def _median_latency_us(fn: Any, batch: Dict[str, np.ndarray], repeats: int = 50) -> float:
+    fn(batch)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(batch)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1e6)
+
+
+def _evaluate_variant(
+    args: argparse.Namespace,
+    variant: str,
+    examples: pd.DataFrame,
+    candidates: Candidates,
+) -> Dict[str, float]:
+    suffix = "" if variant == "float32" else f"_{variant}"
+    ranking_path = f"{args.ranking}{suffix}"
+    query_tower_path = f"{args.query_tower}{suffix}"
+
+    metrics: Dict[str, float] = {}
+
+    # Ranking: RMSE and NDCG of every validation rating.
+    ranking, features = _load(ranking_path, examples, (USER_SCHEMA, MOVIE_SCHEMA))
+    predictions = batched_embeddings(ranking, features, batch_size=args.batch_size)
+    metrics.update(ranking_metrics(
+        groups=pd.factorize(examples["user_id"])[0],
+        predictions=predictions,
+        labels=examples["user_rating"].to_numpy(),
+        k=args.ndcg_k,
+    ))
+
+    # Retrieval: Recall@k of the validation positives against the float32 candidates.
+    relevant = examples[examples["user_rating"] >= args.min_rating]
+    user_ids, first = np.unique(relevant["user_id"], return_index=True)
+    query_tower, users = _load(query_tower_path, relevant.iloc[first], (USER_SCHEMA,))
+    queries = batched_embeddings(query_tower, users, batch_size=args.batch_size)
+
+    embeddings = np.asarray(candidates.embeddings)
+    if args.normalize:
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12
+        embeddings = embeddings / (np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12)
+    top_k = blocked_top_k(queries, embeddings, k=max(args.k), n_workers=args.workers)
+
+    item_index = pd.Index(candidates.take(np.arange(len(candidates))))
+    item_codes = item_index.get_indexer(relevant["movie_id"])
+    user_codes = pd.Index(user_ids).get_indexer(relevant["user_id"])
+    known = item_codes >= 0
+    retrieval = retrieval_metrics(
+        top_k,
+        relevant_users=user_codes[known],
+        relevant_items=item_codes[known],
+        n_items=len(item_index),
+        ks=args.k,
+    )
+    metrics.update({name: value for name, value in retrieval.items() if name.startswith("recall@")})
+
+    # Serving cost: artifact size and latency of a slate and of a single query.
+    slate = {name: values[:100] for name, values in features.items()}
+    metrics["ranking_bytes"] = float(_directory_bytes(ranking_path))
+    metrics["query_tower_bytes"] = float(_directory_bytes(query_tower_path))
+    metrics["ranking_us[batch=100]"] = _median_latency_us(ranking, slate)
+    metrics["query_tower_us[batch=1]"] = _median_latency_us(query_tower, {name: values[:1] for name, values in users.items()})
+
+    return metrics
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Accuracy and cost of the quantized model variants against float32.")
+    parser.add_argument("--dataset", default="100k", choices=DATASET_SIZES)
+    parser.add_argument("--variants", nargs="+", default=list(QUANTIZATION_MODES), choices=list(QUANTIZATION_MODES))
+    parser.add_argument("--query-tower", default="checkpoints/retrieval/query_tower")
+    parser.add_argument("--candidates", default="checkpoints/retrieval/candidates", help="Candidate artifact directory.")
+    parser.add_argument("--ranking", default="checkpoints/ranking/pointwise")
+    parser.add_argument("--train-size", type=float, default=0.8, help="Train ratio of the notebooks' split.")
+    parser.add_argument("--random-state", type=int, default=42, help="Seed of the notebooks' split.")
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--ndcg-k", type=int, default=None)
+    parser.add_argument("--min-rating", type=float, default=4.0, help="Ratings at or above this are relevant.")
+    parser.add_argument("--normalize", action="store_true", help="Score by cosine similarity, as the FAISS index does.")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default=None, help="Write the report to this JSON file.")
+    args = parser.parse_args()
+
+    examples = pd.DataFrame(validation_split(args.dataset, args.train_size, args.random_state))
+    for name in ("user_id", "movie_id"):
+        examples[name] = examples[name].astype(str)
+    candidates = Candidates(args.candidates)
+    print(f"validation: {len(examples)} ratings")
+
+    report: Dict[str, Dict[str, float]] = {}
+    for variant in ["float32", *args.variants]:
+        start = time.perf_counter()
+        report[variant] = _evaluate_variant(args, variant, examples, candidates)
+        print(f"{variant}: evaluated in {time.perf_counter() - start:.1f}s")
+
+    # float32 values, then the relative change of every variant.
+    baseline = report["float32"]
+    print(f"{'metric':<28}" + "".join(f"{variant:>14}" for variant in report))
+    for name in baseline:
+        row = f"{name:<28}{baseline[name]:>14.4f}"
+        for variant in args.variants:
+            value = report[variant][name]
+            change = (value - baseline[name]) / baseline[name] * 100 if baseline[name] else 0.0
+            row += f"{change:>+13.1f}%"
+        print(row)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
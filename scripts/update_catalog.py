@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# `src/catalog.py` is a serving module and imports its siblings directly.
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from src.catalog import CatalogIndex  # noqa: E402
+from src.features import MOVIE_SCHEMA, FeatureEncoder  # noqa: E402
+
+
+def _read_movies(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype=str)
+
+
+def _candidate_tower(path: str):
+    import tensorflow as tf
+
+    signature = tf.saved_model.load(path).signatures["call"]
+    encoder = FeatureEncoder.for_signature(MOVIE_SCHEMA, signature)
+
+    def embed(movies: pd.DataFrame) -> np.ndarray:
+        features = encoder.encode_frame(movies)
+        return signature(**{name: tf.convert_to_tensor(values) for name, values in features.items()})["embedding"].numpy()
+
+    return embed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add, retire or compact the movies of the live retrieval catalog.")
+    parser.add_argument("--candidates", default="checkpoints/retrieval/candidates", help="Candidate artifact directory.")
+    parser.add_argument("--index", default="checkpoints/retrieval/faiss/index.ivf", help="FAISS index of the artifact.")
+    parser.add_argument("--drift-threshold", type=float, default=0.2)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add = subparsers.add_parser("add", help="Embed movies with the candidate tower and add them.")
+    add.add_argument("movies", help="Parquet or CSV file with the movie features.")
+    add.add_argument("--candidate-tower", default="checkpoints/retrieval/candidate_tower")
+    add.add_argument("--batch-size", type=int, default=4096)
+
+    remove = subparsers.add_parser("remove", help="Retire movies.")
+    remove.add_argument("movie_ids", nargs="+")
+
+    compact = subparsers.add_parser("compact", help="Rebuild the artifact and the index once drift exceeds the threshold.")
+    compact.add_argument("--force", action="store_true", help="Compact regardless of drift.")
+
+    subparsers.add_parser("stats", help="Print the size and drift of the catalog.")
+    args = parser.parse_args()
+
+    # Same file lock and delta log as the API workers, which pick the changes up on their next search.
+    catalog = CatalogIndex(args.candidates, index_path=args.index, drift_threshold=args.drift_threshold)
+
+    if args.command == "add":
+        movies = _read_movies(args.movies)
+        embed = _candidate_tower(args.candidate_tower)
+        for start in range(0, len(movies), args.batch_size):
+            batch = movies.iloc[start:start + args.batch_size]
+            catalog.add_with_ids(batch["movie_id"].astype(str).tolist(), embed(batch))
+        print(f"added {len(movies)} movies")
+    elif args.command == "remove":
+        print(f"removed {catalog.remove_ids(args.movie_ids)} movies")
+    elif args.command == "compact":
+        print("compacted" if catalog.compact(force=args.force) else "drift below threshold; nothing to do")
+
+    print(json.dumps(catalog.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
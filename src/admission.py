@@ -0,0 +1,233 @@
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+import time
+import asyncio
+import threading
+import contextlib
+import collections
+
+from prometheus_client import Counter, Gauge, Histogram
+
+# Steps of the degradation ladder, mildest first. Each one trades relevance for
+# capacity: fewer inverted lists visited, approximate instead of exact search,
+# retrieval order instead of ranking scores, then no model at all.
+REDUCE_NPROBE: str = "reduce_nprobe"
+APPROXIMATE: str   = "approximate"
+SKIP_RANKING: str  = "skip_ranking"
+FALLBACK: str      = "fallback"
+STEPS: Tuple[str, ...] = (REDUCE_NPROBE, APPROXIMATE, SKIP_RANKING, FALLBACK)
+
+# Pressure (admitted and queued requests over the concurrency limit) from which
+# each step applies. A step left out never applies.
+DEFAULT_LADDER: str = "reduce_nprobe:0.75,approximate:1,skip_ranking:1.5,fallback:3"
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight",
+    "Requests holding an inference slot.",
+    multiprocess_mode = "livesum",
+)
+ADMISSION_QUEUED = Gauge(
+    "admission_queued",
+    "Requests waiting for an inference slot.",
+    multiprocess_mode = "livesum",
+)
+ADMISSION_QUEUE_TIME = Histogram(
+    "admission_queue_seconds",
+    "Time spent waiting for an inference slot.",
+    ["endpoint"],
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+DEGRADED_REQUESTS = Counter(
+    "degraded_requests_total",
+    "Requests served with a step of the degradation ladder.",
+    ["endpoint", "step"],
+)
+SHED_REQUESTS = Counter(
+    "shed_requests_total",
+    "Requests rejected: no slot within the queue budget and nothing to fall back on.",
+    ["endpoint"],
+)
+
+
+def parse_ladder(spec: str) -> List[Tuple[str, float]]:
+    """
+        Parse a degradation ladder, e.g. "approximate:1,fallback:3".
+
+        Parameters:
+            - spec (str): Comma-separated `step:pressure` pairs.
+
+        Returns:
+            - (List[Tuple[str, float]]): `(step, pressure)` pairs, in `STEPS` order.
+    """
+    ladder: Dict[str, float] = {}
+    for item in filter(None, (item.strip() for item in spec.split(","))):
+        step, _, pressure = item.partition(":")
+        step = step.strip()
+        if step not in STEPS:
+            raise ValueError(f"Unknown degradation step {step!r}, expected one of {list(STEPS)}.")
+        ladder[step] = float(pressure)
+    return [(step, ladder[step]) for step in STEPS if step in ladder]
+
+
+def record_degradation(endpoint: str, step: str) -> None:
+    DEGRADED_REQUESTS.labels(endpoint=endpoint, step=step).inc()
+
+
+class AdmissionController:
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        queue_budget: float,
+        ladder: str = DEFAULT_LADDER,
+    ) -> 'AdmissionController':
+        """
+            Per-worker admission control of the inference endpoints.
+
+            At most `max_concurrency` requests run inference at once; the others
+            wait for a slot, for at most `queue_budget` seconds. Each request is
+            given the ladder steps that apply at the pressure it arrives at, and a
+            request whose budget runs out is served the fallback instead of
+            waiting longer.
+
+            Parameters:
+                - max_concurrency (int): Inference slots. 0 disables admission control.
+                - queue_budget (float): Seconds a request may wait for a slot.
+                - ladder (str): Degradation ladder (`parse_ladder`). Defaults to `DEFAULT_LADDER`.
+        """
+        self.max_concurrency = max_concurrency
+        self.queue_budget    = queue_budget
+        self.ladder          = parse_ladder(ladder)
+
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self._in_flight = 0
+        self._queued    = 0
+
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+
+    def pressure(self) -> float:
+        """Requests admitted or queued, this one included, over the concurrency limit."""
+        return (self._in_flight + self._queued + 1) / self.max_concurrency
+
+
+    def steps(self) -> Tuple[str, ...]:
+        """Ladder steps that apply at the current pressure."""
+        if not self.enabled:
+            return ()
+        pressure = self.pressure()
+        return tuple(step for step, threshold in self.ladder if pressure >= threshold)
+
+
+    @contextlib.asynccontextmanager
+    async def admit(self, endpoint: str, timeout: Optional[float] = None) -> AsyncIterator[Tuple[str, ...]]:
+        """
+            Hold an inference slot for the duration of the block.
+
+            Parameters:
+                - endpoint (str): Endpoint name, for the metrics.
+                - timeout (float): Seconds the request has left, which caps its queue
+                    budget. Defaults to `None`.
+
+            Returns:
+                - (Tuple[str, ...]): The ladder steps to apply. With `FALLBACK`, no
+                    slot is held and the request must not run inference.
+        """
+        if not self.enabled:
+            yield ()
+            return
+
+        steps = self.steps()
+        acquired = False
+        if FALLBACK not in steps:
+            self._queued += 1
+            ADMISSION_QUEUED.inc()
+            start = time.perf_counter()
+            try:
+                budget = self.queue_budget if timeout is None else max(0.0, min(self.queue_budget, timeout))
+                await asyncio.wait_for(self._slots.acquire(), budget)
+                acquired = True
+            except asyncio.TimeoutError:
+                steps = steps + (FALLBACK,)
+            finally:
+                self._queued -= 1
+                ADMISSION_QUEUED.dec()
+                ADMISSION_QUEUE_TIME.labels(endpoint=endpoint).observe(time.perf_counter() - start)
+
+        if not acquired:
+            yield steps
+            return
+
+        self._in_flight += 1
+        ADMISSION_IN_FLIGHT.inc()
+        try:
+            yield steps
+        finally:
+            self._in_flight -= 1
+            ADMISSION_IN_FLIGHT.dec()
+            self._slots.release()
+
+
+class FallbackResults:
+
+    def __init__(self, max_users: int = 10_000, refresh: int = 100) -> 'FallbackResults':
+        """
+            What retrieval serves without running a model: the last result of
+            the user, else the movies this worker retrieved most often.
+
+            Parameters:
+                - max_users (int): Users whose last result is kept (least recently used evicted). Defaults to 10000.
+                - refresh (int): Results between two recomputations of the popular movies. Defaults to 100.
+        """
+        self.max_users = max_users
+        self.refresh   = refresh
+
+        self._lock = threading.Lock()
+        self._results: 'collections.OrderedDict[str, List[str]]' = collections.OrderedDict()
+        self._counts: 'collections.Counter[str]' = collections.Counter()
+        self._popular: List[str] = []
+        self._since_refresh = 0
+
+
+    def put(self, user_id: str, movie_ids: Sequence[str]) -> None:
+        """
+            Keep a retrieval result.
+
+            Parameters:
+                - user_id (str): User id.
+                - movie_ids (Sequence[str]): Retrieved movie ids, best first.
+        """
+        with self._lock:
+            self._results[user_id] = list(movie_ids)
+            self._results.move_to_end(user_id)
+            if len(self._results) > self.max_users:
+                self._results.popitem(last=False)
+
+            self._counts.update(movie_ids)
+            self._since_refresh += 1
+            if self._since_refresh >= self.refresh or not self._popular:
+                self._popular = [movie_id for movie_id, _ in self._counts.most_common(1_000)]
+                self._since_refresh = 0
+
+
+    def get(self, user_id: str, k: int) -> Optional[List[str]]:
+        """
+            Fallback result of a user.
+
+            Parameters:
+                - user_id (str): User id.
+                - k (int): Number of movies.
+
+            Returns:
+                - (List[str]): Up to `k` movie ids, or `None` when nothing was retrieved yet.
+        """
+        with self._lock:
+            cached = self._results.get(user_id, [])
+            if not cached and not self._popular:
+                return None
+            if len(cached) >= k:
+                return cached[:k]
+            seen = set(cached)
+            return cached + [movie_id for movie_id in self._popular if movie_id not in seen][:k - len(cached)]
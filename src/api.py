@@ -1,14 +1,40 @@
-from typing import List
-import threading
+from typing import Any, AsyncIterator, Dict, List, Sequence, Type
+import hmac
 import time
+import asyncio
+import contextlib
 from pydantic import BaseModel
-from fastapi import FastAPI, Request, status
+from fastapi import FastAPI, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from prometheus_fastapi_instrumentator import Instrumentator
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import Counter, Histogram
 
 # Third-party
-from infer import retrieve, rank, choose_model_version
+from infer import retrieve, rank_movies, choose_model_version, add_movies, remove_movies, catalog
 from db import insert_predictions
+from config import (
+    ADMIN_TOKEN,
+    CATALOG_COMPACT_INTERVAL,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_QUEUE_BUDGET,
+    DEGRADATION_LADDER,
+    DEGRADED_NPROBE,
+    REQUEST_TIMEOUT,
+)
+from metrics import DistinctGauge, mark_process_dead
+from admission import (
+    APPROXIMATE,
+    FALLBACK,
+    REDUCE_NPROBE,
+    SHED_REQUESTS,
+    SKIP_RANKING,
+    AdmissionController,
+    FallbackResults,
+    record_degradation,
+)
+from deadline import TIMEOUT_HEADER, Deadline, DeadlineExceeded
+from features import MOVIE_SCHEMA, USER_SCHEMA, request_model
 
 
 APP = FastAPI()
@@ -25,31 +51,90 @@ RECOMMENDATION_LATENCY = Histogram(
     "Latency for recommendation endpoints.",
     ["endpoint"],
 )
-ACTIVE_USERS = Gauge(
+# Unique across workers: a per-worker gauge would count a user once per worker.
+ACTIVE_USERS = DistinctGauge(
     "active_users_count",
     "Count of unique users seen since process start.",
 )
-_active_users = set()
-_active_users_lock = threading.Lock()
+
+# Under load, requests queue for an inference slot and give up relevance
+# (`src/admission.py`) rather than all slowing down.
+ADMISSION = AdmissionController(ADMISSION_MAX_CONCURRENCY, ADMISSION_QUEUE_BUDGET, DEGRADATION_LADDER)
+FALLBACK_RESULTS = FallbackResults()
 
 
 def _record_active_user(user_id: str) -> None:
-    with _active_users_lock:
-        _active_users.add(user_id)
-        ACTIVE_USERS.set(len(_active_users))
+    ACTIVE_USERS.add(user_id)
+
+
+# Generated from the feature schema the models are exported with.
+UserModel: Type[BaseModel]  = request_model("UserModel", USER_SCHEMA)
+MovieModel: Type[BaseModel] = request_model("MovieModel", MOVIE_SCHEMA)
+
 
+def _check_admin_token(token: str) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    # Constant-time comparison, so that response times do not leak the token.
+    if not hmac.compare_digest((token or "").encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
 
-class UserModel(BaseModel):
-    user_id: str
-    user_gender: int
-    user_zip_code: str
-    user_bucketized_age: float
-    user_occupation_label: int
 
-class MovieModel(BaseModel):
-    movie_id: str
-    movie_title: str
-    movie_release_year: str
+def _degrade(response: Response, endpoint: str, steps: Sequence[str]) -> None:
+    # Clients can tell a degraded answer from the header.
+    for step in steps:
+        record_degradation(endpoint, step)
+    if steps:
+        response.headers["X-Degraded"] = ",".join(steps)
+
+
+def _rank_movies(user: Dict[str, Any], movies: List[BaseModel], deadline: Deadline) -> Dict[str, float]:
+    # One batched call; the request models are encoded as they are.
+    return dict(zip((movie.movie_id for movie in movies), rank_movies(user, movies, deadline=deadline)))
+
+
+@contextlib.asynccontextmanager
+async def _request_deadline(request: Request) -> AsyncIterator[Deadline]:
+    """
+        Deadline of a request, cancelled as soon as its client disconnects: the
+        stages still to run (including those in the threadpool) then give up.
+    """
+    deadline = Deadline.from_header(request.headers.get(TIMEOUT_HEADER), REQUEST_TIMEOUT)
+
+    async def watch() -> None:
+        # The body is read: the next message is the disconnect.
+        while (await request.receive())["type"] != "http.disconnect":
+            pass
+        deadline.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
+
+
+def _check_catalog() -> None:
+    if catalog is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Candidate catalog is not available.")
+
+
+@APP.exception_handler(DeadlineExceeded)
+async def deadline_exceeded(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=status.HTTP_504_GATEWAY_TIMEOUT, content={"detail": str(exc)})
+
+
+@APP.on_event("shutdown")
+async def release_live_metrics():
+    # Live gauges of an exited worker must not be aggregated any more.
+    mark_process_dead()
+
+
+@APP.on_event("startup")
+async def start_catalog_compaction():
+    # Every worker checks; the file lock lets only one of them compact.
+    if catalog is not None and CATALOG_COMPACT_INTERVAL > 0:
+        catalog.start_compaction(CATALOG_COMPACT_INTERVAL)
 
 
 @APP.get(
@@ -68,6 +153,8 @@ async def healthcheck(request: Request):
 )
 async def api_v1_retrieval(
     user: UserModel,
+    request: Request,
+    response: Response,
     top_k: int = 10,
     approximate: bool = True
 ):
@@ -77,11 +164,40 @@ async def api_v1_retrieval(
     RECOMMENDATION_REQUESTS.labels(endpoint="retrieval").inc()
     model_version = choose_model_version(data["user_id"])
     try:
-        return retrieve(
-            user = data,
-            k = top_k,
-            approximate = approximate,
-        )
+        async with _request_deadline(request) as deadline, ADMISSION.admit("retrieval", deadline.remaining()) as steps:
+            deadline.check("admission")
+            if FALLBACK in steps:
+                movie_ids = FALLBACK_RESULTS.get(data["user_id"], top_k)
+                if movie_ids is None:
+                    SHED_REQUESTS.labels(endpoint="retrieval").inc()
+                    raise HTTPException(
+                        status_code = status.HTTP_503_SERVICE_UNAVAILABLE,
+                        detail = "Overloaded.",
+                        headers = {"Retry-After": "1"},
+                    )
+                _degrade(response, "retrieval", [FALLBACK])
+                return movie_ids
+
+            applied = []
+            if APPROXIMATE in steps and not approximate:
+                approximate = True
+                applied.append(APPROXIMATE)
+            nprobe = None
+            if REDUCE_NPROBE in steps and approximate and catalog is not None and catalog.index is not None:
+                nprobe = DEGRADED_NPROBE
+                applied.append(REDUCE_NPROBE)
+            _degrade(response, "retrieval", applied)
+
+            movie_ids = await run_in_threadpool(
+                retrieve,
+                user = data,
+                k = top_k,
+                approximate = approximate,
+                nprobe = nprobe,
+                deadline = deadline,
+            )
+        FALLBACK_RESULTS.put(data["user_id"], movie_ids)
+        return movie_ids
     finally:
         RECOMMENDATION_LATENCY.labels(endpoint="retrieval").observe(
             time.perf_counter() - start
@@ -93,22 +209,30 @@ async def api_v1_retrieval(
     status_code = status.HTTP_200_OK,
     tags = ['api', 'v1', 'ranking'],
 )
-async def api_v1_rank(movies: List[MovieModel], user: UserModel):
+async def api_v1_rank(movies: List[MovieModel], user: UserModel, request: Request, response: Response):
 
     user_dict = user.model_dump()
     _record_active_user(user_dict["user_id"])
     start = time.perf_counter()
     RECOMMENDATION_REQUESTS.labels(endpoint="ranking").inc()
 
-    movie_scores = {}
     model_version = choose_model_version(user_dict["user_id"])
-    for movie in movies:
-        movie_dict = movie.model_dump()
-        movie_id = movie_dict.get('movie_id')
+    async with _request_deadline(request) as deadline, ADMISSION.admit("ranking", deadline.remaining()) as steps:
+        deadline.check("admission")
+        if SKIP_RANKING in steps or FALLBACK in steps:
+            # Movies keep the order they were sent in, i.e. retrieval order, unscored.
+            _degrade(response, "ranking", [SKIP_RANKING])
+            RECOMMENDATION_LATENCY.labels(endpoint="ranking").observe(
+                time.perf_counter() - start
+            )
+            return {movie.movie_id: None for movie in movies}
+
+        movie_scores = await run_in_threadpool(
+            _rank_movies, user_dict, movies, deadline
+        )
 
-        score = rank(user_dict, movie_dict)
-        
-        movie_scores[movie_id] = score
+        # Nobody would read the scores: do not log them either.
+        deadline.check("logging")
 
     insert_predictions(
         user_id=user_dict["user_id"],
@@ -120,3 +244,52 @@ async def api_v1_rank(movies: List[MovieModel], user: UserModel):
         time.perf_counter() - start
     )
     return movie_scores
+
+
+@APP.get(
+    path = "/api/admin/catalog",
+    status_code = status.HTTP_200_OK,
+    tags = ['api', 'admin', 'catalog'],
+)
+def api_admin_catalog(x_admin_token: str = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    _check_catalog()
+    return catalog.stats()
+
+
+@APP.post(
+    path = "/api/admin/catalog/movies",
+    status_code = status.HTTP_200_OK,
+    tags = ['api', 'admin', 'catalog'],
+)
+def api_admin_catalog_add(movies: List[MovieModel], x_admin_token: str = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    _check_catalog()
+    try:
+        rows = add_movies([movie.model_dump() for movie in movies])
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(exc))
+    return {"added": len(rows), **catalog.stats()}
+
+
+@APP.delete(
+    path = "/api/admin/catalog/movies",
+    status_code = status.HTTP_200_OK,
+    tags = ['api', 'admin', 'catalog'],
+)
+def api_admin_catalog_remove(movie_ids: List[str], x_admin_token: str = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    _check_catalog()
+    return {"removed": remove_movies(movie_ids), **catalog.stats()}
+
+
+@APP.post(
+    path = "/api/admin/catalog/compact",
+    status_code = status.HTTP_200_OK,
+    tags = ['api', 'admin', 'catalog'],
+)
+def api_admin_catalog_compact(force: bool = False, x_admin_token: str = Header(default=None)):
+    _check_admin_token(x_admin_token)
+    _check_catalog()
+    # Sync handlers run in the threadpool: the rebuild does not block the event loop.
+    return {"compacted": catalog.compact(force=force), **catalog.stats()}
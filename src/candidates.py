@@ -0,0 +1,166 @@
+from typing import Any, Dict, Iterable, Optional, Tuple
+import os
+import json
+
+import numpy as np
+
+# Bumped whenever the on-disk layout of the candidate artifact changes.
+FORMAT_VERSION: int = 1
+
+MANIFEST_FILE: str   = "manifest.json"
+EMBEDDINGS_FILE: str = "embeddings.f32"
+IDS_FILE: str        = "ids.npy"
+# Optional: the ids sorted, and the row of each, to find rows by id with a
+# binary search over the memory map instead of a per-process dictionary.
+SORTED_IDS_FILE: str = "ids_sorted.npy"
+ID_ROWS_FILE: str    = "id_rows.npy"
+
+
+def write_candidates(
+    path: str,
+    ids: Iterable[Any],
+    embeddings: np.ndarray,
+) -> Dict[str, Any]:
+    """
+        Write the candidate artifact: a manifest, the `(count, dim)` float32
+        embedding matrix as one contiguous little-endian file and the ids as a
+        fixed-width byte string array, row `i` of one matching entry `i` of the other.
+
+        Parameters:
+            - path (str): Artifact directory.
+            - ids (Iterable[Any]): Candidate identifiers, e.g. movie ids.
+            - embeddings (np.ndarray): Candidate tower output, one row per id.
+
+        Returns:
+            - (Dict[str, Any]): The manifest.
+    """
+    ids = np.array([i if isinstance(i, bytes) else str(i).encode("utf-8") for i in ids], dtype=np.bytes_)
+    embeddings = np.ascontiguousarray(embeddings, dtype="<f4")
+    if embeddings.ndim != 2 or len(embeddings) != len(ids):
+        raise ValueError(f"Expected one embedding row per id, got {embeddings.shape} for {len(ids)} ids.")
+
+    os.makedirs(path, exist_ok=True)
+    embeddings.tofile(os.path.join(path, EMBEDDINGS_FILE))
+    np.save(os.path.join(path, IDS_FILE), ids)
+
+    order = np.argsort(ids, kind="stable")
+    np.save(os.path.join(path, SORTED_IDS_FILE), ids[order])
+    np.save(os.path.join(path, ID_ROWS_FILE), order.astype(np.int64))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "count": int(len(ids)),
+        "dim": int(embeddings.shape[1]),
+        "dtype": "<f4",
+        "id_dtype": ids.dtype.str,
+        "embeddings": EMBEDDINGS_FILE,
+        "ids": IDS_FILE,
+        "sorted_ids": SORTED_IDS_FILE,
+        "id_rows": ID_ROWS_FILE,
+    }
+    # Written last: a directory with a manifest is a complete artifact.
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+class Candidates:
+
+    def __init__(self, path: str) -> 'Candidates':
+        """
+            Memory-mapped candidate artifact written by `write_candidates`.
+
+            Nothing is read up front: pages are loaded on first access and shared
+            through the page cache by every worker that maps the same files.
+
+            Parameters:
+                - path (str): Artifact directory.
+        """
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest: Dict[str, Any] = json.load(f)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Candidate artifact {path} has format version {self.manifest['format_version']}, "
+                f"expected {FORMAT_VERSION}."
+            )
+
+        self.path = path
+        self.embeddings: np.ndarray = np.memmap(
+            os.path.join(path, self.manifest["embeddings"]),
+            dtype=self.manifest["dtype"],
+            mode="r",
+            shape=(self.manifest["count"], self.manifest["dim"]),
+        )
+        self.ids: np.ndarray = np.load(os.path.join(path, self.manifest["ids"]), mmap_mode="r")
+
+        # Artifacts written before the sorted ids existed sort them in memory on first use.
+        self._sorted_ids: Optional[np.ndarray] = None
+        self._id_rows: Optional[np.ndarray] = None
+        if "sorted_ids" in self.manifest:
+            self._sorted_ids = np.load(os.path.join(path, self.manifest["sorted_ids"]), mmap_mode="r")
+            self._id_rows = np.load(os.path.join(path, self.manifest["id_rows"]), mmap_mode="r")
+
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+
+    @property
+    def dim(self) -> int:
+        return self.manifest["dim"]
+
+
+    def take(self, indices: np.ndarray) -> np.ndarray:
+        """
+            Map row indices (e.g. ANN search results) to candidate ids.
+
+            Parameters:
+                - indices (np.ndarray): Row indices; negative values (FAISS' "no result") are dropped.
+
+            Returns:
+                - (np.ndarray): The ids, as `str`.
+        """
+        indices = np.asarray(indices)
+        return np.take(self.ids, indices[indices >= 0]).astype(str)
+
+
+    def rows(self, ids: Iterable[Any]) -> np.ndarray:
+        """
+            Map candidate ids to their rows.
+
+            Parameters:
+                - ids (Iterable[Any]): Candidate ids.
+
+            Returns:
+                - (np.ndarray): The row of every id, -1 for unknown ones.
+        """
+        if self._sorted_ids is None:
+            self._id_rows = np.argsort(self.ids, kind="stable")
+            self._sorted_ids = np.asarray(self.ids)[self._id_rows]
+
+        keys = np.array([i if isinstance(i, bytes) else str(i).encode("utf-8") for i in ids], dtype=np.bytes_)
+        if len(keys) == 0 or len(self._sorted_ids) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self._sorted_ids, keys), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == keys
+        return np.where(found, np.asarray(self._id_rows)[positions], -1).astype(np.int64)
+
+
+    def top_k(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Exact top-k by inner product against every candidate.
+
+            Parameters:
+                - queries (np.ndarray): `(n, dim)` query embeddings.
+                - k (int): Number of candidates per query.
+
+            Returns:
+                - (Tuple[np.ndarray, np.ndarray]): `(n, k)` scores and row indices, best first.
+        """
+        scores = np.asarray(queries, dtype=np.float32) @ self.embeddings.T
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
@@ -0,0 +1,613 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import os
+import json
+import time
+import fcntl
+import shutil
+import logging
+import tempfile
+import threading
+import contextlib
+
+import numpy as np
+from prometheus_client import Counter, Gauge
+
+from candidates import MANIFEST_FILE, Candidates, write_candidates
+
+try:
+    import faiss  # type: ignore
+    _has_faiss = True
+except Exception:
+    _has_faiss = False
+
+LOG_FILE: str   = "delta.jsonl"
+INDEX_FILE: str = "index.ivf"
+
+# Every worker holds the same catalog: expose the most up to date of the live ones.
+CATALOG_SIZE = Gauge(
+    "catalog_size",
+    "Live candidates in the retrieval catalog.",
+    multiprocess_mode = "livemax",
+)
+CATALOG_DRIFT = Gauge(
+    "catalog_drift",
+    "Share of the catalog added or removed since the index was last trained.",
+    multiprocess_mode = "livemax",
+)
+CATALOG_UPDATES = Counter(
+    "catalog_updates_total",
+    "Candidates added to or removed from the retrieval catalog.",
+    ["op"],
+)
+CATALOG_COMPACTIONS = Counter(
+    "catalog_compactions_total",
+    "Rebuilds of the candidate artifact and retraining of the IVF coarse quantizer.",
+)
+
+_logger = logging.getLogger(__name__)
+
+
+def _normalized(vectors: np.ndarray) -> np.ndarray:
+    # Same as `faiss.normalize_L2`: the IVF index ranks by cosine similarity.
+    vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+    return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+
+def build_ivf_index(vectors: np.ndarray, nlist: Optional[int] = None) -> Any:
+    """
+        Train an inner-product IVFFlat index on the normalized vectors and add
+        them with their row numbers as ids, like the training notebook does.
+
+        Parameters:
+            - vectors (np.ndarray): `(n, dim)` raw candidate embeddings.
+            - nlist (int): Number of inverted lists. Defaults to `None` (about `sqrt(n)`, between 10 and 100).
+
+        Returns:
+            - (faiss.IndexIVFFlat): The trained index.
+    """
+    vectors = _normalized(vectors)
+    nlist = nlist or min(100, max(10, int(len(vectors) ** 0.5)))
+    index = faiss.IndexIVFFlat(faiss.IndexFlatIP(vectors.shape[1]), vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+    return index
+
+
+class CatalogIndex:
+
+    def __init__(
+        self,
+        path: str,
+        index_path: Optional[str] = None,
+        drift_threshold: float = 0.2,
+        nprobe: int = 10,
+        mmap: bool = False,
+    ) -> 'CatalogIndex':
+        """
+            Live retrieval catalog: the candidate artifact plus the FAISS index,
+            updated in place as movies are added or retired.
+
+            Every row of the artifact is a FAISS id. Added candidates get the next
+            rows and are added to the index with `add_with_ids`; retired ones are
+            tombstoned and removed from it. Updates are appended to a JSONL delta
+            log inside the artifact, so that other workers (and restarts) replay
+            them. Once the churn since the last build exceeds `drift_threshold`,
+            `compact` writes a new artifact of the live rows and retrains the
+            coarse quantizer.
+
+            With `mmap`, the index is memory-mapped rather than read into every
+            process, so that workers share its pages. A mapped index is read-only:
+            retired rows are filtered out of its results and added candidates are
+            searched exactly, until compaction builds them into the index.
+
+            Parameters:
+                - path (str): Candidate artifact directory (`src/candidates.py`).
+                - index_path (str): FAISS index used until the first compaction, which
+                    stores the index inside the artifact. Defaults to `None` (exact search only).
+                - drift_threshold (float): Share of added or removed rows that triggers
+                    compaction. Defaults to 0.2.
+                - nprobe (int): Inverted lists visited per query. Defaults to 10.
+                - mmap (bool): Memory-map the FAISS index. Defaults to False.
+        """
+        self.path            = path.rstrip("/")
+        self.index_path      = index_path
+        self.drift_threshold = drift_threshold
+        self.nprobe          = nprobe
+        self.mmap            = mmap and _has_faiss
+
+        self._lock      = threading.RLock()
+        self._lock_path = f"{self.path}.lock"
+        self._log_path  = os.path.join(self.path, LOG_FILE)
+        self._manifest_path = os.path.join(self.path, MANIFEST_FILE)
+
+        with self._lock, self._file_lock(fcntl.LOCK_SH):
+            self._load()
+
+
+    @contextlib.contextmanager
+    def _file_lock(self, operation: int) -> Iterator[None]:
+        # Serializes writers across worker processes; lives next to the artifact
+        # so that it survives compaction swapping the directory.
+        with open(self._lock_path, "a") as f:
+            fcntl.flock(f, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+    def _load(self) -> None:
+        # Compaction replaces the whole directory, hence the manifest.
+        self._manifest_inode = os.stat(self._manifest_path).st_ino
+        self.candidates = Candidates(self.path)
+        self._base = len(self.candidates)
+
+        if "index" in self.candidates.manifest:
+            index_file = os.path.join(self.path, self.candidates.manifest["index"])
+        else:
+            index_file = self.index_path
+        self.index = None
+        if _has_faiss and index_file and os.path.isfile(index_file):
+            self.index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP) if self.mmap else faiss.read_index(index_file)
+
+        # Base rows are found by id in the artifact; only added ones are kept here.
+        self._added: Dict[str, int] = {}
+        self._live = np.ones(self._base, dtype=bool)
+        self._size = self._base
+        self._retired_base = 0
+        self._extra_ids: List[str] = []
+        self._extra_vectors: List[np.ndarray] = []
+        self._extra_matrix: Optional[np.ndarray] = None
+        self._extra_normalized: Optional[np.ndarray] = None
+        self._churn = 0
+
+        self._log_inode: Optional[int] = None
+        self._log_offset = 0
+        self._replay()
+
+
+    def _read_log(self, offset: int) -> Tuple[int, List[Dict[str, Any]], int]:
+        """Helper function for reading the complete records of the delta log after `offset`: its inode, the records and the new offset."""
+        with open(self._log_path, "rb") as f:
+            inode = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            data = f.read()
+
+        # A writer may be mid-record; leave a partial last line for the next call.
+        end = data.rfind(b"\n") + 1
+        return inode, [json.loads(line) for line in data[:end].splitlines()], offset + end
+
+
+    def _replay(self) -> None:
+        """Helper function for applying the complete records appended to the delta log since the last call."""
+        if not os.path.isfile(self._log_path):
+            return
+
+        self._log_inode, records, self._log_offset = self._read_log(self._log_offset)
+        for record in records:
+            self._apply(record)
+        self._update_metrics()
+
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        row = record["row"]
+        if record["op"] == "add":
+            self._extra_ids.append(record["id"])
+            self._extra_vectors.append(np.asarray(record["embedding"], dtype=np.float32))
+            self._extra_matrix = None
+            self._extra_normalized = None
+            self._live = np.append(self._live, True)
+            self._added[record["id"]] = row
+            self._size += 1
+            if self.index is not None and not self.mmap:
+                self.index.add_with_ids(_normalized(record["embedding"]), np.array([row], dtype=np.int64))
+        else:
+            self._live[row] = False
+            self._added.pop(record["id"], None)
+            self._size -= 1
+            self._retired_base += row < self._base
+            if self.index is not None and not self.mmap:
+                self.index.remove_ids(np.array([row], dtype=np.int64))
+        self._churn += 1
+
+
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        # Log first: a record in memory but not on disk would be lost on restart.
+        with open(self._log_path, "ab") as f:
+            f.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+        for record in records:
+            self._apply(record)
+        stat = os.stat(self._log_path)
+        self._log_inode, self._log_offset = stat.st_ino, stat.st_size
+        self._update_metrics()
+
+
+    def _update_metrics(self) -> None:
+        CATALOG_SIZE.set(len(self))
+        CATALOG_DRIFT.set(self.drift)
+
+
+    def _row(self, movie_id: str) -> Optional[int]:
+        """Helper function for finding the live row of a candidate id, or `None`."""
+        if movie_id in self._added:
+            return self._added[movie_id]
+        row = int(self.candidates.rows([movie_id])[0])
+        return row if row >= 0 and self._live[row] else None
+
+
+    def __len__(self) -> int:
+        return self._size
+
+
+    def __contains__(self, movie_id: str) -> bool:
+        return self._row(str(movie_id)) is not None
+
+
+    @property
+    def drift(self) -> float:
+        """Rows added or removed since the index was built, relative to its size then."""
+        return self._churn / max(1, self._base)
+
+
+    @property
+    def modified(self) -> bool:
+        """
+            Whether the catalog differs from the candidates the retrieval models
+            were exported with: updates since the artifact was built, or an
+            earlier compaction, which persists this in the manifest.
+        """
+        return self._churn > 0 or bool(self.candidates.manifest.get("modified", False))
+
+
+    def sync(self) -> None:
+        """
+            Pick up updates written by other processes: new delta log records,
+            or a compacted artifact (the delta log was replaced).
+        """
+        if self._changed():
+            with self._lock, self._file_lock(fcntl.LOCK_SH):
+                self._sync()
+
+
+    def _sync(self) -> None:
+        """Helper function for `sync` under a file lock the caller already holds."""
+        # `flock` locks of separate opens conflict even within one process: a
+        # writer holding the exclusive lock must not take the shared one.
+        if self._compacted():
+            self._load()
+        elif self._changed():
+            self._replay()
+
+
+    def _compacted(self) -> bool:
+        try:
+            return os.stat(self._manifest_path).st_ino != self._manifest_inode
+        except FileNotFoundError:
+            # Mid-swap: the new directory is about to be renamed into place.
+            return False
+
+
+    def _changed(self) -> bool:
+        try:
+            stat = os.stat(self._log_path)
+            log = (stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            log = (None, 0)
+        return self._compacted() or log != (self._log_inode, self._log_offset)
+
+
+    def add_with_ids(self, ids: Sequence[str], embeddings: np.ndarray) -> List[int]:
+        """
+            Add candidates, or replace the embedding of ids already in the catalog.
+
+            Parameters:
+                - ids (Sequence[str]): Distinct candidate ids.
+                - embeddings (np.ndarray): `(len(ids), dim)` candidate tower output.
+
+            Returns:
+                - (List[int]): Row (FAISS id) of every candidate.
+        """
+        ids = [str(movie_id) for movie_id in ids]
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(set(ids)) != len(ids):
+            raise ValueError("Candidate ids must be distinct.")
+        if embeddings.shape != (len(ids), self.candidates.dim):
+            raise ValueError(f"Expected embeddings of shape {(len(ids), self.candidates.dim)}, got {embeddings.shape}.")
+
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+
+            records: List[Dict[str, Any]] = []
+            rows: List[int] = []
+            next_row = len(self._live)
+            for movie_id, embedding in zip(ids, embeddings):
+                row = self._row(movie_id)
+                if row is not None:
+                    records.append({"op": "remove", "id": movie_id, "row": row, "time": time.time()})
+                records.append({"op": "add", "id": movie_id, "row": next_row, "embedding": embedding.tolist(), "time": time.time()})
+                rows.append(next_row)
+                next_row += 1
+
+            self._write(records)
+
+        CATALOG_UPDATES.labels(op="add").inc(len(ids))
+        return rows
+
+
+    def remove_ids(self, ids: Sequence[str]) -> int:
+        """
+            Retire candidates: tombstone their rows and remove them from the index.
+
+            Parameters:
+                - ids (Sequence[str]): Candidate ids; unknown ones are ignored.
+
+            Returns:
+                - (int): Number of candidates removed.
+        """
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            self._sync()
+
+            rows = {movie_id: self._row(movie_id) for movie_id in dict.fromkeys(str(movie_id) for movie_id in ids)}
+            records = [
+                {"op": "remove", "id": movie_id, "row": row, "time": time.time()}
+                for movie_id, row in rows.items() if row is not None
+            ]
+            if records:
+                self._write(records)
+
+        CATALOG_UPDATES.labels(op="remove").inc(len(records))
+        return len(records)
+
+
+    def _vectors(self) -> np.ndarray:
+        if self._extra_matrix is None:
+            self._extra_matrix = np.array(self._extra_vectors, dtype=np.float32).reshape(-1, self.candidates.dim)
+        return self._extra_matrix
+
+
+    def _search_mapped(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Helper function for searching a memory-mapped index, which the delta log
+            is not applied to: over-fetch by the retired rows and drop them, then
+            merge with an exact cosine search of the added candidates.
+        """
+        queries = _normalized(queries)
+        scores, rows = self.index.search(queries, min(k + self._retired_base, self.index.ntotal))
+        retired = rows >= 0
+        retired[retired] = ~self._live[rows[retired]]
+        scores[retired | (rows < 0)] = -np.inf
+
+        if self._extra_ids:
+            if self._extra_normalized is None:
+                self._extra_normalized = _normalized(self._vectors())
+            extra_scores = queries @ self._extra_normalized.T
+            extra_scores[:, ~self._live[self._base:]] = -np.inf
+            scores = np.concatenate([scores, extra_scores], axis=1)
+            rows = np.concatenate([rows, np.broadcast_to(self._base + np.arange(len(self._extra_ids)), extra_scores.shape)], axis=1)
+
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        scores, rows = np.take_along_axis(scores, order, axis=1), np.take_along_axis(rows, order, axis=1)
+        rows[np.isneginf(scores)] = -1
+        return scores, rows
+
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        """
+            Map rows (FAISS ids) to candidate ids.
+
+            Parameters:
+                - rows (np.ndarray): Rows; negative values (FAISS' "no result") are dropped.
+
+            Returns:
+                - (np.ndarray): The ids, as `str`.
+        """
+        rows = np.asarray(rows)
+        rows = rows[rows >= 0]
+        base = rows < self._base
+        if base.all():
+            return self.candidates.take(rows)
+
+        ids = np.empty(len(rows), dtype=object)
+        ids[base] = self.candidates.take(rows[base])
+        ids[~base] = np.take(np.array(self._extra_ids, dtype=object), rows[~base] - self._base)
+        return ids.astype(str)
+
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int,
+        approximate: bool = True,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Top-k live candidates of every query.
+
+            Parameters:
+                - queries (np.ndarray): `(n, dim)` query tower output.
+                - k (int): Number of candidates per query.
+                - approximate (bool): Use the FAISS index (cosine similarity) when
+                    available, else search every row exactly (inner product). Defaults to `True`.
+                - nprobe (int): Inverted lists visited per query. Defaults to `None` (`self.nprobe`).
+
+            Returns:
+                - (Tuple[np.ndarray, np.ndarray]): `(n, k)` scores and rows, best first.
+        """
+        self.sync()
+
+        with self._lock:
+            if approximate and self.index is not None:
+                nprobe = nprobe or self.nprobe
+                self.index.nprobe = min(nprobe, getattr(self.index, "nlist", nprobe))
+                if self.mmap:
+                    return self._search_mapped(queries, k)
+                return self.index.search(_normalized(queries), k)
+
+            queries = np.asarray(queries, dtype=np.float32)
+            scores = queries @ self.candidates.embeddings.T
+            if self._extra_ids:
+                scores = np.concatenate([scores, queries @ self._vectors().T], axis=1)
+            scores[:, ~self._live] = -np.inf
+
+        k = min(k, len(self))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+    def search_ids(
+        self,
+        queries: np.ndarray,
+        k: int,
+        approximate: bool = True,
+        nprobe: Optional[int] = None,
+    ) -> List[np.ndarray]:
+        """
+            `search` then `take` under one lock, so that a compaction reloaded in
+            between cannot renumber the rows found before they are mapped to ids.
+
+            Parameters:
+                - queries (np.ndarray): `(n, dim)` query tower output.
+                - k (int): Number of candidates per query.
+                - approximate (bool): See `search`. Defaults to `True`.
+                - nprobe (int): See `search`. Defaults to `None`.
+
+            Returns:
+                - (List[np.ndarray]): Up to `k` candidate ids per query, best first.
+        """
+        with self._lock:
+            _, rows = self.search(queries, k, approximate=approximate, nprobe=nprobe)
+            return [self.take(query_rows) for query_rows in rows]
+
+
+    def compact(self, force: bool = False) -> bool:
+        """
+            Rewrite the artifact with the live candidates only and retrain the
+            coarse quantizer, once drift exceeds the threshold. The new artifact
+            replaces the old one atomically; other workers reload it on `sync`.
+
+            The rebuild works on a snapshot of the live rows and holds no lock, so
+            that searches and updates go on meanwhile. Updates logged during the
+            rebuild are carried over into the new delta log before the swap. If
+            another worker compacted first, this one gives up.
+
+            Parameters:
+                - force (bool): Compact regardless of drift. Defaults to False.
+
+            Returns:
+                - (bool): Whether the catalog was compacted.
+        """
+        with self._lock:
+            self.sync()
+            if not force and self.drift <= self.drift_threshold:
+                return False
+
+            start = time.perf_counter()
+            live_base = np.flatnonzero(self._live[:self._base])
+            live_extra = np.flatnonzero(self._live[self._base:])
+            ids = np.concatenate([self.candidates.take(live_base), np.array(self._extra_ids, dtype=str)[live_extra]])
+            vectors = np.concatenate([self.candidates.embeddings[live_base], self._vectors()[live_extra]])
+            rows = np.concatenate([live_base, self._base + live_extra])
+            manifest_inode, log_offset = self._manifest_inode, self._log_offset
+            # Compaction resets the churn: carry over that the exports are stale.
+            modified = self.modified
+
+        parent, name = os.path.split(self.path)
+        staging = tempfile.mkdtemp(prefix=f"{name}.compact-", dir=parent or ".")
+        try:
+            manifest = write_candidates(staging, ids, vectors)
+            manifest["modified"] = modified
+            if _has_faiss:
+                # Row numbers changed: the index passed to `__init__` no longer applies.
+                faiss.write_index(build_ivf_index(vectors), os.path.join(staging, INDEX_FILE))
+                manifest["index"] = INDEX_FILE
+            with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+
+            with self._lock, self._file_lock(fcntl.LOCK_EX):
+                if os.stat(self._manifest_path).st_ino != manifest_inode:
+                    self._sync()
+                    return False
+
+                pending: List[Dict[str, Any]] = []
+                if os.path.isfile(self._log_path):
+                    _, pending, _ = self._read_log(log_offset)
+                if pending:
+                    # Renumber the rows of the records to the compacted artifact.
+                    renumbered = dict(zip(rows.tolist(), range(len(rows))))
+                    next_row = len(rows)
+                    for record in pending:
+                        if record["op"] == "add":
+                            renumbered[record["row"]] = next_row
+                            record["row"] = next_row
+                            next_row += 1
+                        else:
+                            record["row"] = renumbered.pop(record["row"])
+                    with open(os.path.join(staging, LOG_FILE), "wb") as f:
+                        f.write(b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in pending))
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                # Open memory maps keep the old files alive until they are reloaded.
+                retired = f"{self.path}.retired-{os.getpid()}"
+                os.rename(self.path, retired)
+                os.rename(staging, self.path)
+                shutil.rmtree(retired, ignore_errors=True)
+
+                self._load()
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        CATALOG_COMPACTIONS.inc()
+        _logger.info(
+            "Compacted the catalog to %d candidates in %.1fs, carrying over %d updates.",
+            len(ids), time.perf_counter() - start, len(pending),
+        )
+        return True
+
+
+    def start_compaction(self, interval: float) -> threading.Thread:
+        """
+            Check drift every `interval` seconds in a daemon thread and compact
+            when it exceeds the threshold. Safe to start in every worker: the
+            first to take the file lock compacts, the others then see no drift.
+
+            Parameters:
+                - interval (float): Seconds between checks.
+
+            Returns:
+                - (threading.Thread): The started thread.
+        """
+        def run() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact()
+                except Exception:
+                    _logger.exception("Catalog compaction failed.")
+
+        thread = threading.Thread(target=run, name="catalog-compaction", daemon=True)
+        thread.start()
+        return thread
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+            Returns:
+                - (Dict[str, Any]): Size, drift and pending delta log records of the catalog.
+        """
+        self.sync()
+        return {
+            "candidates": len(self),
+            "rows": int(len(self._live)),
+            "drift": self.drift,
+            "drift_threshold": self.drift_threshold,
+            "modified": self.modified,
+            "index": type(self.index).__name__ if self.index is not None else None,
+            "index_size": int(self.index.ntotal) if self.index is not None else None,
+            "index_mmap": self.mmap,
+            "delta_records": self._churn,
+        }
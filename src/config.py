@@ -1,22 +1,50 @@
 from os import getenv
 from dotenv import load_dotenv
 
+from admission import DEFAULT_LADDER
+
 load_dotenv()
 
 
 # --- Prometeus ---
 PROMETHEUS_SERVER_PORT: int = int(getenv("PROMETHEUS_SERVER_PORT"))
+# Metric files shared by the API workers when API_WORKERS > 1. Cleared at startup.
+PROMETHEUS_MULTIPROC_DIR: str = getenv("PROMETHEUS_MULTIPROC_DIR")
 
 # --- API ---
 API_PORT: int               = int(getenv("API_PORT"))
 API_WORKERS: int            = int(getenv("API_WORKERS", 1))
 API_RELOAD: bool            = getenv("API_RELOAD", 'True').lower() in ('true', '1', 't')
 API_LOG_LEVEL: str          = getenv("API_LOG_LEVEL", "info")
+# Admission control, per worker: inference slots (0 disables), seconds a request
+# may queue for one, and the pressure at which each degradation step applies
+# (`src/admission.py`).
+ADMISSION_MAX_CONCURRENCY: int  = int(getenv("ADMISSION_MAX_CONCURRENCY", 0))
+ADMISSION_QUEUE_BUDGET: float   = float(getenv("ADMISSION_QUEUE_BUDGET", 0.05))
+DEGRADATION_LADDER: str         = getenv("DEGRADATION_LADDER", DEFAULT_LADDER)
+# Inverted lists the FAISS search visits under the `reduce_nprobe` step.
+DEGRADED_NPROBE: int            = int(getenv("DEGRADED_NPROBE", 2))
+# Deadline of requests without an `X-Request-Timeout` header, in seconds (0: none).
+REQUEST_TIMEOUT: float          = float(getenv("REQUEST_TIMEOUT", 0))
+# Read the memory-mapped artifacts into the page cache before starting the workers.
+API_PRELOAD: bool           = getenv("API_PRELOAD", 'False').lower() in ('true', '1', 't')
 
 # -- Models ---
 SCANN_PATH: str             = getenv("SCANN_PATH")
 BRUTE_PATH: str             = getenv("BRUTE_PATH")
 RANKING_PATH: str           = getenv("RANKING_PATH")
 QUERY_TOWER_PATH: str       = getenv("QUERY_TOWER_PATH")
+CANDIDATE_TOWER_PATH: str   = getenv("CANDIDATE_TOWER_PATH")
 FAISS_INDEX_PATH: str       = getenv("FAISS_INDEX_PATH")
-FAISS_IDS_PATH: str         = getenv("FAISS_IDS_PATH")
+# Memory-map the FAISS index instead of reading a copy into every worker (read-only).
+FAISS_MMAP: bool            = getenv("FAISS_MMAP", 'False').lower() in ('true', '1', 't')
+# Candidate artifact (`src/candidates.py`): embeddings and ids of every movie.
+CANDIDATES_PATH: str        = getenv("CANDIDATES_PATH")
+# Catalog updates (`src/catalog.py`): share of added or retired movies that
+# triggers a rebuild of the FAISS index, checked every interval (0 disables).
+CATALOG_DRIFT_THRESHOLD: float  = float(getenv("CATALOG_DRIFT_THRESHOLD", 0.2))
+CATALOG_COMPACT_INTERVAL: float = float(getenv("CATALOG_COMPACT_INTERVAL", 300))
+# Required by the admin endpoints in the `X-Admin-Token` header; unset disables them.
+ADMIN_TOKEN: str            = getenv("ADMIN_TOKEN")
+# Quantized variant of the query tower and ranking model: float32, int8, dynamic or float16.
+MODEL_VARIANT: str          = getenv("MODEL_VARIANT", "float32")
@@ -0,0 +1,82 @@
+from typing import Optional
+import math
+import time
+
+from prometheus_client import Counter
+
+# Seconds the caller will wait for the response, relative to its arrival so
+# that client and server clocks need not agree (like gRPC's `grpc-timeout`).
+TIMEOUT_HEADER: str = "X-Request-Timeout"
+
+DEADLINE_EXCEEDED = Counter(
+    "deadline_exceeded_total",
+    "Requests abandoned because their deadline passed, or their client left, by the stage that noticed.",
+    ["stage"],
+)
+
+
+class DeadlineExceeded(Exception):
+
+    def __init__(self, stage: str) -> 'DeadlineExceeded':
+        super().__init__(f"Deadline exceeded before {stage}.")
+        self.stage = stage
+
+
+class Deadline:
+
+    def __init__(self, timeout: Optional[float] = None, start: Optional[float] = None) -> 'Deadline':
+        """
+            Time a request has left. Every stage checks it before starting work
+            the caller will no longer wait for.
+
+            Parameters:
+                - timeout (float): Seconds from `start`. Defaults to `None` (no deadline).
+                - start (float): `time.monotonic()` of the arrival. Defaults to `None` (now).
+        """
+        start = time.monotonic() if start is None else start
+        self.expires = start + timeout if timeout is not None and timeout > 0 else math.inf
+        self.cancelled = False
+
+
+    @classmethod
+    def from_header(cls, value: Optional[str], default: Optional[float] = None) -> 'Deadline':
+        """
+            Parameters:
+                - value (str): The `TIMEOUT_HEADER` value; invalid values are ignored.
+                - default (float): Timeout without a valid header. Defaults to `None`.
+
+            Returns:
+                - (Deadline): The request deadline.
+        """
+        try:
+            timeout = float(value) if value is not None else default
+        except ValueError:
+            timeout = default
+        return cls(timeout)
+
+
+    def remaining(self) -> float:
+        """Seconds left, `math.inf` without a deadline."""
+        return self.expires - time.monotonic()
+
+
+    def cancel(self) -> None:
+        """Expire the deadline now, e.g. once the client disconnected."""
+        self.cancelled = True
+
+
+    @property
+    def expired(self) -> bool:
+        return self.cancelled or self.remaining() <= 0
+
+
+    def check(self, stage: str) -> None:
+        """
+            Raise `DeadlineExceeded` (and count it) if the deadline passed.
+
+            Parameters:
+                - stage (str): The stage about to start, e.g. "ranking".
+        """
+        if self.expired:
+            DEADLINE_EXCEEDED.labels(stage=stage).inc()
+            raise DeadlineExceeded(stage)
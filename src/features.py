@@ -0,0 +1,175 @@
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+import operator
+
+import numpy as np
+import pandas as pd
+
+# Features of the exported SavedModel signatures and their NumPy dtypes. `str`
+# features are object arrays of `str`, which TensorFlow converts to tf.string.
+# The feature store, the export signatures and the API request models are all
+# derived from these.
+USER_SCHEMA: Dict[str, Any] = {
+    "user_id":                  str,
+    "user_gender":              np.int32,
+    "user_zip_code":            str,
+    "user_bucketized_age":      np.float32,
+    "user_occupation_label":    np.int32,
+}
+
+MOVIE_SCHEMA: Dict[str, Any] = {
+    "movie_id":                 str,
+    "movie_title":              str,
+    "movie_release_year":       str,
+}
+
+# Kinds of input arrays each dtype kind accepts: no silent float -> int
+# truncation, no parsing of numbers out of strings.
+_ACCEPTED_KINDS: Dict[str, str] = {
+    "i": "biu",
+    "u": "bu",
+    "f": "biuf",
+    "b": "b",
+}
+
+
+def python_type(dtype: Any) -> type:
+    """Python type of a schema dtype, e.g. for request models."""
+    if dtype is str:
+        return str
+    return {"i": int, "u": int, "f": float, "b": bool}[np.dtype(dtype).kind]
+
+
+def request_model(name: str, schema: Mapping[str, Any]) -> type:
+    """
+        Pydantic model of a schema, to validate requests against.
+
+        Parameters:
+            - name (str): Model name.
+            - schema (Mapping[str, Any]): Feature names and dtypes, e.g. `USER_SCHEMA`.
+
+        Returns:
+            - (type): The model class.
+    """
+    from pydantic import create_model
+
+    return create_model(name, **{feature: (python_type(dtype), ...) for feature, dtype in schema.items()})
+
+
+class FeatureEncoder:
+
+    def __init__(self, schema: Mapping[str, Any], names: Optional[Iterable[str]] = None) -> 'FeatureEncoder':
+        """
+            Turns records (dictionaries or objects with one attribute per
+            feature, e.g. request models) or data frames into one typed, batched
+            NumPy array per feature, as the SavedModel signatures take them.
+
+            The getters are built once: encoding a batch reads every record with
+            a single `itemgetter`/`attrgetter` call and converts every feature
+            column once. Values of the wrong type raise a `ValueError` naming
+            the feature instead of failing inside the model.
+
+            Parameters:
+                - schema (Mapping[str, Any]): Feature names and dtypes, e.g. `USER_SCHEMA`.
+                - names (Iterable[str]): Features to encode, e.g. the inputs of a
+                    signature. Defaults to `None` (the whole schema).
+        """
+        names = list(schema) if names is None else [name for name in schema if name in set(names)]
+        self.dtypes: Dict[str, Any] = {name: schema[name] for name in names}
+        self.names: List[str] = names
+
+        self._items = operator.itemgetter(*names) if names else None
+        self._attrs = operator.attrgetter(*names) if names else None
+
+
+    @classmethod
+    def for_signature(cls, schema: Mapping[str, Any], signature: Any) -> 'FeatureEncoder':
+        """
+            Encoder of the inputs of a SavedModel signature. Inputs outside the
+            schema (e.g. `k`) are left to the caller.
+
+            Parameters:
+                - schema (Mapping[str, Any]): Feature names and dtypes.
+                - signature (Any): A concrete function, e.g. `loaded.signatures['call']`.
+
+            Returns:
+                - (FeatureEncoder): The encoder.
+        """
+        specs = signature.structured_input_signature[1]
+        for name, spec in specs.items():
+            if name not in schema:
+                continue
+            expected = object if schema[name] is str else np.dtype(schema[name])
+            if np.dtype(spec.dtype.as_numpy_dtype) != np.dtype(expected):
+                raise ValueError(f"Signature input {name!r} is {spec.dtype.name}, the schema says {schema[name]}.")
+        return cls(schema, specs)
+
+
+    def _column(self, name: str, values: Sequence[Any]) -> np.ndarray:
+        dtype = self.dtypes[name]
+        array = np.asarray(values)
+        if dtype is str:
+            if array.dtype.kind != "U" and not (array.dtype == object and all(isinstance(v, str) for v in array)):
+                raise ValueError(f"Feature {name!r} expects strings, got {array.dtype}.")
+            return array.astype(object)
+
+        if array.dtype.kind not in _ACCEPTED_KINDS[np.dtype(dtype).kind]:
+            raise ValueError(f"Feature {name!r} expects {np.dtype(dtype)}, got {array.dtype}.")
+        return array.astype(dtype, copy=False)
+
+
+    def encode(self, records: Sequence[Any]) -> Dict[str, np.ndarray]:
+        """
+            Encode records.
+
+            Parameters:
+                - records (Sequence[Any]): Dictionaries or objects with one key or attribute per feature.
+
+            Returns:
+                - (Dict[str, np.ndarray]): One `(len(records),)` array per feature.
+        """
+        if not self.names:
+            return {}
+        if not len(records):
+            return {name: np.empty(0, dtype=object if dtype is str else dtype) for name, dtype in self.dtypes.items()}
+
+        getter = self._items if isinstance(records[0], Mapping) else self._attrs
+        try:
+            rows = [getter(record) for record in records]
+        except (KeyError, AttributeError) as exc:
+            raise ValueError(f"Missing feature {exc}.") from None
+        columns = zip(*rows) if len(self.names) > 1 else [rows]
+        return {name: self._column(name, column) for name, column in zip(self.names, columns)}
+
+
+    def encode_frame(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """
+            Encode the rows of a data frame, e.g. for batch inference. String
+            features are formatted with `str`, as the raw tables store some ids as numbers.
+
+            Parameters:
+                - df (pd.DataFrame): One column per feature; others are ignored.
+
+            Returns:
+                - (Dict[str, np.ndarray]): One `(len(df),)` array per feature.
+        """
+        missing = [name for name in self.names if name not in df.columns]
+        if missing:
+            raise ValueError(f"Missing features {missing}.")
+        return {
+            name: df[name].astype(str).to_numpy(dtype=object) if dtype is str else self._column(name, df[name].to_numpy())
+            for name, dtype in self.dtypes.items()
+        }
+
+
+    def to_records(self, features: Mapping[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """
+            Inverse of `encode`: plain Python records, e.g. JSON request bodies.
+
+            Parameters:
+                - features (Mapping[str, np.ndarray]): Encoded features.
+
+            Returns:
+                - (List[Dict[str, Any]]): One dictionary per row.
+        """
+        columns = [features[name].tolist() for name in self.names]
+        return [dict(zip(self.names, row)) for row in zip(*columns)]
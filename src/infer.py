@@ -1,8 +1,8 @@
-from typing import Dict, Any, Tuple, List
+from typing import Dict, Any, Tuple, List, Optional
 import os
 import time
-import json
 
+import numpy as np
 import tensorflow as tf
 from prometheus_client import Gauge
 
@@ -11,9 +11,16 @@ from config import (
     BRUTE_PATH,
     RANKING_PATH,
     QUERY_TOWER_PATH,
+    CANDIDATE_TOWER_PATH,
     FAISS_INDEX_PATH,
-    FAISS_IDS_PATH,
+    FAISS_MMAP,
+    CANDIDATES_PATH,
+    CATALOG_DRIFT_THRESHOLD,
+    MODEL_VARIANT,
 )
+from catalog import CatalogIndex
+from deadline import Deadline
+from features import MOVIE_SCHEMA, USER_SCHEMA, FeatureEncoder
 
 try:
     import scann  # noqa: F401
@@ -21,41 +28,65 @@ try:
 except Exception:
     _has_scann = False
 
-try:
-    import faiss  # type: ignore
-    _has_faiss = True
-except Exception:
-    _has_faiss = False
-
 def _has_saved_model(path: str) -> bool:
     return os.path.isfile(os.path.join(path, "saved_model.pb")) or \
         os.path.isfile(os.path.join(path, "saved_model.pbtxt"))
 
+def _variant_path(path: str) -> str:
+    # Quantized exports sit next to the float32 one, e.g. `ranking/pointwise_int8`.
+    if not path or MODEL_VARIANT == "float32":
+        return path
+    return f"{path.rstrip('/')}_{MODEL_VARIANT}"
+
 MODEL_LOAD_TIME = Gauge(
     "model_load_time_seconds",
     "Time spent loading models at startup.",
+    # Slowest worker, when several API workers share the metrics.
+    multiprocess_mode = "max",
 )
 
 _load_start = time.perf_counter()
 scann_retrieval = tf.saved_model.load(SCANN_PATH) if _has_scann and _has_saved_model(SCANN_PATH) else None
 brute_retrieval = tf.saved_model.load(BRUTE_PATH) if _has_saved_model(BRUTE_PATH) else None
-ranking = tf.saved_model.load(RANKING_PATH) if _has_saved_model(RANKING_PATH) else None
-query_tower = tf.saved_model.load(QUERY_TOWER_PATH) if QUERY_TOWER_PATH and _has_saved_model(QUERY_TOWER_PATH) else None
-
-faiss_index = None
-faiss_ids: List[str] = []
-if _has_faiss and FAISS_INDEX_PATH and FAISS_IDS_PATH:
-    if os.path.isfile(FAISS_INDEX_PATH) and os.path.isfile(FAISS_IDS_PATH):
-        faiss_index = faiss.read_index(FAISS_INDEX_PATH)
-        with open(FAISS_IDS_PATH, "r", encoding="utf-8") as f:
-            faiss_ids = json.load(f)
+ranking = tf.saved_model.load(_variant_path(RANKING_PATH)) if _has_saved_model(_variant_path(RANKING_PATH)) else None
+query_tower = tf.saved_model.load(_variant_path(QUERY_TOWER_PATH)) if QUERY_TOWER_PATH and _has_saved_model(_variant_path(QUERY_TOWER_PATH)) else None
+# Float32 only: new candidates must land in the same space as the artifact's.
+candidate_tower = tf.saved_model.load(CANDIDATE_TOWER_PATH) if CANDIDATE_TOWER_PATH and _has_saved_model(CANDIDATE_TOWER_PATH) else None
+
+# Candidate artifact and FAISS index, plus the movies added or retired since
+# (`src/catalog.py`). Memory-mapped and shared by every backend.
+catalog = CatalogIndex(
+    CANDIDATES_PATH,
+    index_path = FAISS_INDEX_PATH,
+    drift_threshold = CATALOG_DRIFT_THRESHOLD,
+    mmap = FAISS_MMAP,
+) if CANDIDATES_PATH and os.path.isdir(CANDIDATES_PATH) else None
 MODEL_LOAD_TIME.set(time.perf_counter() - _load_start)
 
 
+def _encoder(schema: Dict[str, Any], model: Any) -> Optional[FeatureEncoder]:
+    return FeatureEncoder.for_signature(schema, model.signatures['call']) if model is not None else None
+
+def _tensors(features: Dict[str, np.ndarray]) -> Dict[str, tf.Tensor]:
+    return {name: tf.convert_to_tensor(values) for name, values in features.items()}
+
+# Typed, batched inputs of every signature (`src/features.py`): a signature whose
+# dtypes disagree with the schema fails here, at startup. Exports that precompute
+# text features (e.g. the movie title) no longer take them, so they are not encoded.
+query_encoder         = _encoder(USER_SCHEMA, query_tower)
+scann_encoder         = _encoder(USER_SCHEMA, scann_retrieval)
+brute_encoder         = _encoder(USER_SCHEMA, brute_retrieval)
+ranking_user_encoder  = _encoder(USER_SCHEMA, ranking)
+ranking_movie_encoder = _encoder(MOVIE_SCHEMA, ranking)
+candidate_encoder     = _encoder(MOVIE_SCHEMA, candidate_tower)
+
+
 def retrieve(
     user: Dict[str, Any],
     k: int,
-    approximate: bool = True
+    approximate: bool = True,
+    nprobe: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
 ) -> list:
     """
         Perform retrieval for a given user.
@@ -65,15 +96,23 @@ def retrieve(
             - k (int): The number of items to retrieve.
             - approximate (bool): Whether to use an approximate nearest neighbors 
                 search or an exact search. Defaults to `True`.
+            - nprobe (int): Inverted lists the FAISS search visits. Defaults to
+                `None` (the catalog's setting).
+            - deadline (Deadline): Checked before each stage. Defaults to `None`.
 
         Returns:
             - identifiers (list): A list of item identifiers.
     """
-    user_tensors = {k: tf.convert_to_tensor([v]) for k, v in user.items()}
-
-    if approximate and faiss_index is not None and query_tower is not None and faiss_ids:
-        # FAISS ANN retrieval (IndexIVFFlat expected)
-        out = query_tower.signatures["call"](**user_tensors)
+    deadline = deadline or Deadline()
+    deadline.check("query_tower")
+
+    # FAISS when approximate, else the catalog when there is no BruteForce export
+    # or the catalog was modified since it was exported (the ScaNN and BruteForce
+    # exports only know the movies they were trained with).
+    use_faiss = approximate and catalog is not None and catalog.index is not None
+    use_exact = not approximate and catalog is not None and (brute_retrieval is None or catalog.modified)
+    if query_tower is not None and (use_faiss or use_exact):
+        out = query_tower.signatures["call"](**_tensors(query_encoder.encode([user])))
         if isinstance(out, dict):
             if "embedding" in out:
                 query_vec = out["embedding"]
@@ -83,21 +122,27 @@ def retrieve(
         else:
             query_vec = out
         query_vec = query_vec.numpy().astype("float32")
-        faiss.normalize_L2(query_vec)
-        faiss_index.nprobe = min(10, getattr(faiss_index, "nlist", 10))
-        _, indices = faiss_index.search(query_vec, k)
-        identifiers = [faiss_ids[i] for i in indices[0]]
-        return identifiers
+        deadline.check("search")
+
+        # FAISS ANN retrieval (IndexIVFFlat expected) or exact inner product search
+        return catalog.search_ids(query_vec, k, approximate=use_faiss, nprobe=nprobe)[0].tolist()
 
     if approximate and scann_retrieval is not None:
-        _ = scann_retrieval.signatures['call'](**user_tensors, k=k)  # Approximate
+        _ = scann_retrieval.signatures['call'](**_tensors(scann_encoder.encode([user])), k=k)  # Approximate
     else:
         if brute_retrieval is None:
             raise RuntimeError("Brute-force retrieval model is not available.")
-        _ = brute_retrieval.signatures['call'](**user_tensors, k=k)  # Exact
+        _ = brute_retrieval.signatures['call'](**_tensors(brute_encoder.encode([user])), k=k)  # Exact
+
+    identifiers = _['output_0'].numpy()
+    affnities   = _['output_1'].numpy()
 
-    identifiers = _['output_0'].numpy().tolist()
-    affnities   = _['output_1'].numpy().tolist()
+    # Batch-dynamic exports (`src/model/export.py`) return one row per query.
+    if identifiers.ndim == 2:
+        identifiers, affnities = identifiers[0], affnities[0]
+
+    identifiers = identifiers.tolist()
+    affnities   = affnities.tolist()
 
     return identifiers
 
@@ -105,6 +150,7 @@ def retrieve(
 def rank(
     user: Dict[str, Any],
     movie: Dict[str, Any],
+    deadline: Optional[Deadline] = None,
 ) -> float:
     """
         Perform ranking for a given user and movie.
@@ -112,19 +158,85 @@ def rank(
         Parameters:
             - user (Dict[str, Any]): A dictionary containing the user's features.
             - movie (Dict[str, Any]): A dictionary containing the movie's features.
+            - deadline (Deadline): Checked before scoring. Defaults to `None`.
 
         Returns:
             - score (float): A score representing how well the movie matches the user's preferences.
     """
-    user_tensors  = {k: tf.convert_to_tensor([v]) for k, v in user.items()}
-    movie_tensors = {k: tf.convert_to_tensor([v]) for k, v in movie.items()}
+    return rank_movies(user, [movie], deadline=deadline)[0]
+
+
+def rank_movies(
+    user: Dict[str, Any],
+    movies: List[Any],
+    deadline: Optional[Deadline] = None,
+) -> List[float]:
+    """
+        Score a slate for a given user in one call of the ranking signature.
 
+        Parameters:
+            - user (Dict[str, Any]): A dictionary containing the user's features.
+            - movies (List[Any]): The movies' features, as dictionaries or request models.
+            - deadline (Deadline): Checked before scoring. Defaults to `None`.
+
+        Returns:
+            - scores (List[float]): The score of every movie, in order.
+    """
     if ranking is None:
         raise RuntimeError("Ranking model is not available.")
-    _ = ranking.signatures['call'](**user_tensors, **movie_tensors)
-    score = _['output_0'].numpy()[0][0].tolist()
+    if deadline is not None:
+        deadline.check("ranking")
+    if not movies:
+        return []
+
+    # The user is encoded once and repeated along the slate.
+    features = {
+        **{name: np.repeat(values, len(movies)) for name, values in ranking_user_encoder.encode([user]).items()},
+        **ranking_movie_encoder.encode(movies),
+    }
+    _ = ranking.signatures['call'](**_tensors(features))
+    return _['output_0'].numpy().reshape(-1).tolist()
+
+
+def _embed_movies(movies: List[Dict[str, Any]]) -> np.ndarray:
+    if candidate_tower is None:
+        raise RuntimeError("Candidate tower model is not available.")
+
+    out = candidate_tower.signatures['call'](**_tensors(candidate_encoder.encode(movies)))
+    return out["embedding"].numpy().astype("float32")
+
+
+def add_movies(movies: List[Dict[str, Any]]) -> List[int]:
+    """
+        Embed movies with the candidate tower and add them to the catalog, or
+        update the embedding of movies it already holds.
+
+        Parameters:
+            - movies (List[Dict[str, Any]]): Dictionaries containing the movies' features.
+
+        Returns:
+            - rows (List[int]): The FAISS id of every movie.
+    """
+    if catalog is None:
+        raise RuntimeError("Candidate catalog is not available.")
+
+    return catalog.add_with_ids([movie['movie_id'] for movie in movies], _embed_movies(movies))
+
+
+def remove_movies(movie_ids: List[str]) -> int:
+    """
+        Retire movies from the catalog.
+
+        Parameters:
+            - movie_ids (List[str]): Identifiers of the movies.
+
+        Returns:
+            - removed (int): The number of movies removed.
+    """
+    if catalog is None:
+        raise RuntimeError("Candidate catalog is not available.")
 
-    return score
+    return catalog.remove_ids(movie_ids)
 
 
 def choose_model_version(user_id: str) -> str:
@@ -1,5 +1,6 @@
+import os
+import tempfile
 import uvicorn
-from prometheus_client import start_http_server
 
 # Third-party
 from config import (
@@ -7,14 +8,36 @@ from config import (
     API_LOG_LEVEL,
     API_RELOAD,
     API_WORKERS,
+    API_PRELOAD,
+    CANDIDATES_PATH,
+    FAISS_INDEX_PATH,
     PROMETHEUS_SERVER_PORT,
+    PROMETHEUS_MULTIPROC_DIR,
 )
 
 
 if __name__ == "__main__":
 
-    # Prometheus
-    start_http_server(PROMETHEUS_SERVER_PORT)
+    # Several workers share their metrics through files. prometheus_client picks
+    # its storage on import, so the directory is set (and inherited by every
+    # worker) before anything imports it.
+    if API_WORKERS > 1 and not API_RELOAD:
+        multiproc_dir = PROMETHEUS_MULTIPROC_DIR or os.path.join(tempfile.gettempdir(), "prometheus_multiproc")
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+
+    from prometheus_client import start_http_server
+    from metrics import clear_multiprocess_dir, exposition_registry, multiprocess_dir
+
+    if multiprocess_dir() is not None:
+        clear_multiprocess_dir(multiprocess_dir())
+
+    # Prometheus: the sum of every worker in multiprocess mode
+    start_http_server(PROMETHEUS_SERVER_PORT, registry=exposition_registry())
+
+    # Memory-mapped artifacts: read once here, shared by the workers' mappings
+    if API_PRELOAD:
+        from preload import artifact_files, warm_page_cache
+        warm_page_cache(artifact_files(CANDIDATES_PATH, FAISS_INDEX_PATH))
 
     # Api
     uvicorn.run(
@@ -0,0 +1,163 @@
+from typing import Dict, Iterator, Optional, Set
+import os
+import glob
+import threading
+
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+# With several API workers, prometheus_client keeps every metric in memory-mapped
+# files of this directory and the exposition aggregates them. It picks its
+# storage when first imported, so `main.py` sets the variable before that.
+MULTIPROC_DIR_ENV: str = "PROMETHEUS_MULTIPROC_DIR"
+
+# Values seen by a worker, one per line after a "# documentation" header.
+_DISTINCT_GLOB: str = "distinct_*.txt"
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get(MULTIPROC_DIR_ENV) or None
+
+
+def clear_multiprocess_dir(path: str) -> None:
+    """
+        Create the multiprocess directory, or remove the metric files a previous
+        run left in it: they would otherwise be aggregated with the new ones.
+
+        Parameters:
+            - path (str): Directory.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, "*.db")) + glob.glob(os.path.join(path, _DISTINCT_GLOB)):
+        os.remove(name)
+
+
+class DistinctGauge(Collector):
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        registry: CollectorRegistry = REGISTRY,
+    ) -> 'DistinctGauge':
+        """
+            Gauge of the number of distinct values seen since startup, e.g. users.
+
+            A sum of per-worker counts would count a value once per worker that
+            saw it, so in multiprocess mode every worker appends the values new
+            to it to its own file, and `exposition_registry` counts their union.
+
+            Parameters:
+                - name (str): Metric name.
+                - documentation (str): Metric help text.
+                - registry (CollectorRegistry): Registry of the single-process mode. Defaults to `REGISTRY`.
+        """
+        self.name          = name
+        self.documentation = documentation
+
+        self._values: Set[str] = set()
+        self._lock = threading.Lock()
+
+        path = multiprocess_dir()
+        self._file = None
+        if path is not None:
+            self._file = open(os.path.join(path, f"distinct_{name}_{os.getpid()}.txt"), "a", encoding="utf-8")
+            self._file.write(f"# {documentation}\n")
+            self._file.flush()
+        elif registry is not None:
+            registry.register(self)
+
+
+    def add(self, value: str) -> None:
+        """
+            Account for a value.
+
+            Parameters:
+                - value (str): The value, e.g. a user id.
+        """
+        value = str(value)
+        with self._lock:
+            if value in self._values:
+                return
+            self._values.add(value)
+            if self._file is not None:
+                self._file.write(value.replace("\n", " ") + "\n")
+                self._file.flush()
+
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        yield GaugeMetricFamily(self.name, self.documentation, value=len(self._values))
+
+
+class _MultiProcessDistinctCollector(Collector):
+    """Union of the values `DistinctGauge`s of every worker wrote, read incrementally."""
+
+    def __init__(self, path: str, registry: CollectorRegistry) -> '_MultiProcessDistinctCollector':
+        self._path = path
+        self._lock = threading.Lock()
+        self._offsets: Dict[str, int] = {}
+        self._values: Dict[str, Set[str]] = {}
+        self._documentation: Dict[str, str] = {}
+        registry.register(self)
+
+
+    def _read(self, filename: str) -> None:
+        name = os.path.basename(filename)[len("distinct_"):].rsplit("_", 1)[0]
+        values = self._values.setdefault(name, set())
+
+        with open(filename, "rb") as f:
+            f.seek(self._offsets.get(filename, 0))
+            data = f.read()
+        # A worker may be mid-line; leave it for the next scrape.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8").splitlines():
+            if line.startswith("# "):
+                self._documentation[name] = line[2:]
+            else:
+                values.add(line)
+        self._offsets[filename] = self._offsets.get(filename, 0) + end
+
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        with self._lock:
+            for filename in glob.glob(os.path.join(self._path, _DISTINCT_GLOB)):
+                self._read(filename)
+            for name, values in self._values.items():
+                yield GaugeMetricFamily(name, self._documentation.get(name, ""), value=len(values))
+
+
+def exposition_registry() -> CollectorRegistry:
+    """
+        Registry to expose: the default one, or in multiprocess mode one that
+        aggregates the metrics of every worker (counters and histograms summed,
+        gauges by their `multiprocess_mode`, distinct values united).
+
+        Returns:
+            - (CollectorRegistry): The registry.
+    """
+    path = multiprocess_dir()
+    if path is None:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path)
+    _MultiProcessDistinctCollector(path, registry)
+    return registry
+
+
+def mark_process_dead(pid: Optional[int] = None) -> None:
+    """
+        Drop the live gauges of an exiting worker (`multiprocess_mode` "live*").
+        Its counters, histograms and distinct values keep counting.
+
+        Parameters:
+            - pid (int): Worker process id. Defaults to `None` (this process).
+    """
+    path = multiprocess_dir()
+    if path is not None:
+        multiprocess.mark_process_dead(pid or os.getpid(), path)
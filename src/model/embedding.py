@@ -1,30 +1,303 @@
 import numpy as np
 from typing import List
 import tensorflow as tf
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+# Third-party
+from src.model.vocabulary import Vocabularies, standardize
+
+
+def _new_values(known: List, values: np.ndarray) -> List:
+    """Helper function for listing the values of a vocabulary missing from a lookup layer, in vocabulary order."""
+    values = [v.decode("utf-8") if isinstance(v, bytes) else v.item() if isinstance(v, np.generic) else v for v in values]
+    known = set(known)
+    return [v for v in values if v not in known]
+
+
+def _grow_table(embedding: tf.keras.layers.Embedding, n_rows: int) -> tf.keras.layers.Embedding:
+    """Helper function for appending `n_rows` freshly initialized rows to a built embedding table."""
+    grown = tf.keras.layers.Embedding(
+        input_dim = embedding.input_dim + n_rows,
+        output_dim = embedding.output_dim,
+        mask_zero = embedding.mask_zero,
+    )
+    grown.build((None,))
+    grown.embeddings[:embedding.input_dim].assign(embedding.embeddings)
+    return grown
+
+
+class HashEmbedding(tf.keras.layers.Layer):
+
+    def __init__(
+        self,
+        num_bins: int,
+        embedding_dim: int,
+        num_hashes: int = 1,
+        **kwargs,
+    ) -> 'HashEmbedding':
+        """
+            Embedding of a string or integer feature through hashing, with a table
+            of `num_hashes * num_bins` rows regardless of the feature cardinality.
+
+            Parameters:
+                - num_bins (int): Number of hash bins per hash function.
+                - embedding_dim (int): Embeddimg dimentionality.
+                - num_hashes (int): Number of salted hash functions whose rows are summed. Defaults to 1.
+        """
+        super().__init__(**kwargs)
+
+        self.num_bins      = num_bins
+        self.embedding_dim = embedding_dim
+        self.num_hashes    = num_hashes
+
+        # The first hash function is the unsalted (fast) one, the others
+        # use distinct salts so that they collide on different values.
+        self._hashings = [
+            tf.keras.layers.Hashing(
+                num_bins = num_bins,
+                salt = None if i == 0 else [i, num_bins],
+            )
+            for i in range(num_hashes)
+        ]
+        self._embedding = tf.keras.layers.Embedding(
+            input_dim = num_bins * num_hashes,
+            output_dim = embedding_dim,
+        )
+
+
+    def call(self, inputs: tf.Tensor) -> tf.Tensor:
+        """
+            Calls the layer on a batch of raw values.
+
+            Parameters:
+                - inputs (tf.Tensor): Raw string or integer values.
+
+            Returns:
+                - (tf.Tensor): The embeddings.
+        """
+        # Each hash function owns its own block of `num_bins` rows.
+        indices = tf.stack(
+            [
+                hashing(inputs) + i * self.num_bins
+                for i, hashing in enumerate(self._hashings)
+            ],
+            axis = -1,
+        )
+        return tf.reduce_sum(self._embedding(indices), axis=-2)
+
+
+    def get_config(self) -> Dict[str, int]:
+        config = super().get_config()
+        config.update(
+            {
+                "num_bins": self.num_bins,
+                "embedding_dim": self.embedding_dim,
+                "num_hashes": self.num_hashes,
+            }
+        )
+        return config
+
+
+class FusedEmbedding(tf.keras.layers.Layer):
+
+    def __init__(
+        self,
+        vocabularies: Dict[str, np.ndarray],
+        embedding_dim: int,
+        int_features: List[str] = [],
+        num_oov_indices: Dict[str, int] = {},
+        **kwargs,
+    ) -> 'FusedEmbedding':
+        """
+            Embedding of several categorical features through one shared table.
+
+            Every feature owns a contiguous block of rows (its vocabulary plus
+            its OOV buckets), so all features are embedded with a single gather
+            whose output is already concatenated in feature order.
+
+            Parameters:
+                - vocabularies (Dict[str, np.ndarray]): Vocabulary of each feature, in output order.
+                - embedding_dim (int): Embeddimg dimentionality.
+                - int_features (List[str]): Features looked up with an `IntegerLookup`; the
+                    others use a `StringLookup`. Defaults to [].
+                - num_oov_indices (Dict[str, int]): Number of hashed out-of-vocabulary buckets
+                    of a feature. Defaults to 1.
+        """
+        super().__init__(**kwargs)
+
+        self.features      = list(vocabularies.keys())
+        self.embedding_dim = embedding_dim
+
+        self._lookups: Dict[str, tf.keras.layers.Layer] = {}
+        offsets: List[int] = []
+        n_rows = 0
+        for feature, vocabulary in vocabularies.items():
+            lookup_layer = (
+                tf.keras.layers.IntegerLookup
+                if feature in int_features
+                else tf.keras.layers.StringLookup
+            )
+            oov = num_oov_indices.get(feature, 1)
+            self._lookups[feature] = lookup_layer(
+                mask_token = None,
+                vocabulary = vocabulary,
+                num_oov_indices = oov,
+            )
+            offsets.append(n_rows)
+            n_rows += len(vocabulary) + oov
+
+        self._offsets = tf.constant(offsets, dtype=tf.int64)
+        self._embedding = tf.keras.layers.Embedding(
+            input_dim = n_rows,
+            output_dim = embedding_dim,
+        )
+
+
+    def extended(self, vocabularies: Dict[str, np.ndarray]) -> 'FusedEmbedding':
+        """
+            Copy of the (built) layer whose features also know the values of
+            `vocabularies` they are missing. Every block keeps its trained rows
+            and gets new rows appended.
+
+            Parameters:
+                - vocabularies (Dict[str, np.ndarray]): Vocabulary of some of the fused features.
+
+            Returns:
+                - (FusedEmbedding): The grown layer.
+        """
+        known = {feature: lookup.get_vocabulary(include_special_tokens=False) for feature, lookup in self._lookups.items()}
+        new = {feature: _new_values(known[feature], vocabularies.get(feature, [])) for feature in self.features}
+
+        grown = FusedEmbedding(
+            vocabularies = {feature: np.array(known[feature] + new[feature]) for feature in self.features},
+            embedding_dim = self.embedding_dim,
+            int_features = [f for f, lookup in self._lookups.items() if isinstance(lookup, tf.keras.layers.IntegerLookup)],
+            num_oov_indices = {feature: lookup.num_oov_indices for feature, lookup in self._lookups.items()},
+        )
+        grown._embedding.build((None,))
+
+        # Each block is its OOV rows then its vocabulary rows; new values go at its end.
+        table = self._embedding.embeddings
+        starts = self._offsets.numpy().tolist() + [table.shape[0]]
+        new_starts = grown._offsets.numpy().tolist()
+        for i in range(len(self.features)):
+            grown._embedding.embeddings[new_starts[i]:new_starts[i] + starts[i + 1] - starts[i]].assign(table[starts[i]:starts[i + 1]])
+
+        return grown
+
+
+    def call(self, inputs: Dict[str, tf.Tensor]) -> tf.Tensor:
+        """
+            Calls the layer on a dict of raw feature values.
+
+            Parameters:
+                - inputs (Dict[str, tf.Tensor]): Raw values of every fused feature, all of the same shape.
+
+            Returns:
+                - (tf.Tensor): The embeddings of all features, concatenated on the last axis.
+        """
+        # Row index of every (example, feature) pair in the shared table.
+        indices = tf.stack(
+            [
+                tf.cast(self._lookups[feature](inputs[feature]), tf.int64)
+                for feature in self.features
+            ],
+            axis = -1,
+        ) + self._offsets
+
+        embeddings = self._embedding(indices)
+        return tf.reshape(
+            embeddings,
+            tf.concat([tf.shape(indices)[:-1], [len(self.features) * self.embedding_dim]], axis=0),
+        )
+
+
+class KeyedEmbedding(tf.keras.layers.Layer):
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        embeddings: np.ndarray,
+        **kwargs,
+    ) -> 'KeyedEmbedding':
+        """
+            Frozen lookup of precomputed embeddings by key, e.g. the pooled
+            title embedding of every movie by its id.
+
+            Parameters:
+                - keys (np.ndarray): Distinct string keys.
+                - embeddings (np.ndarray): `(len(keys), dim)` embedding of every key.
+                    Unknown keys get their mean.
+        """
+        super().__init__(**kwargs)
+
+        self._lookup = tf.keras.layers.StringLookup(
+            mask_token = None,
+            vocabulary = keys,
+            num_oov_indices = 1,
+        )
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        # A variable rather than a constant: it is saved once with the weights
+        # instead of being inlined into every traced graph.
+        self._table = tf.Variable(
+            np.concatenate([embeddings.mean(axis=0, keepdims=True), embeddings], axis=0),
+            trainable=False,
+            name='table',
+        )
+
+
+    def call(self, inputs: tf.Tensor) -> tf.Tensor:
+        """
+            Calls the layer on a batch of keys.
+
+            Parameters:
+                - inputs (tf.Tensor): Keys.
+
+            Returns:
+                - (tf.Tensor): The precomputed embeddings.
+        """
+        return tf.gather(self._table, self._lookup(inputs))
+
 
 class Embedding(tf.keras.Model):
 
     def __init__(
         self,
-        dataset: tf.data.Dataset,
+        dataset: Optional[tf.data.Dataset],
         embedding_dim: int,
         str_features: List[str] = [],
         int_features: List[str] = [],
         text_features: List[str] = [],
         timestamp_features: List[str] = [],
+        numeric_features: List[str] = [],
+        vocabularies: Optional[Vocabularies] = None,
+        hashed_features: Dict[str, int] = {},
+        num_hashes: Dict[str, int] = {},
+        oov_buckets: Dict[str, int] = {},
+        fused: bool = False,
     ) -> 'Embedding':
         """
             Embedder Model.
 
             Parameters:
-                - dataset (tf.data.Dataset): Values to make embeddings for.
+                - dataset (tf.data.Dataset): Values to make embeddings for. Only read when
+                    `vocabularies` is not given, in a single pass for all features.
                 - embedding_dim (int): Embeddimg dimentionality.
                 - str_features (List[str]): String features. Defaults to [].
                 - int_features (List[str]): Integer features. Defaults to [].
                 - text_features (List[str]): Textual features. Defaults to [].
                 - timestamp_features (List[str]): Timestamp features. Defaults to [].
-                - oov_token (str): OOV token. Defaults to "[UNK]".
+                - numeric_features (List[str]): Numeric features. Defaults to [].
+                - vocabularies (Vocabularies): Prebuilt vocabularies, e.g. loaded with
+                    `Vocabularies.load`. Defaults to `None`.
+                - hashed_features (Dict[str, int]): String or integer features embedded
+                    without a vocabulary, mapped to their number of hash bins. Defaults to {}.
+                - num_hashes (Dict[str, int]): Number of hash functions whose embeddings are
+                    summed for a hashed feature (compositional embedding). Defaults to 1.
+                - oov_buckets (Dict[str, int]): Number of hashed out-of-vocabulary buckets
+                    of a string or integer feature. Defaults to 1.
+                - fused (bool): Embed all string and integer features through one shared
+                    table with a single gather (`FusedEmbedding`). Defaults to False.
         """
         super().__init__()
 
@@ -32,15 +305,54 @@ class Embedding(tf.keras.Model):
         # features, with all layers having the same dimensionality.
         self._embedding_dim = embedding_dim
 
-        self.embeddings: Dict[str, tf.keras.Sequential] = {}
+        self.embeddings: Dict[str, tf.keras.layers.Layer] = {}
+        self.fused_embedding: Optional[FusedEmbedding] = None
+
+        # Input each embedding layer reads, when it is not the feature itself.
+        self._input_keys: Dict[str, str] = {}
+        self._text_features = list(text_features)
+
+        # Vocabularies of all features are collected in one pass over
+        # the dataset, unless they were built (and cached) beforehand.
+        if vocabularies is None and (str_features or int_features or text_features or timestamp_features or numeric_features):
+            if dataset is None:
+                raise ValueError("Either `dataset` or `vocabularies` must be given.")
+            vocabularies = Vocabularies.build(
+                dataset            = dataset,
+                str_features       = str_features,
+                int_features       = int_features,
+                text_features      = text_features,
+                timestamp_features = timestamp_features,
+                numeric_features   = numeric_features,
+            )
+
+        missing = [
+            feature
+            for feature in str_features + int_features + text_features + timestamp_features + numeric_features
+            if vocabularies is None or feature not in vocabularies
+        ]
+        if missing:
+            raise ValueError(f"No vocabulary for features: {missing}.")
+
+        # In fused mode, string and integer categorical features
+        # share one table and are embedded with a single gather.
+        if fused and (str_features or int_features):
+            self.fused_embedding = FusedEmbedding(
+                vocabularies = {feature: vocabularies[feature] for feature in str_features + int_features},
+                embedding_dim = self._embedding_dim,
+                int_features = int_features,
+                num_oov_indices = oov_buckets,
+            )
+            str_features, int_features = [], []
 
         # For string categorical features, the `StringLookup`
         # layer will create a vocabulary that maps each string
         # value to an integer index followed by an embedding layer.
         for feature in str_features:
             _embedding_layer = self.__create_str_embedding_layer(
-                values = dataset.map(lambda _: _[feature]),
+                vocabulary = vocabularies[feature],
                 embedding_dim = self._embedding_dim,
+                num_oov_indices = oov_buckets.get(feature, 1),
             )
             self.embeddings[feature] = _embedding_layer
 
@@ -49,8 +361,9 @@ class Embedding(tf.keras.Model):
         # value to an integer index followed by an embedding layer.
         for feature in int_features:
             _embedding_layer = self.__create_int_embedding_layer(
-                values = dataset.map(lambda _: _[feature]),
+                vocabulary = vocabularies[feature],
                 embedding_dim = self._embedding_dim,
+                num_oov_indices = oov_buckets.get(feature, 1),
             )
             self.embeddings[feature] = _embedding_layer
 
@@ -59,26 +372,47 @@ class Embedding(tf.keras.Model):
         # index followed by an embedding layer.
         for feature in text_features:
             _embedding_layer = self.__create_text_embedding_layer(
-                values = dataset.map(lambda _: _[feature]),
+                vocabulary = vocabularies[feature],
                 embedding_dim = self._embedding_dim,
             )
             self.embeddings[feature] = _embedding_layer
 
-        # Timestamp features will be discretized into buckets
-        # and the `Discretization` layer will create a vocabulary
+        # Timestamp features will be discretized into equal-frequency
+        # buckets and the `Discretization` layer will create a vocabulary
         # for the embedding layer. The value will finally be
         # normalized between 0 and 1.
         for feature in timestamp_features:
             _embedding_layer = self.__create_timestamp_embedding_layer(
-                values = dataset.map(lambda _: _[feature]),
+                boundaries = vocabularies.boundaries(feature, n_buckets = 1000),
                 embedding_dim = self._embedding_dim,
             )
             self.embeddings[feature] = _embedding_layer
 
+        # Numeric features are discretized the same way, with
+        # boundaries taken from their streaming quantile sketch.
+        for feature in numeric_features:
+            _embedding_layer = self.__create_numeric_embedding_layer(
+                boundaries = vocabularies.boundaries(feature, n_buckets = 100),
+                embedding_dim = self._embedding_dim,
+            )
+            self.embeddings[feature] = _embedding_layer
+
+        # High-cardinality features can be hashed into a fixed number
+        # of bins instead of using a vocabulary, so that the table size
+        # is a memory budget rather than a function of the data. With
+        # several hash functions, each value is the sum of several rows,
+        # which makes full collisions between two values unlikely.
+        for feature, num_bins in hashed_features.items():
+            self.embeddings[feature] = HashEmbedding(
+                num_bins = num_bins,
+                embedding_dim = self._embedding_dim,
+                num_hashes = num_hashes.get(feature, 1),
+            )
+
 
     def __create_text_embedding_layer(
         self,
-        values: tf.data.Dataset,
+        vocabulary: np.ndarray,
         embedding_dim: int
     ) -> tf.keras.Sequential:
         """
@@ -86,14 +420,16 @@ class Embedding(tf.keras.Model):
             using a text vectorization.
 
             parameters:
-                - values (tf.data.Dataset): Values to make embeddings for.
+                - vocabulary (np.ndarray): Tokens, most frequent first.
                 - embedding_dim (int): Embeddimg dimentionality.
             Returns:
                 (tf.keras.Sequential): Model.
         """
         # Transform a batch of strings into either a list of token indices.
-        vectorization_layer = tf.keras.layers.TextVectorization()
-        vectorization_layer.adapt(values)
+        vectorization_layer = tf.keras.layers.TextVectorization(
+            vocabulary = vocabulary.tolist(),
+            standardize = standardize,
+        )
 
         embedding_layer = tf.keras.layers.Embedding(
             # Size of the vocabulary
@@ -120,31 +456,34 @@ class Embedding(tf.keras.Model):
 
     def __create_str_embedding_layer(
         self,
-        values: tf.data.Dataset,
+        vocabulary: np.ndarray,
         embedding_dim: int,
+        num_oov_indices: int = 1,
     ) -> tf.keras.Sequential:
         """
             Build a model that takes raw string values in and yields embeddings
             using a table-based vocabulary string lookup.
 
             parameters:
-                - values (tf.data.Dataset): Values to make embeddings for.
+                - vocabulary (np.ndarray): Distinct values of the feature.
                 - embedding_dim (int): Embeddimg dimentionality.
+                - num_oov_indices (int): Out-of-vocabulary values are hashed into this
+                    many buckets. Defaults to 1.
             Returns:
                 (tf.keras.Sequential): Model.
         """
-        vocabulary = np.unique(np.concatenate(list(values)))
-
         # Map arbitrary strings into integer output via a table-based vocabulary lookup.
         lookup_layer = tf.keras.layers.StringLookup(
             mask_token = None,
             # Vocabulary
             vocabulary = vocabulary,
+            # Values left out of a frequency-capped vocabulary share these buckets.
+            num_oov_indices = num_oov_indices,
         )
 
         embedding_layer = tf.keras.layers.Embedding(
             # Size of the vocabulary
-            input_dim = len(vocabulary) + 1,
+            input_dim = len(vocabulary) + num_oov_indices,
             # Dimension of the dense embedding
             output_dim = embedding_dim
         )
@@ -159,62 +498,95 @@ class Embedding(tf.keras.Model):
 
     def __create_timestamp_embedding_layer(
         self,
-        values: tf.data.Dataset,
+        boundaries: np.ndarray,
         embedding_dim: int,
-        n_buckets: int = 1000,
     ) -> tf.keras.Sequential:
+        """
+            Build a model that takes raw timestamps in and yields embeddings
+            of their equal-frequency bucket.
 
-        timestamps = np.concatenate(list(values))
+            parameters:
+                - boundaries (np.ndarray): Inner bucket boundaries.
+                - embedding_dim (int): Embeddimg dimentionality.
+            Returns:
+                (tf.keras.Sequential): Model.
+        """
+        embedding_layer = tf.keras.layers.Embedding(
+            # Size of the vocabulary
+            input_dim = len(boundaries) + 1,
+            # Dimension of the dense embedding
+            output_dim = embedding_dim
+        )
 
-        buckets = np.linspace(
-            start = timestamps.min(),
-            stop = timestamps.max(),
-            num = n_buckets,
+        return tf.keras.Sequential(
+            [
+                tf.keras.layers.Discretization(boundaries.tolist()),
+                embedding_layer,
+                tf.keras.layers.Normalization(axis = None)
+            ]
         )
 
+
+    def __create_numeric_embedding_layer(
+        self,
+        boundaries: np.ndarray,
+        embedding_dim: int,
+    ) -> tf.keras.Sequential:
+        """
+            Build a model that takes raw numeric values in and yields embeddings
+            of their equal-frequency bucket.
+
+            parameters:
+                - boundaries (np.ndarray): Inner bucket boundaries.
+                - embedding_dim (int): Embeddimg dimentionality.
+            Returns:
+                (tf.keras.Sequential): Model.
+        """
         embedding_layer = tf.keras.layers.Embedding(
             # Size of the vocabulary
-            input_dim = len(buckets) + 1,
+            input_dim = len(boundaries) + 1,
             # Dimension of the dense embedding
             output_dim = embedding_dim
         )
 
         return tf.keras.Sequential(
             [
-                tf.keras.layers.Discretization(buckets.tolist()),
+                tf.keras.layers.Discretization(boundaries.tolist()),
                 embedding_layer,
-                tf.keras.layers.Normalization(axis = None)
             ]
         )
 
 
     def __create_int_embedding_layer(
         self,
-        values: tf.data.Dataset,
+        vocabulary: np.ndarray,
         embedding_dim: int,
+        num_oov_indices: int = 1,
     ) -> tf.keras.Sequential:
         """
             Build a model that takes raw string values in and yields embeddings
             using a table-based vocabulary string lookup.
 
             parameters:
-                - values (tf.data.Dataset): Values to make embeddings for.
+                - vocabulary (np.ndarray): Distinct values of the feature.
                 - embedding_dim (int): Embeddimg dimentionality.
+                - num_oov_indices (int): Out-of-vocabulary values are hashed into this
+                    many buckets. Defaults to 1.
             Returns:
                 (tf.keras.Sequential): Model.
         """
-        vocabulary = np.unique(np.concatenate(list(values)))
-
         # Map arbitrary strings into integer output via a table-based vocabulary lookup.
         lookup_layer = tf.keras.layers.IntegerLookup(
             mask_token = None,
             # Vocabulary
             vocabulary = vocabulary,
+            # Values left out of a frequency-capped vocabulary share these buckets.
+            num_oov_indices = num_oov_indices,
         )
 
         embedding_layer = tf.keras.layers.Embedding(
             # Size of the vocabulary
-            input_dim = len(vocabulary) + 1,
+            input_dim = len(vocabulary) + num_oov_indices,
             # Dimension of the dense embedding
             output_dim = embedding_dim
         )
@@ -242,17 +614,128 @@ class Embedding(tf.keras.Model):
                 - (tf.tensor): returns the concatenated embeddings.
         """
         embeddings: List[tf.Tensor] = []
+        if self.fused_embedding is not None:
+            embeddings.append(self.fused_embedding(inputs))
+
         for feature in self.embeddings.keys():
             embedding_layer = self.embeddings[feature]
-            embedding = embedding_layer(inputs[feature])
+            embedding = embedding_layer(inputs[self._input_keys.get(feature, feature)])
             embeddings.append(embedding)
 
         return tf.concat(embeddings, axis=-1)
 
 
+    def precompute_text_features(
+        self,
+        dataset: tf.data.Dataset,
+        key_feature: str,
+        batch_size: int = 1_024,
+    ) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+            Replace the text features by lookups of their pooled embeddings,
+            so that serving gathers a row by key instead of tokenizing strings.
+            Meant for export: the precomputed embeddings are no longer trained.
+
+            Parameters:
+                - dataset (tf.data.Dataset): Catalog of unbatched examples holding
+                    `key_feature` and every text feature, e.g. all movies.
+                - key_feature (str): Key of the catalog, e.g. "movie_id".
+                - batch_size (int): Catalog rows embedded per batch. Defaults to 1024.
+
+            Returns:
+                - (Dict[str, Dict[str, np.ndarray]]): `keys` and `embeddings` of every
+                    text feature, to be shipped as a lookup artifact.
+        """
+        text_features = [feature for feature in self._text_features if feature not in self._input_keys]
+        if not text_features:
+            return {}
+
+        keys: List[np.ndarray] = []
+        embeddings: Dict[str, List[np.ndarray]] = {feature: [] for feature in text_features}
+        for batch in dataset.batch(batch_size):
+            keys.append(batch[key_feature].numpy())
+            for feature in text_features:
+                embeddings[feature].append(self.embeddings[feature](batch[feature]).numpy())
+
+        # A key may appear more than once in the catalog; keep its first row.
+        keys, first = np.unique(np.concatenate(keys), return_index=True)
+
+        artifacts: Dict[str, Dict[str, np.ndarray]] = {}
+        for feature in text_features:
+            values = np.concatenate(embeddings[feature])[first]
+            self.embeddings[feature] = KeyedEmbedding(keys, values)
+            self._input_keys[feature] = key_feature
+            artifacts[feature] = {"keys": keys, "embeddings": values}
+
+        return artifacts
+
+
+    def extend_vocabulary(
+        self,
+        vocabularies: Vocabularies,
+    ) -> Dict[str, int]:
+        """
+            Grow the vocabularies and embedding tables of the string, integer and
+            text features with the values they do not know yet, e.g. users and
+            movies added since training. Known values keep their index and their
+            trained embedding; new rows start from the embedding initializer.
+            Timestamp and numeric buckets are left as they are.
+
+            Meant for warm-starting (`src/model/warm_start.py`): the weights must
+            be built (and restored) first.
+
+            Parameters:
+                - vocabularies (Vocabularies): Vocabularies holding the new values,
+                    e.g. `Vocabularies.extend` of the ones the model was built with.
+
+            Returns:
+                - (Dict[str, int]): Number of values added per feature.
+        """
+        added: Dict[str, int] = {}
+
+        for feature, layer in list(self.embeddings.items()):
+            if feature not in vocabularies.vocabularies or feature in self._input_keys:
+                continue
+            if not isinstance(layer, tf.keras.Sequential):
+                continue
+
+            lookup, embedding = layer.layers[0], layer.layers[1]
+            known = lookup.get_vocabulary(include_special_tokens=False)
+            new = _new_values(known, vocabularies[feature])
+            if not new:
+                continue
+
+            if isinstance(lookup, tf.keras.layers.TextVectorization):
+                grown_lookup = tf.keras.layers.TextVectorization(vocabulary = known + new, standardize = standardize)
+            else:
+                grown_lookup = type(lookup)(
+                    mask_token = None,
+                    vocabulary = np.array(known + new),
+                    num_oov_indices = lookup.num_oov_indices,
+                )
+            # Trailing layers (pooling, normalization) have no vocabulary-sized state.
+            grown = tf.keras.Sequential([grown_lookup, _grow_table(embedding, len(new)), *layer.layers[2:]])
+            grown(tf.constant(new[:1]))
+            self.embeddings[feature] = grown
+            added[feature] = len(new)
+
+        if self.fused_embedding is not None:
+            grown = self.fused_embedding.extended(vocabularies.vocabularies)
+            for feature in grown.features:
+                n_new = grown._lookups[feature].vocabulary_size() - self.fused_embedding._lookups[feature].vocabulary_size()
+                if n_new:
+                    added[feature] = n_new
+            self.fused_embedding = grown
+
+        return added
+
+
     @property
     def embeddings_output_dim(self) -> int:
         """
             The output dimension of the embedding layer.
         """
-        return len(self.embeddings.keys()) * self._embedding_dim
+        n_features = len(self.embeddings.keys())
+        if self.fused_embedding is not None:
+            n_features += len(self.fused_embedding.features)
+        return n_features * self._embedding_dim
@@ -0,0 +1,241 @@
+from typing import Callable, Dict, Optional, Sequence, Text, Tuple
+import numpy as np
+import tensorflow as tf
+import tensorflow_recommenders as tfrs
+
+# Third-party
+from src.model.tower import Tower
+from src.model.ranking.base import BaseRanking
+from src.model.utils.feature_store import USER_FEATURES, MOVIE_FEATURES
+
+# Batch sizes the serving graphs pad their inputs to. XLA compiles one program
+# per input shape, so padding keeps it to one compilation per bucket instead of
+# one per request size. Larger batches are padded to a multiple of the last one.
+BATCH_BUCKETS: Tuple[int, ...] = (1, 8, 32, 128, 512)
+
+
+def feature_signature(
+    spec: Dict[Text, tf.DType],
+    exclude: Sequence[Text] = (),
+) -> Dict[Text, tf.TensorSpec]:
+    """
+        Build a batch-dynamic input signature from a feature spec.
+
+        Parameters:
+            - spec (Dict[str, tf.DType]): Feature names and dtypes, e.g. `USER_FEATURES`.
+            - exclude (Sequence[str]): Features the exported model does not read,
+                e.g. precomputed text features. Defaults to `()`.
+
+        Returns:
+            - (Dict[str, tf.TensorSpec]): One `(None,)` spec per feature.
+    """
+    return {
+        name: tf.TensorSpec(shape=(None,), dtype=dtype, name=name)
+        for name, dtype in spec.items() if name not in exclude
+    }
+
+
+def bucket_size(
+    batch_size: tf.Tensor,
+    buckets: Sequence[int] = BATCH_BUCKETS,
+) -> tf.Tensor:
+    """
+        Smallest bucket holding `batch_size` rows.
+
+        Parameters:
+            - batch_size (tf.Tensor): Number of rows.
+            - buckets (Sequence[int]): Increasing bucket sizes. Defaults to `BATCH_BUCKETS`.
+
+        Returns:
+            - (tf.Tensor): The padded batch size.
+    """
+    sizes = tf.constant(buckets, dtype=tf.int32)
+    largest = sizes[-1]
+    multiple = (batch_size + largest - 1) // largest * largest
+    return tf.reduce_min(tf.concat([tf.boolean_mask(sizes, sizes >= batch_size), [multiple]], axis=0))
+
+
+def pad_batch(
+    inputs: Dict[Text, tf.Tensor],
+    buckets: Sequence[int] = BATCH_BUCKETS,
+) -> Tuple[Dict[Text, tf.Tensor], tf.Tensor]:
+    """
+        Pad a batch of features to its bucket size by repeating the last row,
+        so padded rows stay valid inputs (no OOV or NaN artefacts).
+
+        Parameters:
+            - inputs (Dict[str, tf.Tensor]): Features batched along the first axis.
+            - buckets (Sequence[int]): Increasing bucket sizes. Defaults to `BATCH_BUCKETS`.
+
+        Returns:
+            - (Tuple[Dict[str, tf.Tensor], tf.Tensor]): Padded features and the original batch size.
+    """
+    batch_size = tf.shape(next(iter(inputs.values())))[0]
+    index = tf.minimum(tf.range(bucket_size(batch_size, buckets)), tf.maximum(batch_size - 1, 0))
+    return {name: tf.gather(value, index) for name, value in inputs.items()}, batch_size
+
+
+class TopKExport(tf.Module):
+
+    def __init__(
+        self,
+        model: tfrs.layers.factorized_top_k.TopK,
+        query_signature: Optional[Dict[Text, tf.TensorSpec]] = None,
+    ) -> 'TopKExport':
+        """
+            Batch-dynamic export of a top-K retrieval layer. The layer is served
+            as is: its index (and ScaNN's custom ops) cannot be compiled with XLA.
+
+            Parameters:
+                - model (tfrs.layers.factorized_top_k.TopK): Indexed retrieval layer.
+                - query_signature (Dict[str, tf.TensorSpec]): Query inputs.
+                    Defaults to `None` (every feature of `USER_FEATURES`).
+        """
+        self.model = model
+        self.call = tf.function(
+            self._call,
+            input_signature = [
+                query_signature or feature_signature(USER_FEATURES),
+                tf.TensorSpec(shape=None, dtype=tf.int32),
+            ],
+        )
+
+
+    def _call(self, query: Dict[Text, tf.Tensor], k: int) -> Tuple[tf.Tensor, tf.Tensor]:
+        affinities, identifiers = self.model(query, k)
+        return identifiers, affinities
+
+
+class QueryTowerExport(tf.Module):
+
+    def __init__(
+        self,
+        model: Tower,
+        query_signature: Optional[Dict[Text, tf.TensorSpec]] = None,
+        jit_compile: bool = False,
+        buckets: Sequence[int] = BATCH_BUCKETS,
+    ) -> 'QueryTowerExport':
+        """
+            Batch-dynamic export of a tower, returning `{"embedding": ...}`.
+
+            Parameters:
+                - model (Tower): Tower to export.
+                - query_signature (Dict[str, tf.TensorSpec]): Tower inputs.
+                    Defaults to `None` (every feature of `USER_FEATURES`).
+                - jit_compile (bool): Compile the cross and dense layers with XLA. Defaults to False.
+                - buckets (Sequence[int]): Batch sizes inputs are padded to. Defaults to `BATCH_BUCKETS`.
+        """
+        self.model   = model
+        self.buckets = tuple(buckets)
+
+        self._project = tf.function(model.project, jit_compile=jit_compile)
+        self.call = tf.function(
+            self._call,
+            input_signature = [query_signature or feature_signature(USER_FEATURES)],
+        )
+
+
+    def _call(self, query: Dict[Text, tf.Tensor]) -> Dict[Text, tf.Tensor]:
+        inputs, batch_size = pad_batch(query, self.buckets)
+        embedding = self._project(self.model.embed(inputs))
+        return {"embedding": embedding[:batch_size]}
+
+
+class RankingExport(tf.Module):
+
+    def __init__(
+        self,
+        model: BaseRanking,
+        query_signature: Optional[Dict[Text, tf.TensorSpec]] = None,
+        candidate_signature: Optional[Dict[Text, tf.TensorSpec]] = None,
+        jit_compile: bool = False,
+        buckets: Sequence[int] = BATCH_BUCKETS,
+    ) -> 'RankingExport':
+        """
+            Batch-dynamic export of a ranking model: one row per (user, movie)
+            pair, so a whole slate is scored in a single call.
+
+            String lookups run in the regular graph; the tower projections and
+            the rating model only see dense embeddings and can be compiled with XLA.
+
+            Parameters:
+                - model (BaseRanking): Ranking model whose towers are `Tower`s.
+                - query_signature (Dict[str, tf.TensorSpec]): Query inputs.
+                    Defaults to `None` (every feature of `USER_FEATURES`).
+                - candidate_signature (Dict[str, tf.TensorSpec]): Candidate inputs.
+                    Defaults to `None` (every feature of `MOVIE_FEATURES`).
+                - jit_compile (bool): Compile the dense part with XLA. Defaults to False.
+                - buckets (Sequence[int]): Batch sizes inputs are padded to. Defaults to `BATCH_BUCKETS`.
+        """
+        self.model   = model
+        self.buckets = tuple(buckets)
+
+        self._score = tf.function(self._dense, jit_compile=jit_compile)
+        self.call = tf.function(
+            self._call,
+            input_signature = [
+                query_signature or feature_signature(USER_FEATURES),
+                candidate_signature or feature_signature(MOVIE_FEATURES),
+            ],
+        )
+
+
+    def _dense(self, query_embeddings: tf.Tensor, candidate_embeddings: tf.Tensor) -> tf.Tensor:
+        return self.model.score(
+            self.model.query_tower.project(query_embeddings),
+            self.model.candidate_tower.project(candidate_embeddings),
+        )
+
+
+    def _call(self, query: Dict[Text, tf.Tensor], candidate: Dict[Text, tf.Tensor]) -> tf.Tensor:
+        inputs, batch_size = pad_batch({**query, **candidate}, self.buckets)
+        scores = self._score(
+            self.model.query_tower.embed(inputs),
+            self.model.candidate_tower.embed(inputs),
+        )
+        return scores[:batch_size]
+
+
+def check_parity(
+    signature: Callable[..., Dict[Text, tf.Tensor]],
+    reference: Callable[[Dict[Text, tf.Tensor]], tf.Tensor],
+    inputs: Dict[Text, np.ndarray],
+    batch_sizes: Sequence[int] = (1, 3, 8, 50),
+    atol: float = 1e-4,
+    output: Optional[Text] = None,
+) -> Dict[int, float]:
+    """
+        Check that an exported signature matches the eager model on batches
+        of several sizes, including sizes that are not buckets.
+
+        Parameters:
+            - signature (Callable): Serving signature, e.g. `loaded.signatures['call']`.
+            - reference (Callable): Eager model called on a dict of features.
+            - inputs (Dict[str, np.ndarray]): Features with at least `max(batch_sizes)` rows.
+                Features the signature does not take are dropped.
+            - batch_sizes (Sequence[int]): Batch sizes to check. Defaults to `(1, 3, 8, 50)`.
+            - atol (float): Largest absolute difference allowed. Defaults to 1e-4.
+            - output (str): Signature output to compare. Defaults to `None` (the first one).
+
+        Returns:
+            - (Dict[int, float]): Largest absolute difference per batch size.
+    """
+    names = set(signature.structured_input_signature[1])
+    differences: Dict[int, float] = {}
+    for batch_size in batch_sizes:
+        batch = {name: tf.convert_to_tensor(value[:batch_size]) for name, value in inputs.items() if name in names}
+        if len(next(iter(batch.values()))) != batch_size:
+            raise ValueError(f"Inputs hold fewer than {batch_size} rows.")
+
+        outputs = signature(**batch)
+        exported = outputs[output] if output else next(iter(outputs.values()))
+        expected = reference(batch)
+
+        differences[batch_size] = float(np.max(np.abs(exported.numpy() - np.asarray(expected))))
+        if differences[batch_size] > atol:
+            raise ValueError(
+                f"Exported model differs from the eager model by {differences[batch_size]:.2e} "
+                f"at batch size {batch_size} (atol {atol:.0e})."
+            )
+
+    return differences
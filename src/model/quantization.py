@@ -0,0 +1,283 @@
+from typing import Dict, Text, Tuple, Union
+import numpy as np
+import tensorflow as tf
+import tensorflow_recommenders as tfrs
+
+# Third-party
+from src.model.tower import Tower
+from src.model.ranking.base import BaseRanking
+
+# Post-training variants:
+#   - int8:    int8 weights with one scale per output unit, dequantized on the fly.
+#   - dynamic: int8 weights and int8 activations, quantized per row at call time.
+#   - float16: float16 weights, computed in float32.
+QUANTIZATION_MODES: Tuple[Text, ...] = ('int8', 'dynamic', 'float16')
+
+
+def _quantize_symmetric(values: tf.Tensor, axis: int) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Helper function for symmetric int8 quantization with one scale per slice along `axis`."""
+    scale = tf.reduce_max(tf.abs(values), axis=axis, keepdims=True) / 127.0
+    scale = tf.where(scale > 0.0, scale, tf.ones_like(scale))
+    return tf.clip_by_value(tf.round(values / scale), -127.0, 127.0), scale
+
+
+class QuantizedDense(tf.keras.layers.Layer):
+
+    def __init__(
+        self,
+        layer: tf.keras.layers.Dense,
+        mode: Text = 'int8',
+        **kwargs,
+    ) -> 'QuantizedDense':
+        """
+            Frozen, quantized copy of a trained `Dense` layer.
+
+            Parameters:
+                - layer (tf.keras.layers.Dense): Built float32 layer.
+                - mode (str): One of `QUANTIZATION_MODES`. Defaults to "int8".
+        """
+        super().__init__(**kwargs)
+
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode {mode}, expected one of {QUANTIZATION_MODES}.")
+
+        self.mode       = mode
+        self.activation = layer.activation
+        self.bias       = tf.Variable(layer.bias, trainable=False, name='bias') if layer.use_bias else None
+
+        if mode == 'float16':
+            self.kernel = tf.Variable(tf.cast(layer.kernel, tf.float16), trainable=False, name='kernel')
+            self.scale  = None
+        else:
+            kernel, scale = _quantize_symmetric(layer.kernel, axis=0)
+            self.kernel = tf.Variable(tf.cast(kernel, tf.int8), trainable=False, name='kernel')
+            self.scale  = tf.Variable(tf.reshape(scale, [-1]), trainable=False, name='scale')
+
+
+    def call(self, inputs: tf.Tensor) -> tf.Tensor:
+        """
+            Calls the layer on the input tensor.
+
+            Parameters:
+                - inputs (tf.Tensor): Float32 inputs.
+
+            Returns:
+                - (tf.Tensor): Float32 outputs.
+        """
+        kernel = tf.cast(self.kernel, tf.float32)
+
+        if self.mode == 'float16':
+            outputs = tf.matmul(inputs, kernel)
+        elif self.mode == 'int8':
+            # Scaling the outputs is cheaper than dequantizing the kernel.
+            outputs = tf.matmul(inputs, kernel) * self.scale
+        else:
+            # Products of int8 values are exact in float32 for up to 2^24 / 127^2
+            # (~1040) inputs, so this matches an int8 x int8 -> int32 matmul.
+            inputs, inputs_scale = _quantize_symmetric(inputs, axis=-1)
+            outputs = tf.matmul(inputs, kernel) * inputs_scale * self.scale
+
+        if self.bias is not None:
+            outputs = outputs + self.bias
+        return self.activation(outputs) if self.activation is not None else outputs
+
+
+class QuantizedCross(tf.keras.layers.Layer):
+
+    def __init__(
+        self,
+        layer: tfrs.layers.dcn.Cross,
+        mode: Text = 'int8',
+        **kwargs,
+    ) -> 'QuantizedCross':
+        """
+            Quantized copy of a trained DCN `Cross` layer: `x0 * (W x + b) + x`,
+            with `W` full rank or factorized as `V U`.
+
+            Parameters:
+                - layer (tfrs.layers.dcn.Cross): Built float32 layer.
+                - mode (str): One of `QUANTIZATION_MODES`. Defaults to "int8".
+        """
+        super().__init__(**kwargs)
+
+        if layer._projection_dim is None:
+            self._dense = [QuantizedDense(layer._dense, mode)]
+        else:
+            self._dense = [QuantizedDense(layer._dense_u, mode), QuantizedDense(layer._dense_v, mode)]
+        self._diag_scale = layer._diag_scale
+
+
+    def call(self, inputs: tf.Tensor) -> tf.Tensor:
+        """
+            Computes the feature cross of the inputs with themselves.
+
+            Parameters:
+                - inputs (tf.Tensor): Feature embeddings.
+
+            Returns:
+                - (tf.Tensor): Crossed features.
+        """
+        outputs = inputs
+        for dense in self._dense:
+            outputs = dense(outputs)
+        if self._diag_scale:
+            outputs = outputs + self._diag_scale * inputs
+        return inputs * outputs + inputs
+
+
+class QuantizedTower(tf.keras.Model):
+
+    def __init__(
+        self,
+        tower: Tower,
+        mode: Text = 'int8',
+    ) -> 'QuantizedTower':
+        """
+            Tower with quantized Cross and dense layers. The embedding model is
+            shared with the float tower: its tables are lookups, not matmuls.
+
+            Parameters:
+                - tower (Tower): Trained float32 tower.
+                - mode (str): One of `QUANTIZATION_MODES`. Defaults to "int8".
+        """
+        super().__init__()
+
+        self._embedding_model = tower._embedding_model
+        self._cross_layer     = QuantizedCross(tower._cross_layer, mode) if tower._cross_layer else None
+        self._dense_layers    = [QuantizedDense(layer, mode) for layer in tower._dense_layers.layers]
+
+
+    def call(self, inputs: Dict[Text, tf.Tensor]) -> tf.Tensor:
+        """
+            Calls the model on the input features.
+
+            Parameters:
+                - inputs (Dict[str, tf.Tensor]): Input features.
+
+            Returns:
+                - (tf.Tensor): The tower embeddings.
+        """
+        return self.project(self.embed(inputs))
+
+
+    def embed(self, inputs: Dict[Text, tf.Tensor]) -> tf.Tensor:
+        """
+            Calls the (float32) embedding model.
+
+            Parameters:
+                - inputs (Dict[str, tf.Tensor]): Input features.
+
+            Returns:
+                - (tf.Tensor): The concatenated feature embeddings.
+        """
+        return self._embedding_model(inputs)
+
+
+    def project(self, embeddings: tf.Tensor) -> tf.Tensor:
+        """
+            Calls the quantized cross and dense layers.
+
+            Parameters:
+                - embeddings (tf.Tensor): Output of `embed`.
+
+            Returns:
+                - (tf.Tensor): The tower embeddings.
+        """
+        x = self._cross_layer(embeddings) if self._cross_layer else embeddings
+        for layer in self._dense_layers:
+            x = layer(x)
+        return x
+
+
+class QuantizedRanking(tf.keras.Model):
+
+    def __init__(
+        self,
+        model: BaseRanking,
+        mode: Text = 'int8',
+    ) -> 'QuantizedRanking':
+        """
+            Ranking model with quantized towers and rating head, for serving.
+            Exposes the same `query_tower`, `candidate_tower` and `score` as
+            `BaseRanking`, so `src.model.export.RankingExport` can export it.
+
+            Parameters:
+                - model (BaseRanking): Trained float32 ranking model.
+                - mode (str): One of `QUANTIZATION_MODES`. Defaults to "int8".
+        """
+        super().__init__()
+
+        self.query_tower     = QuantizedTower(model.query_tower, mode)
+        self.candidate_tower = QuantizedTower(model.candidate_tower, mode)
+        self.rating_model    = [QuantizedDense(layer, mode) for layer in model.rating_model.layers]
+
+
+    def call(self, inputs: Dict[Text, tf.Tensor]) -> tf.Tensor:
+        """
+            Calls the model on a dict of input features.
+
+            Parameters:
+                - inputs (Dict[str, tf.Tensor]): Dictionary of input Tensors.
+
+            Returns:
+                (tf.Tensor): Ranking scores.
+        """
+        return self.score(self.query_tower(inputs), self.candidate_tower(inputs))
+
+
+    def score(self, query_embeddings: tf.Tensor, candidate_embeddings: tf.Tensor) -> tf.Tensor:
+        """
+            Score already computed tower embeddings.
+
+            Parameters:
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
+
+            Returns:
+                (tf.Tensor): Ranking scores.
+        """
+        # Last axis: (batch, dim) for pointwise, (batch, list, dim) for listwise inputs.
+        x = tf.concat([query_embeddings, candidate_embeddings], axis=-1)
+        for layer in self.rating_model:
+            x = layer(x)
+        return x
+
+
+def quantize(
+    model: Union[Tower, BaseRanking],
+    mode: Text = 'int8',
+) -> Union[QuantizedTower, QuantizedRanking]:
+    """
+        Post-training quantization of a trained tower or ranking model. The
+        float32 model is left untouched.
+
+        Parameters:
+            - model (Tower | BaseRanking): Trained model, called at least once.
+            - mode (str): One of `QUANTIZATION_MODES`. Defaults to "int8".
+
+        Returns:
+            - (QuantizedTower | QuantizedRanking): The quantized model.
+    """
+    if isinstance(model, Tower):
+        return QuantizedTower(model, mode)
+    if isinstance(model, BaseRanking):
+        return QuantizedRanking(model, mode)
+    raise TypeError(f"Cannot quantize a {type(model).__name__}, expected a Tower or a BaseRanking model.")
+
+
+def dense_weight_bytes(model: tf.Module) -> int:
+    """
+        Size of the weights of the dense and cross layers of a model, i.e. the
+        part quantization shrinks (embedding tables are not counted).
+
+        Parameters:
+            - model (tf.Module): Float or quantized tower or ranking model.
+
+        Returns:
+            - (int): Size in bytes.
+    """
+    layers = {id(layer): layer for layer in model.submodules if isinstance(layer, (tf.keras.layers.Dense, QuantizedDense))}
+    return sum(
+        int(np.prod(variable.shape)) * variable.dtype.size
+        for layer in layers.values() for variable in layer.variables
+    )
@@ -48,6 +48,27 @@ class BaseRanking(tfrs.models.Model):
             Returns:
                 (tf.Tensor): Ranking scores.
         """
+        query_embeddings: tf.Tensor     = self.query_tower(inputs)
+        candidate_embeddings: tf.Tensor = self.candidate_tower(inputs)
+
+        return self.score(query_embeddings, candidate_embeddings)
+
+
+    def score(
+        self,
+        query_embeddings: tf.Tensor,
+        candidate_embeddings: tf.Tensor,
+    ) -> tf.Tensor:
+        """
+            Score already computed tower embeddings.
+
+            Parameters:
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
+
+            Returns:
+                (tf.Tensor): Ranking scores.
+        """
         raise NotImplementedError()
 
 
@@ -66,4 +87,32 @@ class BaseRanking(tfrs.models.Model):
             Returns:
                 - (tf.Tensor): Loss of the model.
         """
+        return self.compute_loss_from_embeddings(
+            inputs               = inputs,
+            query_embeddings     = self.query_tower(inputs),
+            candidate_embeddings = self.candidate_tower(inputs),
+            training             = training,
+        )
+
+
+    def compute_loss_from_embeddings(
+        self,
+        inputs: Dict[str, tf.Tensor],
+        query_embeddings: tf.Tensor,
+        candidate_embeddings: tf.Tensor,
+        training: bool = False
+    ) -> tf.Tensor:
+        """
+            Compute loss of the model from already computed tower embeddings,
+            so that a multi-task model can share one forward pass of the towers.
+
+            Parameters:
+                - inputs (Dict[str, tf.Tensor]): Inputs of the model, holding the labels.
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
+                - training (bool): If `True`, the model is in training mode.
+
+            Returns:
+                - (tf.Tensor): Loss of the model.
+        """
         raise NotImplementedError()
\ No newline at end of file
@@ -24,23 +24,21 @@ class PointwiseRanking(BaseRanking):
         super().__init__(query_tower, candidate_tower, task)
 
 
-    def call(
+    def score(
         self,
-        inputs: Dict[str, tf.Tensor]
+        query_embeddings: tf.Tensor,
+        candidate_embeddings: tf.Tensor,
     ) -> tf.Tensor:
         """
-            Call method of the model. Takes dict of input features and returns 
-            predictions.
+            Score already computed tower embeddings.
 
             Parameters:
-                - inputs (Dict[str, tf.Tensor]): Dictionary of input Tensors.
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
 
             Returns:
                 (tf.Tensor): Ranking scores.
         """
-        query_embeddings: tf.Tensor     = self.query_tower(inputs)
-        candidate_embeddings: tf.Tensor = self.candidate_tower(inputs)
-
         return self.rating_model(
             tf.concat(
                 [
@@ -51,16 +49,20 @@ class PointwiseRanking(BaseRanking):
         )
 
 
-    def compute_loss(
+    def compute_loss_from_embeddings(
         self,
         inputs: Dict[str, tf.Tensor],
+        query_embeddings: tf.Tensor,
+        candidate_embeddings: tf.Tensor,
         training: bool = False
     ) -> tf.Tensor:
         """
-            Compute loss of the model.
+            Compute loss of the model from already computed tower embeddings.
 
             Parameters:
-                - inputs (Dict[str, tf.Tensor]): Inputs of the model.
+                - inputs (Dict[str, tf.Tensor]): Inputs of the model, holding the labels.
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
                 - training (bool): If `True`, the model is in training mode.
 
             Returns:
@@ -68,7 +70,7 @@ class PointwiseRanking(BaseRanking):
         """
         # Extracation
         labels: tf.Tensor      = inputs["user_rating"]
-        predictions: tf.Tensor = self(inputs)
+        predictions: tf.Tensor = self.score(query_embeddings, candidate_embeddings)
 
         return self.task(
             predictions     = predictions,
@@ -27,9 +27,21 @@ class RecommenderModel(tfrs.models.Model):
                 - Retrieval_model (Retrieval): The retrieval task of the model. This task takes in the embeddings from the query and candidate towers and outputs a list of candidates.
                 - ranking_weight (float): The weight given to the ranking task. Defaults to 1.0.
                 - retrieval_weight (float): The weight given to the retrieval task. Defaults to 1.0.
+
+            Raises:
+                - ValueError: If the ranking or retrieval model does not use the given towers.
         """
         super().__init__()
 
+        # `compute_loss` runs the towers once and feeds both tasks, which is only
+        # equivalent to training each task on its own if all three share them.
+        for name, model in (("ranking_model", ranking_model), ("retrieval_model", retrieval_model)):
+            if model.query_tower is not query_tower or model.candidate_tower is not candidate_tower:
+                raise ValueError(
+                    f"{name} must be built on the same query_tower and candidate_tower "
+                    "instances as the RecommenderModel"
+                )
+
         self.query_tower      = query_tower
         self.candidate_tower  = candidate_tower
         self.ranking_weight   = ranking_weight
@@ -73,8 +85,22 @@ class RecommenderModel(tfrs.models.Model):
             Returns:
                 - (tf.Tensor): Loss of the model.
         """
-        rating_loss: tf.Tensor    = self.ranking_model.compute_loss(inputs, training)
-        retrieval_loss: tf.Tensor = self.retrieval_model.compute_loss(inputs, training)
+        # Both tasks score the same tower outputs, so the towers run once
+        # per batch and their gradients accumulate from both losses.
+        query_embeddings: tf.Tensor     = self.query_tower(inputs)
+        candidate_embeddings: tf.Tensor = self.candidate_tower(inputs)
+
+        rating_loss: tf.Tensor = self.ranking_model.compute_loss_from_embeddings(
+            inputs               = inputs,
+            query_embeddings     = query_embeddings,
+            candidate_embeddings = candidate_embeddings,
+            training             = training,
+        )
+        retrieval_loss: tf.Tensor = self.retrieval_model.compute_loss_from_embeddings(
+            query_embeddings     = query_embeddings,
+            candidate_embeddings = candidate_embeddings,
+            training             = training,
+        )
 
         ranking_weighted_loss   = (self.ranking_weight * rating_loss)
         retrieval_weighted_loss = (self.retrieval_weight * retrieval_loss)
@@ -41,11 +41,33 @@ class Retrieval(tfrs.models.Model):
             Returns:
                 - (tf.Tensor): Loss of the model.
         """
-        query_embeddings: tf.Tensor     = self.query_tower(inputs)
-        candidate_embeddings: tf.Tensor = self.candidate_tower(inputs)
+        return self.compute_loss_from_embeddings(
+            query_embeddings     = self.query_tower(inputs),
+            candidate_embeddings = self.candidate_tower(inputs),
+            training             = training,
+        )
+
+
+    def compute_loss_from_embeddings(
+        self,
+        query_embeddings: tf.Tensor,
+        candidate_embeddings: tf.Tensor,
+        training: bool = False
+    ) -> tf.Tensor:
+        """
+            Compute loss of the model from already computed tower embeddings,
+            so that a multi-task model can share one forward pass of the towers.
 
+            Parameters:
+                - query_embeddings (tf.Tensor): Output of the query tower.
+                - candidate_embeddings (tf.Tensor): Output of the candidate tower.
+                - training (bool): If `True`, the model is in training mode.
+
+            Returns:
+                - (tf.Tensor): Loss of the model.
+        """
         return self.task(
             query_embeddings     = query_embeddings,
             candidate_embeddings = candidate_embeddings,
             compute_metrics      = not training
-        )
+        )
\ No newline at end of file
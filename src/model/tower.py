@@ -75,7 +75,40 @@ class Tower(tf.keras.Model):
             Returns:
                 - (tf.Tensor): The output tensor generated by the model. 
         """
-        x = self._embedding_model(inputs)
-        x = self._cross_layer(x) if self._cross_layer else x
+        return self.project(self.embed(inputs))
+
+
+    def embed(
+        self,
+        inputs: tf.Tensor,
+    ) -> tf.Tensor:
+        """
+            Calls the embedding model, the part of the tower that reads raw
+            (string) features.
+
+            Parameters:
+                - inputs (tf.Tensor): A tensor containing input data to be processed by the embedding model.
+
+            Returns:
+                - (tf.Tensor): The concatenated feature embeddings.
+        """
+        return self._embedding_model(inputs)
+
+
+    def project(
+        self,
+        embeddings: tf.Tensor,
+    ) -> tf.Tensor:
+        """
+            Calls the cross and dense layers on the feature embeddings. Only
+            numeric ops, so it can be compiled with XLA.
+
+            Parameters:
+                - embeddings (tf.Tensor): Output of `embed`.
+
+            Returns:
+                - (tf.Tensor): The output tensor generated by the model.
+        """
+        x = self._cross_layer(embeddings) if self._cross_layer else embeddings
         x = self._dense_layers(x) if self._dense_layers else x
         return x
@@ -0,0 +1,182 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Candidate matrix shared with the worker processes of `blocked_top_k`.
+_candidates: Optional[np.ndarray] = None
+
+
+def batched_embeddings(
+    embed_fn: Callable[[Dict[str, np.ndarray]], np.ndarray],
+    features: Dict[str, np.ndarray],
+    batch_size: int = 4096,
+) -> np.ndarray:
+    """
+        Run a tower over all rows of a columnar feature dict in batches.
+
+        Parameters:
+            - embed_fn (Callable): Maps a batch of features to a `(batch, dim)` array.
+            - features (Dict[str, np.ndarray]): Feature columns of equal length.
+            - batch_size (int): Rows per call. Defaults to 4096.
+
+        Returns:
+            - (np.ndarray): A `(rows, dim)` float32 matrix.
+    """
+    n_rows = len(next(iter(features.values())))
+    outputs: List[np.ndarray] = []
+    for start in range(0, n_rows, batch_size):
+        batch = {name: values[start:start + batch_size] for name, values in features.items()}
+        outputs.append(np.asarray(embed_fn(batch), dtype=np.float32))
+    return np.concatenate(outputs, axis=0)
+
+
+def _init_worker(candidates: np.ndarray) -> None:
+    global _candidates
+    _candidates = candidates
+
+
+def _top_k_block(queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ _candidates.T
+    if k < scores.shape[1]:
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape).copy()
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1).astype(np.int32)
+
+
+def blocked_top_k(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    block_size: int = 1024,
+    n_workers: int = 1,
+) -> np.ndarray:
+    """
+        Exact top-k by inner product, computed block by block so that only a
+        `(block_size, n_candidates)` score matrix is alive at any time.
+
+        Parameters:
+            - queries (np.ndarray): `(n_queries, dim)` query embeddings.
+            - candidates (np.ndarray): `(n_candidates, dim)` candidate embeddings.
+            - k (int): Number of candidates to return per query.
+            - block_size (int): Queries scored per block. Defaults to 1024.
+            - n_workers (int): Worker processes. Defaults to 1 (in-process).
+
+        Returns:
+            - (np.ndarray): `(n_queries, k)` candidate row indices, best first.
+    """
+    k = min(k, candidates.shape[0])
+    blocks = [queries[i:i + block_size] for i in range(0, len(queries), block_size)]
+
+    if n_workers <= 1:
+        _init_worker(candidates)
+        return np.concatenate([_top_k_block(block, k) for block in blocks], axis=0)
+
+    # Spawned workers receive the candidate matrix once, at start-up, instead
+    # of with every block. `spawn` keeps TensorFlow state out of the children.
+    with ProcessPoolExecutor(
+        max_workers=n_workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(candidates,),
+    ) as executor:
+        results = executor.map(_top_k_block, blocks, [k] * len(blocks))
+        return np.concatenate(list(results), axis=0)
+
+
+def retrieval_metrics(
+    top_k: np.ndarray,
+    relevant_users: np.ndarray,
+    relevant_items: np.ndarray,
+    n_items: int,
+    ks: Sequence[int] = (10,),
+) -> Dict[str, float]:
+    """
+        Compute Recall@k, HitRate@k, NDCG@k and MRR@k with binary relevance.
+
+        Parameters:
+            - top_k (np.ndarray): `(n_users, K)` retrieved item indices, best first.
+            - relevant_users (np.ndarray): Row of `top_k` for each relevant pair.
+            - relevant_items (np.ndarray): Item index for each relevant pair.
+            - n_items (int): Number of candidate items.
+            - ks (Sequence[int]): Cut-offs to report. Cut-offs above `K` (e.g. above the
+                catalog size, to which `blocked_top_k` clamps `k`) are evaluated at `K`. Defaults to (10,).
+
+        Returns:
+            - (Dict[str, float]): Metrics averaged over users with at least one relevant item.
+    """
+    n_users = top_k.shape[0]
+    relevant_keys = np.unique(relevant_users.astype(np.int64) * n_items + relevant_items)
+    retrieved_keys = np.arange(n_users, dtype=np.int64)[:, None] * n_items + top_k
+    hits = np.isin(retrieved_keys, relevant_keys)
+
+    n_relevant = np.bincount(relevant_keys // n_items, minlength=n_users)
+    evaluated = n_relevant > 0
+    hits, n_relevant = hits[evaluated], n_relevant[evaluated]
+
+    metrics: Dict[str, float] = {"users": float(evaluated.sum())}
+    for k in ks:
+        cutoff = min(k, top_k.shape[1])
+        hits_k = hits[:, :cutoff]
+        discounts = 1.0 / np.log2(np.arange(2, cutoff + 2))
+        ideal = np.cumsum(discounts)[np.minimum(n_relevant, cutoff) - 1]
+        first_hit = np.argmax(hits_k, axis=1)
+        found = hits_k.any(axis=1)
+
+        metrics[f"recall@{k}"] = float(np.mean(hits_k.sum(axis=1) / n_relevant))
+        metrics[f"hit_rate@{k}"] = float(np.mean(found))
+        metrics[f"ndcg@{k}"] = float(np.mean((hits_k * discounts).sum(axis=1) / ideal))
+        metrics[f"mrr@{k}"] = float(np.mean(np.where(found, 1.0 / (first_hit + 1), 0.0)))
+
+    return metrics
+
+
+def _within_group_rank(groups: np.ndarray, order: np.ndarray) -> np.ndarray:
+    """Zero-based position of every element inside its group under `order`."""
+    sorted_groups = groups[order]
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    sizes = np.diff(np.r_[starts, len(order)])
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - np.repeat(starts, sizes)
+    return ranks
+
+
+def ranking_metrics(
+    groups: np.ndarray,
+    predictions: np.ndarray,
+    labels: np.ndarray,
+    k: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+        Compute RMSE and NDCG of predicted ratings, with NDCG grouped per user.
+
+        Parameters:
+            - groups (np.ndarray): Integer user code of every example.
+            - predictions (np.ndarray): Predicted rating of every example.
+            - labels (np.ndarray): True rating of every example.
+            - k (int): NDCG cut-off. Defaults to `None` (full list).
+
+        Returns:
+            - (Dict[str, float]): `rmse` and `ndcg` (or `ndcg@k`).
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    predictions = np.asarray(predictions, dtype=np.float64).reshape(-1)
+    labels = np.asarray(labels, dtype=np.float64).reshape(-1)
+
+    # Same gain as `tfr.keras.metrics.NDCGMetric`: 2^label - 1.
+    gains = np.power(2.0, labels) - 1.0
+    predicted_rank = _within_group_rank(groups, np.lexsort((-predictions, groups)))
+    ideal_rank = _within_group_rank(groups, np.lexsort((-labels, groups)))
+
+    cutoff = np.inf if k is None else k
+    n_groups = groups.max() + 1
+    dcg = np.bincount(groups, weights=np.where(predicted_rank < cutoff, gains / np.log2(predicted_rank + 2), 0.0), minlength=n_groups)
+    idcg = np.bincount(groups, weights=np.where(ideal_rank < cutoff, gains / np.log2(ideal_rank + 2), 0.0), minlength=n_groups)
+    valid = idcg > 0
+
+    return {
+        "rmse": float(np.sqrt(np.mean((predictions - labels) ** 2))),
+        "ndcg" if k is None else f"ndcg@{k}": float(np.mean(dcg[valid] / idcg[valid])) if valid.any() else 0.0,
+    }
@@ -0,0 +1,189 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from typing import Any, Dict, List, Mapping, Optional, Text
+
+# Third-party
+from src.features import MOVIE_SCHEMA, USER_SCHEMA
+
+# Bumped whenever the on-disk layout of a feature store changes.
+FORMAT_VERSION: int = 1
+
+
+def tf_dtypes(schema: Mapping[Text, Any]) -> Dict[Text, tf.DType]:
+    """Helper function for mapping a feature schema (`src/features.py`) to TensorFlow dtypes."""
+    return {name: tf.string if dtype is str else tf.as_dtype(dtype) for name, dtype in schema.items()}
+
+
+# Typed feature specs of the preprocessed MovieLens tables, from the serving
+# schema. Every feature is stored in the smallest TFRecord type that holds it
+# and cast back on read.
+USER_FEATURES: Dict[Text, tf.DType]  = tf_dtypes(USER_SCHEMA)
+MOVIE_FEATURES: Dict[Text, tf.DType] = tf_dtypes(MOVIE_SCHEMA)
+
+RATING_FEATURES: Dict[Text, tf.DType] = {
+    'user_id':                  tf.string,
+    'movie_id':                 tf.string,
+    'timestamp':                tf.int64,
+    'user_rating':              tf.float32,
+    **{name: dtype for name, dtype in USER_FEATURES.items() if name != 'user_id'},
+    **{name: dtype for name, dtype in MOVIE_FEATURES.items() if name != 'movie_id'},
+}
+
+
+def _storage_dtype(dtype: tf.DType) -> tf.DType:
+    """Helper function for mapping a feature dtype to its TFRecord storage type."""
+    if dtype == tf.string:
+        return tf.string
+    if dtype.is_integer or dtype.is_bool:
+        return tf.int64
+    return tf.float32
+
+
+def _block_example(block: Dict[Text, np.ndarray], spec: Dict[Text, tf.DType]) -> bytes:
+    """Helper function for serializing a block of rows into a single `tf.train.Example`."""
+    features = {}
+    for name, dtype in spec.items():
+        values = block[name]
+        storage = _storage_dtype(dtype)
+        if storage == tf.string:
+            feature = tf.train.Feature(bytes_list = tf.train.BytesList(
+                value = [v if isinstance(v, bytes) else str(v).encode('utf-8') for v in values]
+            ))
+        elif storage == tf.int64:
+            feature = tf.train.Feature(int64_list = tf.train.Int64List(value = values.astype(np.int64)))
+        else:
+            feature = tf.train.Feature(float_list = tf.train.FloatList(value = values.astype(np.float32)))
+        features[name] = feature
+    return tf.train.Example(features = tf.train.Features(feature = features)).SerializeToString()
+
+
+def write_feature_store(
+    frame: pd.DataFrame,
+    path: Text,
+    spec: Dict[Text, tf.DType],
+    num_shards: int = 8,
+    block_size: int = 1_024,
+    compression: Text = 'GZIP',
+) -> Dict:
+    """
+        Write a DataFrame as a typed, compressed and sharded TFRecord feature store.
+
+        Each record holds a block of `block_size` rows with one value list per
+        feature, so reading parses whole blocks at once instead of single rows.
+        Rows keep their order: shard `i` holds the `i`-th contiguous slice.
+
+        Parameters:
+            - frame (pd.DataFrame): Rows to write; must contain every feature of `spec`.
+            - path (str): Store directory.
+            - spec (Dict[str, tf.DType]): Feature names and dtypes.
+            - num_shards (int): Number of TFRecord files. Defaults to 8.
+            - block_size (int): Rows per record. Defaults to 1024.
+            - compression (str): TFRecord compression, "GZIP", "ZLIB" or "". Defaults to "GZIP".
+
+        Returns:
+            - (Dict): The manifest written alongside the shards.
+    """
+    missing = [name for name in spec if name not in frame.columns]
+    if missing:
+        raise ValueError(f"Features missing from the frame: {missing}")
+
+    os.makedirs(path, exist_ok=True)
+    columns = {name: frame[name].to_numpy() for name in spec}
+    options = tf.io.TFRecordOptions(compression_type = compression)
+
+    shards: List[Text] = []
+    for shard, rows in enumerate(np.array_split(np.arange(len(frame)), max(1, num_shards))):
+        filename = f'shard-{shard:05d}-of-{num_shards:05d}.tfrecord'
+        with tf.io.TFRecordWriter(os.path.join(path, filename), options) as writer:
+            for start in range(0, len(rows), block_size):
+                index = rows[start:start + block_size]
+                writer.write(_block_example({name: values[index] for name, values in columns.items()}, spec))
+        shards.append(filename)
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'rows': int(len(frame)),
+        'block_size': block_size,
+        'compression': compression,
+        'features': {name: dtype.name for name, dtype in spec.items()},
+        'shards': shards,
+    }
+    with open(os.path.join(path, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    return manifest
+
+
+def load_feature_store(
+    path: Text,
+    features: Optional[List[Text]] = None,
+    batch_size: Optional[int] = None,
+    shuffle_shards: bool = False,
+    cache: Optional[Text] = None,
+    num_parallel_reads: int = 4,
+    seed: Optional[int] = None,
+) -> tf.data.Dataset:
+    """
+        Read a feature store written with `write_feature_store`.
+
+        Shards are read with a parallel interleave, blocks are decoded in
+        parallel with `parse_single_example` and unbatched into rows, and the
+        pipeline is prefetched. The row order is deterministic (blocks of the
+        shards round-robin) unless `shuffle_shards` is set.
+
+        Parameters:
+            - path (str): Store directory.
+            - features (List[str]): Features to decode. Defaults to `None` (all of them).
+            - batch_size (int): Batch the rows. Defaults to `None` (one row per element).
+            - shuffle_shards (bool): Visit the shards in a random order. Defaults to False.
+            - cache (str): Cache the decoded rows in this file, or in memory when "". Defaults to `None`.
+            - num_parallel_reads (int): Shards read concurrently; part of the row order,
+                so keep it fixed across runs. Defaults to 4.
+            - seed (int): Seed of the shard shuffle. Defaults to `None`.
+
+        Returns:
+            - (tf.data.Dataset): Dataset of feature dicts with the dtypes of the spec.
+    """
+    with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest['format_version'] != FORMAT_VERSION:
+        raise ValueError(
+            f"Feature store {path} has format version {manifest['format_version']}, "
+            f"expected {FORMAT_VERSION}."
+        )
+
+    spec = {name: tf.as_dtype(dtype) for name, dtype in manifest['features'].items()}
+    if features is not None:
+        spec = {name: spec[name] for name in features}
+
+    parse_spec = {
+        name: tf.io.FixedLenSequenceFeature([], _storage_dtype(dtype), allow_missing = True)
+        for name, dtype in spec.items()
+    }
+
+    def decode(record: tf.Tensor) -> Dict[Text, tf.Tensor]:
+        block = tf.io.parse_single_example(record, parse_spec)
+        return {name: tf.cast(block[name], dtype) for name, dtype in spec.items()}
+
+    files = tf.data.Dataset.from_tensor_slices([os.path.join(path, shard) for shard in manifest['shards']])
+    if shuffle_shards:
+        files = files.shuffle(len(manifest['shards']), seed = seed)
+
+    dataset = files.interleave(
+        lambda filename: tf.data.TFRecordDataset(filename, compression_type = manifest['compression']),
+        cycle_length = num_parallel_reads,
+        num_parallel_calls = tf.data.AUTOTUNE,
+        # Keep the row order reproducible, positional hash splits rely on it.
+        deterministic = True,
+    )
+    dataset = dataset.map(decode, num_parallel_calls = tf.data.AUTOTUNE).unbatch()
+
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    if batch_size is not None:
+        dataset = dataset.batch(batch_size)
+
+    return dataset.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,139 @@
+import numpy as np
+from typing import List, Optional, Sequence
+
+
+class QuantileSketch:
+
+    def __init__(
+        self,
+        k: int = 2048,
+        seed: Optional[int] = None,
+    ) -> 'QuantileSketch':
+        """
+            Mergeable streaming quantile sketch (KLL).
+
+            Items are kept in levels; an item at level `h` stands for `2^h` input
+            values. When a level overflows it is sorted and every other item is
+            promoted to the next level, so memory stays `O(k)` while the rank
+            error stays around `1/k` regardless of how many values were seen.
+            Sketches built on different shards can be combined with `merge`.
+
+            Parameters:
+                - k (int): Size of the largest level; controls accuracy. Defaults to 2048.
+                - seed (int): Seed of the compaction coin flips. Defaults to `None`.
+        """
+        self.k     = k
+        self.count = 0
+        self.min   = float("inf")
+        self.max   = float("-inf")
+
+        self._levels: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self._random_state = np.random.default_rng(seed)
+
+
+    def _capacity(self, level: int) -> int:
+        # Lower levels get geometrically smaller buffers (factor 2/3).
+        depth = len(self._levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self._levels):
+            if len(self._levels[level]) > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0, dtype=np.float64))
+
+                items = np.sort(self._levels[level])
+                # An odd item out stays at its level to keep the weights exact.
+                keep, items = items[len(items) - len(items) % 2:], items[:len(items) - len(items) % 2]
+                promoted = items[self._random_state.integers(2)::2]
+
+                self._levels[level] = keep
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+
+                # Adding a level shrinks the capacity of all lower ones.
+                level = 0
+                continue
+            level += 1
+
+
+    def update(self, values: np.ndarray) -> None:
+        """
+            Add a batch of values to the sketch.
+
+            Parameters:
+                - values (np.ndarray): Numeric values; NaNs are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compress()
+
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """
+            Fold a sketch built on another shard into this one.
+
+            Parameters:
+                - other (QuantileSketch): Sketch to merge.
+        """
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0, dtype=np.float64))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+
+    def quantiles(self, ranks: Sequence[float]) -> np.ndarray:
+        """
+            Estimate the values at the given ranks.
+
+            Parameters:
+                - ranks (Sequence[float]): Ranks in [0, 1].
+
+            Returns:
+                - (np.ndarray): Estimated quantiles, the exact min and max at ranks 0 and 1.
+        """
+        if self.count == 0:
+            raise ValueError("Cannot compute quantiles of an empty sketch.")
+
+        items = np.concatenate(self._levels)
+        weights = np.concatenate(
+            [np.full(len(level_items), 2.0 ** level) for level, level_items in enumerate(self._levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+
+        ranks = np.clip(np.asarray(ranks, dtype=np.float64), 0.0, 1.0)
+        positions = np.searchsorted(cumulative, ranks * cumulative[-1], side="left")
+        values = items[np.minimum(positions, len(items) - 1)]
+
+        values[ranks <= 0.0] = self.min
+        values[ranks >= 1.0] = self.max
+        return values
+
+
+    def boundaries(self, n_buckets: int) -> np.ndarray:
+        """
+            Equal-frequency bucket boundaries.
+
+            Parameters:
+                - n_buckets (int): Desired number of buckets.
+
+            Returns:
+                - (np.ndarray): Strictly increasing inner boundaries; fewer than
+                    `n_buckets - 1` when heavy values make some quantiles coincide.
+        """
+        return np.unique(self.quantiles(np.linspace(0.0, 1.0, n_buckets + 1)[1:-1]))
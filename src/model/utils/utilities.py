@@ -1,53 +1,214 @@
 import math
-import collections
 import numpy as np
 import pandas as pd
 import tensorflow as tf
 import matplotlib.pyplot as plt
-from typing import List, Tuple, Optional, Dict, Text
+from typing import List, Tuple, Optional, Dict, Text, Iterator, Union
 
 plt.style.use('seaborn-v0_8')
 
 
+# Resolution of the hash-based split: examples are hashed into this many buckets.
+_SPLIT_BUCKETS: int = 1_000_000
+
+
+def _key_string(element: Dict[Text, tf.Tensor], features: List[Text]) -> tf.Tensor:
+    """Helper function for joining the key features of an element into one string."""
+    parts = [
+        element[name] if element[name].dtype == tf.string else tf.strings.as_string(element[name])
+        for name in features
+    ]
+    return tf.strings.reduce_join(tf.stack(parts), separator = "\x1f")
+
+
+def _in_train_bucket(key: tf.Tensor, train_size: float, random_state: Optional[int]) -> tf.Tensor:
+    """Helper function for the deterministic hash-based assignment of a key."""
+    salted = tf.strings.join([str(random_state or 0), key], separator = ":")
+    bucket = tf.strings.to_hash_bucket_fast(salted, _SPLIT_BUCKETS)
+    return bucket < int(round(train_size * _SPLIT_BUCKETS))
+
+
+def _user_cutoffs(
+    dataset: tf.data.Dataset,
+    user_feature: Text,
+    time_feature: Text,
+    leave_last_n: int,
+    batch_size: int = 65_536,
+) -> tf.lookup.StaticHashTable:
+    """Helper function for finding the timestamp of every user's n-th latest example.
+
+    Only the user and timestamp columns are read, in large batches.
+    """
+    columns = _to_columns(
+        dataset.map(lambda x: {user_feature: x[user_feature], time_feature: x[time_feature]}),
+        batch_size = batch_size,
+    )
+    users, timestamps = columns[user_feature], columns[time_feature].astype(np.int64)
+    if not len(users):
+        raise ValueError("Cannot split an empty dataset by leave_last.")
+
+    # Sort by user, latest first, and take the n-th row of every group
+    # (or its last row when the user has fewer examples).
+    order = np.lexsort((-timestamps, users))
+    unique, starts, counts = np.unique(users[order], return_index=True, return_counts=True)
+    cutoffs = timestamps[order][starts + np.minimum(counts, leave_last_n) - 1]
+
+    return tf.lookup.StaticHashTable(
+        tf.lookup.KeyValueTensorInitializer(
+            keys = tf.constant(unique),
+            values = tf.constant(cutoffs, dtype = tf.int64),
+        ),
+        # Unknown users never reach the test set.
+        default_value = tf.int64.max,
+    )
+
+
 def train_test_split(
     dataset: tf.data.Dataset,
-    train_size: float,
-    buffer_size: int = tf.data.UNKNOWN_CARDINALITY,
+    train_size: float = 0.8,
+    by: Text = "example",
+    key: Optional[List[Text]] = None,
+    user_feature: Text = "user_id",
+    time_feature: Text = "timestamp",
+    cutoff: Optional[int] = None,
+    leave_last_n: Optional[int] = None,
     random_state: int = None,
 ) -> Tuple[tf.data.Dataset, tf.data.Dataset]:
     """
         Split a dataset into train and test sets.
 
+        The split is a deterministic streaming filter: every element is
+        assigned on its own, so the dataset is never counted, shuffled or
+        materialized and may have unknown cardinality. Both sets read the
+        same source lazily and can be consumed in parallel.
+
         Parameters:
-            - dataset (tf.data.Dataset): The dataset to be split.
-            - train_size (float): The proportion of the dataset to include in the train split.
-            - buffer_size (int): The number of elements from which to sample the buffer.
-            - random_state (int): The random seed used to create the distribution.
+            - dataset (tf.data.Dataset): The dataset to be split, with one feature dict per element.
+            - train_size (float): The proportion of examples (or users) to include in the train split.
+                Used by "example" and "user". Defaults to 0.8.
+            - by (str): Splitting strategy:
+                - "example": hash every example; by its `key` features, or by its position when no key is given.
+                - "user": hash `user_feature`, so all examples of a user land in the same split.
+                - "time": examples with `time_feature` before `cutoff` are trained on, the rest are tested.
+                - "leave_last": the `leave_last_n` latest examples of every user are tested.
+                Defaults to "example".
+            - key (List[str]): Features identifying an example for "example". Defaults to `None`.
+            - user_feature (str): User feature for "user" and "leave_last". Defaults to "user_id".
+            - time_feature (str): Timestamp feature for "time" and "leave_last". Defaults to "timestamp".
+            - cutoff (int): First timestamp of the test set for "time". Defaults to `None`.
+            - leave_last_n (int): Latest examples per user held out by "leave_last". Defaults to `None`.
+            - random_state (int): Salt of the hash, so different seeds give different splits.
 
         Returns:
             - Tuple(tf.data.Dataset, tf.data.Dataset): The train and test datasets.
     """
-    # Shuffle the elements of the dataset randomly.
-    dataset_shuffled = dataset.shuffle(
-        # The new dataset will be sampled from a buffer window of first `buffer_size`
-        # elements of the dataset
-        buffer_size = buffer_size,
-        # The random seed used to create the distribution.
-        seed = random_state,
-        # Controls whether the shuffle order should be different for each epoch.
-        # Can lead to data leakage (Use with causation).
-        reshuffle_each_iteration = False
-    )
+    if by == "example" and key is None:
+        # Without key features the position in the (deterministically
+        # ordered) dataset identifies the example.
+        def position_in_train(index: tf.Tensor, element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+            return _in_train_bucket(tf.strings.as_string(index), train_size, random_state)
+
+        indexed = dataset.enumerate()
+        train_dataset = indexed.filter(position_in_train).map(lambda index, element: element)
+        test_dataset = indexed.filter(
+            lambda index, element: tf.logical_not(position_in_train(index, element))
+        ).map(lambda index, element: element)
+
+        return train_dataset, test_dataset
 
-    # Split dataset randomly
-    trainset_size: int = train_size * dataset.__len__().numpy()
+    if by == "example":
+        def in_train(element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+            return _in_train_bucket(_key_string(element, key), train_size, random_state)
 
-    train_dataset = dataset_shuffled.take(trainset_size)
-    test_dataset = dataset_shuffled.skip(trainset_size)
+    elif by == "user":
+        def in_train(element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+            return _in_train_bucket(_key_string(element, [user_feature]), train_size, random_state)
+
+    elif by == "time":
+        if cutoff is None:
+            raise ValueError("`cutoff` is required when splitting by time.")
+
+        def in_train(element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+            return tf.cast(element[time_feature], tf.int64) < cutoff
+
+    elif by == "leave_last":
+        if not leave_last_n or leave_last_n < 1:
+            raise ValueError("`leave_last_n` must be a positive integer when splitting by leave_last.")
+        # Examples tied with a user's cutoff timestamp are all held out.
+        cutoffs = _user_cutoffs(dataset, user_feature, time_feature, leave_last_n)
+
+        def in_train(element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+            return tf.cast(element[time_feature], tf.int64) < cutoffs.lookup(element[user_feature])
+
+    else:
+        raise ValueError(f"Unknown split strategy '{by}'. Use 'example', 'user', 'time' or 'leave_last'.")
+
+    train_dataset = dataset.filter(in_train)
+    test_dataset = dataset.filter(lambda element: tf.logical_not(in_train(element)))
 
     return train_dataset, test_dataset
 
 
+def since_watermark(
+    dataset: tf.data.Dataset,
+    watermark: int,
+    replay_fraction: float = 0.0,
+    key: Optional[List[Text]] = None,
+    time_feature: Text = "timestamp",
+    random_state: int = None,
+) -> tf.data.Dataset:
+    """
+        Examples newer than a watermark, plus a replayed sample of the older
+        ones, for incremental training. A streaming filter, like `train_test_split`.
+
+        Parameters:
+            - dataset (tf.data.Dataset): The dataset, with one feature dict per element.
+            - watermark (int): Latest `time_feature` value already trained on.
+            - replay_fraction (float): Share of the older examples kept, so that the
+                model does not drift towards the latest ones only. Defaults to 0.0.
+            - key (List[str]): Features identifying an example, hashed to sample the
+                replay. Defaults to `None` (every feature but `time_feature`).
+            - time_feature (str): Timestamp feature. Defaults to "timestamp".
+            - random_state (int): Salt of the replay hash. Defaults to `None`.
+
+        Returns:
+            - (tf.data.Dataset): The filtered dataset.
+    """
+    def keep(element: Dict[Text, tf.Tensor]) -> tf.Tensor:
+        is_new = tf.cast(element[time_feature], tf.int64) > watermark
+        if replay_fraction <= 0.0:
+            return is_new
+        features = key or [name for name in element if name != time_feature]
+        # Salted with the watermark: every refresh replays a different sample.
+        replayed = _in_train_bucket(_key_string(element, features), replay_fraction, (random_state or 0) + watermark)
+        return tf.logical_or(is_new, replayed)
+
+    return dataset.filter(keep)
+
+
+def latest_timestamp(
+    dataset: tf.data.Dataset,
+    time_feature: Text = "timestamp",
+    initial: int = 0,
+    batch_size: int = 65_536,
+) -> int:
+    """
+        Largest value of a timestamp feature, e.g. the watermark of the ratings
+        a model was trained on. Only that column is read, in large batches.
+
+        Parameters:
+            - dataset (tf.data.Dataset): The dataset, with one feature dict per element.
+            - time_feature (str): Timestamp feature. Defaults to "timestamp".
+            - initial (int): Returned when the dataset is empty or older. Defaults to 0.
+            - batch_size (int): Rows read per batch. Defaults to 65536.
+
+        Returns:
+            - (int): The latest timestamp.
+    """
+    timestamps = dataset.map(lambda element: tf.cast(element[time_feature], tf.int64)).batch(batch_size)
+    return int(timestamps.reduce(tf.constant(initial, tf.int64), lambda latest, batch: tf.maximum(latest, tf.reduce_max(batch))))
+
+
 def plot_history(
     history: tf.keras.callbacks.History,
     figsize: Tuple[int, int] = (20, 7),
@@ -90,40 +251,67 @@ def plot_history(
     plt.show()
 
 
-def _create_feature_dict(features: List[Text]) -> Dict[Text, List[tf.Tensor]]:
-    """Helper function for creating an empty feature dict for defaultdict."""
-    return {key: [] for key in features}
+def _to_columns(
+    rating_dataset: Union[tf.data.Dataset, pd.DataFrame],
+    batch_size: int = 65_536,
+) -> Dict[Text, np.ndarray]:
+    """Helper function for reading a dataset into one NumPy array per feature."""
+    if isinstance(rating_dataset, pd.DataFrame):
+        return {name: rating_dataset[name].to_numpy() for name in rating_dataset.columns}
+
+    # Pull large batches instead of single elements, so that the
+    # per-element Python overhead is paid once per batch.
+    batches = list(rating_dataset.batch(batch_size).as_numpy_iterator())
+    if not batches:
+        # Empty dataset: typed, zero-length columns from the element spec.
+        return {
+            name: np.empty((0, *spec.shape), dtype = spec.dtype.as_numpy_dtype)
+            for name, spec in rating_dataset.element_spec.items()
+        }
+    return {
+        name: np.concatenate([batch[name] for batch in batches])
+        for name in batches[0].keys()
+    }
+
 
+def _tensor_dtype(values: np.ndarray) -> tf.DType:
+    """Helper function for mapping a NumPy column to its TensorFlow dtype."""
+    if values.dtype.kind in ("O", "S", "U"):
+        return tf.string
+    return tf.as_dtype(values.dtype)
 
-def _sample_list(
-    feature_lists: Dict[Text, List[tf.Tensor]],
+
+def _sample_list_indices(
+    user_ids: np.ndarray,
+    num_list_per_user: int,
     num_examples_per_list: int,
-    random_state: Optional[np.random.RandomState] = None,
-) -> Tuple[tf.Tensor, tf.Tensor]:
-    """Function for sampling a list example from given feature lists."""
-    if random_state is None:
-        random_state = np.random.RandomState()
-
-    sampled_indices = random_state.choice(
-        range(len(feature_lists["user_rating"])),
-        size=num_examples_per_list,
-        replace=False,
-    )
+    seed: Optional[int] = None,
+) -> Iterator[np.ndarray]:
+    """Function for sampling list indices for all users at once.
 
-    sampled_features = {}
-    for name, values in feature_lists.items():
-        sampled_features[name] = [
-            values[idx] for idx in sampled_indices
-        ]
+    Yields one `[num_users, num_examples_per_list]` array of row indices per
+    list round, so only one round is materialized at a time.
+    """
+    random_state = np.random.default_rng(seed)
 
-    return {
-        name: tf.stack(values, 0)
-        for name, values in sampled_features.items()
-    }
+    _, codes, counts = np.unique(user_ids, return_inverse=True, return_counts=True)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    # Drop the users who don't have enough ratings.
+    eligible_starts = starts[counts >= num_examples_per_list]
+    positions = eligible_starts[:, None] + np.arange(num_examples_per_list)
+
+    for _ in range(num_list_per_user):
+        # Sorting by `user code + U(0, 1)` keeps every user's rows contiguous
+        # (at the same offsets as a plain sort by user) while shuffling them
+        # within the user, so the first `num_examples_per_list` rows of every
+        # group are a sample without replacement.
+        order = np.argsort(codes + random_state.random(len(codes)))
+        yield order[positions]
 
 
 def sample_listwise(
-    rating_dataset: tf.data.Dataset,
+    rating_dataset: Union[tf.data.Dataset, pd.DataFrame],
     num_list_per_user: int = 10,
     num_examples_per_list: int = 10,
     seed: Optional[int] = None,
@@ -132,8 +320,9 @@ def sample_listwise(
 
     Args:
         rating_dataset:
-        The MovieLens ratings dataset loaded from TFDS. Feature must be  provided
-        in the dataset. The dataset must contain the "user_rating" feature.
+        The MovieLens ratings dataset loaded from TFDS, or a DataFrame with the
+        same columns. The dataset must contain the "user_id" and "user_rating"
+        features.
         num_list_per_user:
         An integer representing the number of lists that should be sampled for
         each user in the training dataset.
@@ -141,7 +330,8 @@ def sample_listwise(
         An integer representing the number of movies to be sampled for each list
         from the list of movies rated by the user.
         seed:
-        An integer for creating `np.random.RandomState`.
+        An integer for creating `np.random.Generator`. Iterating the returned
+        dataset again yields the same lists.
 
     Returns:
         A tf.data.Dataset containing list examples.
@@ -152,33 +342,27 @@ def sample_listwise(
         It represents the list of candidate movie ids. "user_rating" maps to 
         a tensor of shape [sum(num_example_per_list)] with dtype tf.float32. 
         It represents the rating of each movie in the candidate list.
-    """
-    random_state = np.random.RandomState(seed)
-
-    features = rating_dataset.take(1).get_single_element().keys()
-    example_lists_by_user = collections.defaultdict(lambda: _create_feature_dict(features))
 
-    for example in rating_dataset:
-        user_id = example.get('user_id').numpy()
-        for key, value in example.items():
-            example_lists_by_user[user_id][key].append(value.numpy())
-
-    tensor_slices = {key: [] for key in features}
-
-    for user_id, feature_lists in example_lists_by_user.items():
-        for _ in range(num_list_per_user):
-
-            # Drop the user if they don't have enough ratings.
-            if len(feature_lists["user_rating"]) < num_examples_per_list:
-                continue
-
-            sampled_features = _sample_list(
-                feature_lists,
-                num_examples_per_list,
-                random_state=random_state,
-            )
-
-            for feature, samples in sampled_features.items():
-                tensor_slices[feature].append(samples)
+        Lists are produced round by round (one list for every user, then the
+        next one), so shuffle the result before batching.
+    """
+    columns = _to_columns(rating_dataset)
+
+    def generator() -> Iterator[Dict[Text, np.ndarray]]:
+        for indices in _sample_list_indices(
+            columns["user_id"],
+            num_list_per_user,
+            num_examples_per_list,
+            seed,
+        ):
+            yield {name: values[indices] for name, values in columns.items()}
+
+    output_signature = {
+        name: tf.TensorSpec(shape=(None, num_examples_per_list), dtype=_tensor_dtype(values))
+        for name, values in columns.items()
+    }
 
-    return tf.data.Dataset.from_tensor_slices(tensor_slices)
+    return tf.data.Dataset.from_generator(
+        generator,
+        output_signature = output_signature,
+    ).unbatch()
@@ -0,0 +1,472 @@
+import os
+import json
+import hashlib
+import numpy as np
+import tensorflow as tf
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Third-party
+from src.model.utils.quantiles import QuantileSketch
+
+# Bumped whenever the on-disk layout of a vocabulary artifact changes.
+FORMAT_VERSION: int = 3
+
+# Punctuation stripped by `TextVectorization`'s default "lower_and_strip_punctuation".
+STRIP_REGEX: str = r'[!"#$%&()\*\+,-\./:;<=>?@\[\\\]^_`{|}~\']'
+
+# Pending (keys, counts) pairs are merged once they hold this many entries, and
+# at least as many as the merged pair, so that every merge at least doubles the
+# entries it has to read and large vocabularies are not re-merged every batch.
+_MERGE_THRESHOLD: int = 1_000_000
+
+# Number of evenly spaced ranks at which the quantile function of timestamp
+# and numeric features is stored; enough for up to this many buckets.
+QUANTILE_RESOLUTION: int = 1_000
+
+
+def _merge_counts(
+    chunks: List[Tuple[np.ndarray, np.ndarray]],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Merge several (unique keys, counts) pairs into one.
+
+        Parameters:
+            - chunks (List[Tuple[np.ndarray, np.ndarray]]): Pairs of keys and their counts.
+
+        Returns:
+            - (Tuple[np.ndarray, np.ndarray]): Sorted unique keys and their summed counts.
+    """
+    keys = np.concatenate([k for k, _ in chunks])
+    counts = np.concatenate([c for _, c in chunks])
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse.reshape(-1), weights=counts, minlength=len(unique)).astype(np.int64)
+
+
+@tf.keras.utils.register_keras_serializable(package="movie_recommender")
+def standardize(inputs: tf.Tensor) -> tf.Tensor:
+    """
+        `TextVectorization`'s default standardization, with Unicode instead of
+        ASCII-only lowercasing, so that e.g. "Amélie" and "AMÉLIE" share a token.
+        Text embeddings pass it as `standardize` and `_tokenize` applies it.
+
+        Parameters:
+            - inputs (tf.Tensor): UTF-8 strings.
+
+        Returns:
+            - (tf.Tensor): Lowercased strings without punctuation.
+    """
+    return tf.strings.regex_replace(tf.strings.lower(inputs, encoding="utf-8"), STRIP_REGEX, "")
+
+
+def _tokenize(values: np.ndarray) -> np.ndarray:
+    """
+        Split a batch of texts into tokens the way `TextVectorization` does.
+
+        Parameters:
+            - values (np.ndarray): Batch of byte strings.
+
+        Returns:
+            - (np.ndarray): All tokens of the batch.
+    """
+    if len(values) == 0:
+        return np.array([], dtype=object)
+    texts = [v if isinstance(v, bytes) else str(v).encode("utf-8") for v in values]
+    return np.array(b" ".join(standardize(tf.constant(texts)).numpy()).split(), dtype=object)
+
+
+def source_fingerprint(paths: Iterable[str]) -> str:
+    """
+        Fingerprint of the files vocabularies are built from: their paths,
+        sizes and modification times, so that rewriting them is noticed
+        without reading them.
+
+        Parameters:
+            - paths (Iterable[str]): Files or directories, e.g. feature stores or parquet files.
+
+        Returns:
+            - (str): The fingerprint.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        files = [path] if not os.path.isdir(path) else sorted(
+            os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+        )
+        for file in files:
+            stat = os.stat(file)
+            digest.update(f"{os.path.relpath(file, path)}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+        digest.update(f"{os.path.abspath(path)}|".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _to_storable(values: np.ndarray) -> np.ndarray:
+    """Convert object arrays into fixed-width arrays that `np.savez` can store without pickling."""
+    if values.dtype.kind != "O":
+        return values
+    if len(values) and isinstance(values[0], bytes):
+        return values.astype(bytes)
+    return values.astype(str)
+
+
+class Vocabularies:
+
+    def __init__(
+        self,
+        vocabularies: Dict[str, np.ndarray],
+        statistics: Dict[str, Dict[str, Any]],
+        config: Dict[str, Any],
+        source: Optional[str] = None,
+    ) -> 'Vocabularies':
+        """
+            Vocabularies and statistics of the features an `Embedding` model embeds.
+
+            Parameters:
+                - vocabularies (Dict[str, np.ndarray]): Vocabulary of each categorical and text feature.
+                - statistics (Dict[str, Dict[str, Any]]): Statistics of each timestamp and numeric
+                    feature: `min`, `max`, `count` and `quantiles` at `QUANTILE_RESOLUTION + 1` evenly
+                    spaced ranks.
+                - config (Dict[str, Any]): Features and thresholds the vocabularies were built with.
+                - source (str): `source_fingerprint` of the data they were built from. Defaults to `None`.
+        """
+        self.vocabularies = vocabularies
+        self.statistics   = statistics
+        self.config       = config
+        self.source       = source
+
+
+    def __getitem__(self, feature: str) -> np.ndarray:
+        return self.vocabularies[feature]
+
+
+    def __contains__(self, feature: str) -> bool:
+        return feature in self.vocabularies or feature in self.statistics
+
+
+    def boundaries(self, feature: str, n_buckets: int) -> np.ndarray:
+        """
+            Equal-frequency bucket boundaries of a timestamp or numeric feature.
+
+            Parameters:
+                - feature (str): Feature name.
+                - n_buckets (int): Desired number of buckets, at most `QUANTILE_RESOLUTION`.
+
+            Returns:
+                - (np.ndarray): Strictly increasing inner boundaries; fewer than
+                    `n_buckets - 1` when heavy values make some quantiles coincide.
+        """
+        quantiles = np.asarray(self.statistics[feature]["quantiles"], dtype=np.float64)
+        grid = np.linspace(0.0, 1.0, len(quantiles))
+        ranks = np.linspace(0.0, 1.0, n_buckets + 1)[1:-1]
+        return np.unique(np.interp(ranks, grid, quantiles))
+
+
+    @property
+    def fingerprint(self) -> str:
+        """
+            Content hash of the vocabularies, used to version the artifact.
+        """
+        digest = hashlib.sha1(json.dumps(self.config, sort_keys=True).encode("utf-8"))
+        for feature in sorted(self.vocabularies):
+            digest.update(feature.encode("utf-8"))
+            digest.update(_to_storable(self.vocabularies[feature]).tobytes())
+        digest.update(json.dumps(self.statistics, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+
+    def save(self, path: str) -> None:
+        """
+            Save the vocabularies as a versioned artifact directory.
+
+            Parameters:
+                - path (str): Artifact directory.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.savez_compressed(
+            os.path.join(path, "vocabularies.npz"),
+            **{feature: _to_storable(values) for feature, values in self.vocabularies.items()},
+        )
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "fingerprint": self.fingerprint,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "config": self.config,
+            "source": self.source,
+            "sizes": {feature: int(len(values)) for feature, values in self.vocabularies.items()},
+            "statistics": self.statistics,
+        }
+        with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+
+    @classmethod
+    def load(cls, path: str) -> 'Vocabularies':
+        """
+            Load vocabularies saved with `save`.
+
+            Parameters:
+                - path (str): Artifact directory.
+
+            Returns:
+                - (Vocabularies): The loaded vocabularies.
+        """
+        with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Vocabulary artifact {path} has format version {manifest['format_version']}, "
+                f"expected {FORMAT_VERSION}."
+            )
+
+        with np.load(os.path.join(path, "vocabularies.npz"), allow_pickle=False) as arrays:
+            vocabularies = {feature: arrays[feature] for feature in arrays.files}
+
+        return cls(vocabularies, manifest["statistics"], manifest["config"], manifest.get("source"))
+
+
+    @classmethod
+    def build(
+        cls,
+        dataset: tf.data.Dataset,
+        str_features: List[str] = [],
+        int_features: List[str] = [],
+        text_features: List[str] = [],
+        timestamp_features: List[str] = [],
+        numeric_features: List[str] = [],
+        min_frequency: int = 1,
+        max_tokens: Optional[int] = None,
+    ) -> 'Vocabularies':
+        """
+            Build the vocabularies of all features in a single pass over the dataset.
+
+            Parameters:
+                - dataset (tf.data.Dataset): Batched dataset of feature dicts.
+                - str_features (List[str]): String features. Defaults to [].
+                - int_features (List[str]): Integer features. Defaults to [].
+                - text_features (List[str]): Textual features. Defaults to [].
+                - timestamp_features (List[str]): Timestamp features. Defaults to [].
+                - numeric_features (List[str]): Numeric features. Defaults to [].
+                - min_frequency (int): Values seen fewer times are left out-of-vocabulary. Defaults to 1.
+                - max_tokens (int): Keep at most this many of the most frequent values per feature. Defaults to `None`.
+
+            Returns:
+                - (Vocabularies): The vocabularies.
+        """
+        builder = VocabularyBuilder(
+            str_features       = str_features,
+            int_features       = int_features,
+            text_features      = text_features,
+            timestamp_features = timestamp_features,
+            numeric_features   = numeric_features,
+            min_frequency      = min_frequency,
+            max_tokens         = max_tokens,
+        )
+        builder.update_from(dataset.as_numpy_iterator())
+        return builder.finalize()
+
+
+    @classmethod
+    def load_or_build(
+        cls,
+        path: str,
+        dataset: tf.data.Dataset,
+        sources: Iterable[str] = (),
+        **kwargs: Any,
+    ) -> 'Vocabularies':
+        """
+            Load the artifact at `path` if it was built with the same configuration
+            from the same source files, otherwise build it from `dataset` and save it there.
+
+            Parameters:
+                - path (str): Artifact directory.
+                - dataset (tf.data.Dataset): Batched dataset of feature dicts.
+                - sources (Iterable[str]): Files or directories `dataset` is read from, e.g. its
+                    feature store; the artifact is rebuilt once they change. Defaults to ().
+                - kwargs: Arguments of `build`.
+
+            Returns:
+                - (Vocabularies): The vocabularies.
+        """
+        expected = VocabularyBuilder(**kwargs).config
+        source = source_fingerprint(sources)
+        if os.path.isfile(os.path.join(path, "manifest.json")):
+            try:
+                vocabularies = cls.load(path)
+                if vocabularies.config == expected and vocabularies.source == source:
+                    return vocabularies
+            except ValueError:
+                pass
+
+        vocabularies = cls.build(dataset, **kwargs)
+        vocabularies.source = source
+        vocabularies.save(path)
+        return vocabularies
+
+
+    def extend(self, dataset: tf.data.Dataset) -> 'Vocabularies':
+        """
+            Vocabularies grown with the values of `dataset` they do not hold yet,
+            appended after the existing ones so that known values keep their
+            index (see `Embedding.extend_vocabulary`). Statistics, hence bucket
+            boundaries, are kept: trained bucket embeddings would not match new ones.
+
+            Parameters:
+                - dataset (tf.data.Dataset): Batched dataset of feature dicts, e.g. all users.
+
+            Returns:
+                - (Vocabularies): The extended vocabularies.
+        """
+        builder = VocabularyBuilder(**self.config)
+        builder.update_from(dataset.as_numpy_iterator())
+        latest = builder.finalize()
+
+        vocabularies: Dict[str, np.ndarray] = {}
+        for feature, values in self.vocabularies.items():
+            new = latest[feature][~np.isin(latest[feature], values)]
+            vocabularies[feature] = np.concatenate([values, _to_storable(new)]) if len(new) else values
+
+        return Vocabularies(vocabularies, self.statistics, dict(self.config))
+
+
+class VocabularyBuilder:
+
+    def __init__(
+        self,
+        str_features: List[str] = [],
+        int_features: List[str] = [],
+        text_features: List[str] = [],
+        timestamp_features: List[str] = [],
+        numeric_features: List[str] = [],
+        min_frequency: int = 1,
+        max_tokens: Optional[int] = None,
+        sketch_size: int = 2048,
+    ) -> 'VocabularyBuilder':
+        """
+            Streaming accumulator of feature vocabularies. Builders fed with
+            different shards can be combined with `merge`.
+
+            Parameters:
+                - str_features (List[str]): String features. Defaults to [].
+                - int_features (List[str]): Integer features. Defaults to [].
+                - text_features (List[str]): Textual features. Defaults to [].
+                - timestamp_features (List[str]): Timestamp features. Defaults to [].
+                - numeric_features (List[str]): Numeric features. Defaults to [].
+                - min_frequency (int): Values seen fewer times are left out-of-vocabulary. Defaults to 1.
+                - max_tokens (int): Keep at most this many of the most frequent values per feature. Defaults to `None`.
+                - sketch_size (int): Accuracy parameter `k` of the quantile sketches. Defaults to 2048.
+        """
+        self.config: Dict[str, Any] = {
+            "str_features":       list(str_features),
+            "int_features":       list(int_features),
+            "text_features":      list(text_features),
+            "timestamp_features": list(timestamp_features),
+            "numeric_features":   list(numeric_features),
+            "min_frequency":      int(min_frequency),
+            "max_tokens":         max_tokens,
+            "sketch_size":        int(sketch_size),
+        }
+
+        categorical = self.config["str_features"] + self.config["int_features"] + self.config["text_features"]
+        self._chunks: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {f: [] for f in categorical}
+        # Entries of the chunks added since the last merge, and of the merged one.
+        self._pending: Dict[str, int] = {f: 0 for f in categorical}
+        self._merged: Dict[str, int] = {f: 0 for f in categorical}
+        # Timestamp and numeric features are summarized by mergeable
+        # quantile sketches instead of being held in memory.
+        self._sketches: Dict[str, QuantileSketch] = {
+            feature: QuantileSketch(k=sketch_size, seed=i)
+            for i, feature in enumerate(self.config["timestamp_features"] + self.config["numeric_features"])
+        }
+
+
+    def update(self, batch: Dict[str, np.ndarray]) -> None:
+        """
+            Account for one batch of examples.
+
+            Parameters:
+                - batch (Dict[str, np.ndarray]): Batch of feature values.
+        """
+        for feature in self._chunks:
+            values = np.asarray(batch[feature]).reshape(-1)
+            if feature in self.config["text_features"]:
+                values = _tokenize(values)
+            if len(values) == 0:
+                continue
+
+            self._chunks[feature].append(np.unique(values, return_counts=True))
+            self._pending[feature] += len(self._chunks[feature][-1][0])
+            self._merge_pending(feature)
+
+        for feature, sketch in self._sketches.items():
+            sketch.update(batch[feature])
+
+
+    def _merge_pending(self, feature: str) -> None:
+        if self._pending[feature] > max(_MERGE_THRESHOLD, self._merged[feature]):
+            self._chunks[feature] = [_merge_counts(self._chunks[feature])]
+            self._pending[feature] = 0
+            self._merged[feature] = len(self._chunks[feature][0][0])
+
+
+    def update_from(self, batches: Iterable[Dict[str, np.ndarray]]) -> None:
+        """
+            Account for every batch of an iterable, e.g. `dataset.as_numpy_iterator()`.
+        """
+        for batch in batches:
+            self.update(batch)
+
+
+    def merge(self, other: 'VocabularyBuilder') -> None:
+        """
+            Fold the counts of a builder fed with another shard into this one.
+        """
+        if other.config != self.config:
+            raise ValueError("Cannot merge vocabulary builders with different configurations.")
+
+        for feature, chunks in other._chunks.items():
+            self._chunks[feature].extend(chunks)
+            # The other builder's merged chunk is not merged with ours yet.
+            self._pending[feature] += other._pending[feature] + other._merged[feature]
+            self._merge_pending(feature)
+
+        for feature, sketch in other._sketches.items():
+            self._sketches[feature].merge(sketch)
+
+
+    def finalize(self) -> Vocabularies:
+        """
+            Apply the frequency threshold and size cap and return the vocabularies.
+
+            Categorical vocabularies are sorted by value; text vocabularies are
+            sorted by decreasing frequency, as `TextVectorization.adapt` does.
+        """
+        vocabularies: Dict[str, np.ndarray] = {}
+        for feature, chunks in self._chunks.items():
+            if not chunks:
+                raise ValueError(f"No values seen for feature '{feature}'.")
+            keys, counts = _merge_counts(chunks)
+
+            keep = counts >= self.config["min_frequency"]
+            keys, counts = keys[keep], counts[keep]
+
+            # Most frequent first; ties broken by value for determinism.
+            order = np.lexsort((np.arange(len(keys)), -counts))
+            if self.config["max_tokens"] is not None:
+                order = order[:self.config["max_tokens"]]
+
+            if feature in self.config["text_features"]:
+                vocabularies[feature] = np.array([k.decode("utf-8") for k in keys[order]], dtype=str)
+            else:
+                vocabularies[feature] = keys[np.sort(order)]
+
+        statistics: Dict[str, Dict[str, Any]] = {}
+        for feature, sketch in self._sketches.items():
+            if sketch.count == 0:
+                continue
+            statistics[feature] = {
+                "min":       sketch.min,
+                "max":       sketch.max,
+                "count":     sketch.count,
+                "quantiles": sketch.quantiles(np.linspace(0.0, 1.0, QUANTILE_RESOLUTION + 1)).tolist(),
+            }
+
+        return Vocabularies(vocabularies, statistics, dict(self.config))
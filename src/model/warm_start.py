@@ -0,0 +1,128 @@
+import os
+import json
+import shutil
+import tensorflow as tf
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# Third-party
+from src.model.vocabulary import Vocabularies
+
+# Bumped whenever the on-disk layout of a training state changes.
+FORMAT_VERSION: int = 1
+
+STATE_FILE: str     = "state.json"
+WEIGHTS_PREFIX: str = "weights/checkpoint"
+
+
+class TrainingState:
+
+    def __init__(
+        self,
+        vocabularies: Dict[str, Vocabularies],
+        watermark: int,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> 'TrainingState':
+        """
+            What an incremental training run resumes from: the vocabularies the
+            model was built with, its weights and the timestamp of the latest
+            rating it was trained on.
+
+            Parameters:
+                - vocabularies (Dict[str, Vocabularies]): Vocabularies of every embedding model, by name.
+                - watermark (int): Latest rating timestamp trained on.
+                - metadata (Dict[str, Any]): Anything else worth keeping, e.g. the
+                    number of ratings trained on. Defaults to `None`.
+        """
+        self.vocabularies = vocabularies
+        self.watermark    = int(watermark)
+        self.metadata     = dict(metadata or {})
+        self.path: Optional[str] = None
+
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, STATE_FILE))
+
+
+    def save(self, path: str, model: tf.keras.Model) -> None:
+        """
+            Save the state and the weights of `model` as an artifact directory.
+            The previous state is replaced only once the new one is complete.
+
+            Parameters:
+                - path (str): Artifact directory.
+                - model (tf.keras.Model): Trained model.
+        """
+        staging = f"{path.rstrip('/')}.staging"
+        shutil.rmtree(staging, ignore_errors=True)
+
+        model.save_weights(os.path.join(staging, WEIGHTS_PREFIX))
+        for name, vocabularies in self.vocabularies.items():
+            vocabularies.save(os.path.join(staging, "vocabularies", name))
+
+        state = {
+            "format_version": FORMAT_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "watermark": self.watermark,
+            "vocabularies": {name: vocabularies.fingerprint for name, vocabularies in self.vocabularies.items()},
+            "metadata": self.metadata,
+        }
+        with open(os.path.join(staging, STATE_FILE), "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.rename(staging, path)
+        self.path = path
+
+
+    @classmethod
+    def load(cls, path: str) -> 'TrainingState':
+        """
+            Load a state saved with `save`.
+
+            Parameters:
+                - path (str): Artifact directory.
+
+            Returns:
+                - (TrainingState): The loaded state; its weights are read by `restore`.
+        """
+        with open(os.path.join(path, STATE_FILE), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Training state {path} has format version {state['format_version']}, "
+                f"expected {FORMAT_VERSION}."
+            )
+
+        training_state = cls(
+            vocabularies = {
+                name: Vocabularies.load(os.path.join(path, "vocabularies", name))
+                for name in state["vocabularies"]
+            },
+            watermark = state["watermark"],
+            metadata = state["metadata"],
+        )
+        training_state.path = path
+        return training_state
+
+
+    def restore(self, model: tf.keras.Model, inputs: Dict[str, tf.Tensor]) -> None:
+        """
+            Restore the saved weights into a model built with `self.vocabularies`.
+
+            The model is called once on `inputs` so that every weight exists
+            before it is overwritten (`Embedding.extend_vocabulary` copies them).
+            Optimizer slots are not restored: the tables they belong to are
+            about to be replaced.
+
+            Parameters:
+                - model (tf.keras.Model): Freshly built model.
+                - inputs (Dict[str, tf.Tensor]): A batch the model can be called on.
+        """
+        if self.path is None:
+            raise ValueError("Only a loaded training state can be restored.")
+
+        model(inputs)
+        model.load_weights(os.path.join(self.path, WEIGHTS_PREFIX)).expect_partial()
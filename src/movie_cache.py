@@ -0,0 +1,210 @@
+from typing import Any, Dict, Iterable, Optional, Sequence
+import math
+
+import redis
+import pandas as pd
+
+# Movies are stored as one string per key: their fields in this order, joined
+# by the ASCII unit separator. No field names are repeated per movie, unlike
+# JSON, and decoding is a single split.
+FIELDS: Sequence[str] = ("movie_id", "movie_title", "movie_release_year")
+SEPARATOR: str        = "\x1f"
+
+KEY_PREFIX: str = "movie:"
+# Field order the stored movies were encoded with, checked by `check_schema`.
+SCHEMA_KEY: str = "movie:__fields__"
+
+
+def _field(value: Any) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    return str(value)
+
+
+def encode_movie(movie: Dict[str, Any], fields: Sequence[str] = FIELDS) -> str:
+    """
+        Encode a movie positionally. Missing values are stored as "".
+
+        Parameters:
+            - movie (Dict[str, Any]): Movie features.
+            - fields (Sequence[str]): Fields to keep, in storage order. Defaults to `FIELDS`.
+
+        Returns:
+            - (str): The encoded movie.
+    """
+    return SEPARATOR.join(_field(movie.get(name)) for name in fields)
+
+
+def decode_movie(value: bytes, fields: Sequence[str] = FIELDS) -> Dict[str, str]:
+    """
+        Decode a movie encoded with `encode_movie`.
+
+        Parameters:
+            - value (bytes): The stored value.
+            - fields (Sequence[str]): Fields, in storage order. Defaults to `FIELDS`.
+
+        Returns:
+            - (Dict[str, str]): Movie features, as the API's `MovieModel` takes them.
+    """
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    return dict(zip(fields, value.split(SEPARATOR)))
+
+
+class MovieCache:
+
+    def __init__(
+        self,
+        client: Optional[redis.Redis] = None,
+        host: str = "127.0.0.1",
+        port: int = 6379,
+        db: int = 0,
+        max_connections: int = 16,
+        key_prefix: str = KEY_PREFIX,
+        fields: Sequence[str] = FIELDS,
+    ) -> 'MovieCache':
+        """
+            Movie catalog stored in Redis, read and written in bulk.
+
+            Parameters:
+                - client (redis.Redis): Client to use, e.g. a `fakeredis.FakeRedis` in tests.
+                    Defaults to `None` (a client on a pool of `max_connections` connections).
+                - host (str): The Redis host. Defaults to "127.0.0.1".
+                - port (int): The Redis port. Defaults to 6379.
+                - db (int): The Redis database. Defaults to 0.
+                - max_connections (int): Size of the connection pool. Defaults to 16.
+                - key_prefix (str): Prefix of the movie keys. Defaults to `KEY_PREFIX`.
+                - fields (Sequence[str]): Movie fields stored. Defaults to `FIELDS`.
+        """
+        if client is None:
+            client = redis.Redis(
+                connection_pool = redis.ConnectionPool(
+                    host = host,
+                    port = port,
+                    db   = db,
+                    max_connections = max_connections,
+                )
+            )
+
+        self.client     = client
+        self.key_prefix = key_prefix
+        self.fields     = tuple(fields)
+        # Checked on first use rather than here, so that creating a cache
+        # does not need Redis to be reachable.
+        self._schema_checked = False
+
+
+    def ping(self) -> bool:
+        return self.client.ping()
+
+
+    def check_schema(self) -> None:
+        """
+            Raise a `ValueError` if the stored movies were encoded with other fields.
+        """
+        stored = self.client.get(SCHEMA_KEY)
+        if stored is not None:
+            stored = stored.decode("utf-8").split(SEPARATOR)
+            if tuple(stored) != self.fields:
+                raise ValueError(f"Movies were stored with fields {stored}, expected {list(self.fields)}.")
+        self._schema_checked = True
+
+
+    def _ensure_schema(self) -> None:
+        if not self._schema_checked:
+            self.check_schema()
+
+
+    def load(self, movies: pd.DataFrame, chunk_size: int = 5_000) -> int:
+        """
+            Store every movie of a frame, one `MSET` of `chunk_size` movies at a
+            time sent through a non-transactional pipeline.
+
+            Parameters:
+                - movies (pd.DataFrame): Movies, with a column per field; others are ignored.
+                - chunk_size (int): Movies per `MSET`. Defaults to 5000.
+
+            Returns:
+                - (int): Number of movies stored.
+        """
+        # Never mix encodings: movies stored with other fields must be removed first.
+        self._ensure_schema()
+
+        # Encoded column-wise: no per-row Python objects.
+        values = movies[self.fields[0]].map(_field)
+        for name in self.fields[1:]:
+            values = values + SEPARATOR + movies[name].map(_field)
+        keys = self.key_prefix + movies["movie_id"].astype(str)
+
+        pipeline = self.client.pipeline(transaction = False)
+        pipeline.set(SCHEMA_KEY, SEPARATOR.join(self.fields))
+        for start in range(0, len(keys), chunk_size):
+            pipeline.mset(dict(zip(keys.iloc[start:start + chunk_size], values.iloc[start:start + chunk_size])))
+        pipeline.execute()
+
+        return len(keys)
+
+
+    def load_records(self, movies: Iterable[Dict[str, Any]], chunk_size: int = 5_000) -> int:
+        """
+            Store movies given as dictionaries, e.g. the API's `MovieModel`s.
+
+            Parameters:
+                - movies (Iterable[Dict[str, Any]]): Movies.
+                - chunk_size (int): Movies per `MSET`. Defaults to 5000.
+
+            Returns:
+                - (int): Number of movies stored.
+        """
+        return self.load(pd.DataFrame.from_records(list(movies), columns=list(self.fields)), chunk_size)
+
+
+    def get_movies(self, movie_ids: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """
+            Get movies in one round-trip (`MGET`).
+
+            Parameters:
+                - movie_ids (Sequence[str]): Movie ids.
+
+            Returns:
+                - (Dict[str, Dict[str, str]]): Movies found, by id, in the order of `movie_ids`.
+        """
+        if not len(movie_ids):
+            return {}
+        self._ensure_schema()
+
+        values = self.client.mget([f"{self.key_prefix}{movie_id}" for movie_id in movie_ids])
+        return {
+            str(movie_id): decode_movie(value, self.fields)
+            for movie_id, value in zip(movie_ids, values) if value is not None
+        }
+
+
+    def get_movie(self, movie_id: str) -> Optional[Dict[str, str]]:
+        """
+            Get one movie.
+
+            Parameters:
+                - movie_id (str): Movie id.
+
+            Returns:
+                - (Dict[str, str]): The movie, or `None` if it is not stored.
+        """
+        self._ensure_schema()
+        value = self.client.get(f"{self.key_prefix}{movie_id}")
+        return decode_movie(value, self.fields) if value is not None else None
+
+
+    def delete(self, movie_ids: Sequence[str]) -> int:
+        """
+            Remove movies, e.g. when they are retired from the catalog.
+
+            Parameters:
+                - movie_ids (Sequence[str]): Movie ids.
+
+            Returns:
+                - (int): Number of movies removed.
+        """
+        if not len(movie_ids):
+            return 0
+        return self.client.delete(*[f"{self.key_prefix}{movie_id}" for movie_id in movie_ids])
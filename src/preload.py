@@ -0,0 +1,67 @@
+from typing import Iterable, List, Optional
+import os
+import logging
+
+# Read size when loading a file into the page cache.
+CHUNK_SIZE: int = 16 * 1024 * 1024
+
+_logger = logging.getLogger(__name__)
+
+
+def artifact_files(candidates_path: Optional[str], index_path: Optional[str] = None) -> List[str]:
+    """
+        Files the API workers memory-map: every file of the candidate artifact
+        (embeddings, ids, sorted ids, the index of a compacted catalog) and the
+        FAISS index used until the first compaction.
+
+        Parameters:
+            - candidates_path (str): Candidate artifact directory (`src/candidates.py`).
+            - index_path (str): FAISS index. Defaults to `None`.
+
+        Returns:
+            - (List[str]): The existing files.
+    """
+    files: List[str] = []
+    if candidates_path and os.path.isdir(candidates_path):
+        for name in sorted(os.listdir(candidates_path)):
+            if os.path.isfile(os.path.join(candidates_path, name)):
+                files.append(os.path.join(candidates_path, name))
+    if index_path and os.path.isfile(index_path):
+        files.append(index_path)
+    return files
+
+
+def warm_page_cache(paths: Iterable[str], chunk_size: int = CHUNK_SIZE) -> int:
+    """
+        Read files into the page cache once, before the API workers start.
+        Workers then map pages that are already resident and shared between
+        them, instead of each faulting them in from disk on its first requests.
+
+        Parameters:
+            - paths (Iterable[str]): Files to load; missing ones are skipped.
+            - chunk_size (int): Read size. Defaults to `CHUNK_SIZE`.
+
+        Returns:
+            - (int): Number of bytes read.
+    """
+    buffer = bytearray(chunk_size)
+    total = 0
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        try:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            with os.fdopen(fd, "rb", buffering=0, closefd=False) as f:
+                while True:
+                    read = f.readinto(buffer)
+                    if not read:
+                        break
+                    total += read
+        finally:
+            os.close(fd)
+
+    _logger.info("Preloaded %.1f MiB into the page cache.", total / 2 ** 20)
+    return total
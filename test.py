@@ -1,17 +1,17 @@
-import json
-import redis
 import requests
 import pandas as pd
 from typing import List, Dict, Any
 
+from src.movie_cache import MovieCache
+
 
 def create_redis_client(
     host: str,
     port: int,
     db: int
-) -> redis.Redis:
+) -> MovieCache:
     """
-        Create a Redis client.
+        Create a Redis movie client on a connection pool.
 
         Parameters:
             - host (str): The Redis host.
@@ -19,9 +19,9 @@ def create_redis_client(
             - db (int): The Redis database.
 
         Returns:
-            - (redis.Redis): The Redis client.
+            - (MovieCache): The Redis movie client.
     """
-    redis_client = redis.Redis(
+    redis_client = MovieCache(
         host = host,
         port = port,
         db   = db
@@ -31,28 +31,18 @@ def create_redis_client(
 
 
 def initialize_redis_db(
-    redis_client: redis.Redis,
+    redis_client: MovieCache,
     dataset: str,
 ) -> None:
     """
-        Populate redis database with movies.
+        Populate redis database with movies, in pipelined chunks.
 
         Parameters:
-            - redis_client (redis.Redis): Redis client.
+            - redis_client (MovieCache): Redis movie client.
             - dataset (str): The dataset to load movies from.
     """
     movies_df = pd.read_parquet(f'data/raw/{dataset}-movies.parquet')
-
-    for _, row in movies_df.iterrows():
-        movie    = row.to_dict()
-        movie_id = movie.get('movie_id')
-
-        movie.pop('movie_genres')
-
-        redis_client.set(
-            name  = str(movie_id),
-            value = json.dumps(movie)
-        )
+    redis_client.load(movies_df)
 
 
 def retrieval_phase(
@@ -87,47 +77,37 @@ def retrieval_phase(
 
 
 def get_movie(
-    redis_client: redis.Redis,
+    redis_client: MovieCache,
     id: str,
 ) -> Dict[str, Any]:
     """
         Get a movie from Redis by its id.
 
         Parameters:
-            - redis_client (redis.Redis): Redis client.
+            - redis_client (MovieCache): Redis movie client.
             - id (str): Movie id.
 
         Returns:
             - (Dict[str, Any]): Movie data.
     """
-
-    movie = redis_client.get(
-        name = str(id)
-    )
-    return json.loads(movie)
+    return redis_client.get_movie(str(id))
 
 
 def get_movies(
-    redis_client: redis.Redis,
+    redis_client: MovieCache,
     movie_ids: List[str],
 ) -> Dict[str, dict]:
     """
-        Get multiple movies from Redis by their ids.
+        Get multiple movies from Redis by their ids, in one round-trip.
 
         Parameters:
-            - redis_client (redis.Redis): Redis client.
+            - redis_client (MovieCache): Redis movie client.
             - movie_ids (List[str]): List of movie ids.
 
         Returns:
             - (Dict[str, dict]): Dictionary of movie data.
     """
-    movies: Dict[str, dict] = {}
-
-    for movie_id in movie_ids:
-        movie = get_movie(redis_client, movie_id)
-        movies[movie_id] = movie
-
-    return movies
+    return redis_client.get_movies(movie_ids)
 
 
 def ranking_phase(
@@ -168,7 +148,7 @@ if __name__ == '__main__':
     }
 
     # Create a Redis client
-    redis_client: redis.Redis = create_redis_client(
+    redis_client: MovieCache = create_redis_client(
         host = '127.0.0.1',
         port = 6379,
         db   = 1
@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Serving modules import each other by flat name (`from candidates import ...`),
+# model code through the `src` package: make both importable, as the API and
+# the scripts do.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "src")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from admission import (
+    APPROXIMATE,
+    FALLBACK,
+    REDUCE_NPROBE,
+    SKIP_RANKING,
+    AdmissionController,
+    FallbackResults,
+    parse_ladder,
+)
+
+
+def test_parse_ladder():
+    assert parse_ladder("fallback:3, approximate:1") == [(APPROXIMATE, 1.0), (FALLBACK, 3.0)]
+    assert parse_ladder("") == []
+    with pytest.raises(ValueError, match = "Unknown degradation step"):
+        parse_ladder("shed:2")
+
+
+def test_disabled_controller_admits_everything():
+    async def run():
+        controller = AdmissionController(max_concurrency = 0, queue_budget = 0.0)
+        async with controller.admit("retrieve") as steps:
+            return controller.enabled, steps
+
+    assert asyncio.run(run()) == (False, ())
+
+
+def test_steps_follow_pressure():
+    controller = AdmissionController(
+        max_concurrency = 2,
+        queue_budget = 0.1,
+        ladder = "reduce_nprobe:1,skip_ranking:2,fallback:3",
+    )
+    assert controller.steps() == ()
+    controller._in_flight = 1
+    assert controller.steps() == (REDUCE_NPROBE,)
+    controller._queued = 2
+    assert controller.steps() == (REDUCE_NPROBE, SKIP_RANKING)
+    controller._queued = 4
+    assert controller.steps() == (REDUCE_NPROBE, SKIP_RANKING, FALLBACK)
+
+
+def test_admit_holds_a_slot():
+    async def run():
+        controller = AdmissionController(max_concurrency = 1, queue_budget = 1.0, ladder = "")
+        async with controller.admit("retrieve") as steps:
+            held = controller._in_flight
+        return steps, held, controller._in_flight
+
+    assert asyncio.run(run()) == ((), 1, 0)
+
+
+def test_request_over_queue_budget_falls_back():
+    async def run():
+        controller = AdmissionController(max_concurrency = 1, queue_budget = 0.01, ladder = "")
+        async with controller.admit("retrieve"):
+            async with controller.admit("retrieve") as steps:
+                # No slot is held by a request that falls back.
+                assert controller._in_flight == 1
+        async with controller.admit("retrieve") as after:
+            pass
+        return steps, after, controller._queued
+
+    assert asyncio.run(run()) == ((FALLBACK,), (), 0)
+
+
+def test_deadline_caps_queue_budget():
+    async def run():
+        controller = AdmissionController(max_concurrency = 1, queue_budget = 10.0, ladder = "")
+        async with controller.admit("retrieve"):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            async with controller.admit("retrieve", timeout = 0.01) as steps:
+                waited = loop.time() - start
+        return steps, waited
+
+    steps, waited = asyncio.run(run())
+    assert steps == (FALLBACK,)
+    assert waited < 1.0
+
+
+def test_fallback_without_results():
+    assert FallbackResults().get("1", 5) is None
+
+
+def test_fallback_prefers_the_users_last_result():
+    results = FallbackResults(refresh = 1)
+    results.put("1", ["a", "b", "c"])
+    results.put("2", ["c", "d"])
+
+    assert results.get("1", 2) == ["a", "b"]
+    # Padded with the most retrieved movies the user was not served.
+    assert results.get("2", 4) == ["c", "d", "a", "b"]
+    assert results.get("3", 2) == ["c", "a"]
+
+
+def test_fallback_evicts_least_recent_users():
+    results = FallbackResults(max_users = 2, refresh = 1)
+    results.put("1", ["a"])
+    results.put("2", ["b"])
+    results.put("1", ["a"])
+    results.put("3", ["c"])
+
+    assert results.get("2", 1) == ["a"]
+    assert results.get("1", 1) == ["a"]
+    assert results.get("3", 1) == ["c"]
@@ -0,0 +1,209 @@
+import os
+import json
+
+import numpy as np
+import pytest
+
+from candidates import MANIFEST_FILE, Candidates, write_candidates
+from catalog import CatalogIndex, build_ivf_index
+
+faiss = pytest.importorskip("faiss")
+
+DIM: int = 8
+COUNT: int = 400
+
+
+@pytest.fixture
+def artifact(tmp_path) -> dict:
+    """A small candidate artifact and the FAISS index exported with it."""
+    rng = np.random.default_rng(0)
+    ids = np.array([f"m{i}" for i in range(COUNT)])
+    embeddings = rng.normal(size=(COUNT, DIM)).astype(np.float32)
+
+    path = str(tmp_path / "candidates")
+    write_candidates(path, ids, embeddings)
+    index_path = str(tmp_path / "index.ivf")
+    faiss.write_index(build_ivf_index(embeddings), index_path)
+    return {"path": path, "index_path": index_path, "ids": ids, "embeddings": embeddings}
+
+
+def _catalog(artifact: dict, mmap: bool) -> CatalogIndex:
+    # Every inverted list is probed, so that the approximate search is exact
+    # and the heap and memory-mapped indexes must agree.
+    return CatalogIndex(artifact["path"], index_path=artifact["index_path"], nprobe=1_000, mmap=mmap)
+
+
+def _queries(seed: int = 1, count: int = 16) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+
+
+def _assert_same_results(heap: CatalogIndex, mapped: CatalogIndex, k: int = 10) -> None:
+    queries = _queries()
+    for approximate in (True, False):
+        expected = heap.search_ids(queries, k, approximate=approximate)
+        found = mapped.search_ids(queries, k, approximate=approximate)
+        assert [ids.tolist() for ids in found] == [ids.tolist() for ids in expected]
+
+
+def test_rows_maps_ids_to_rows(artifact):
+    candidates = Candidates(artifact["path"])
+    assert candidates.rows(["m5", "unknown", "m0", "m399"]).tolist() == [5, -1, 0, 399]
+    assert candidates.rows([]).tolist() == []
+    assert candidates.take(candidates.rows(["m7", "m3"])).tolist() == ["m7", "m3"]
+
+
+def test_rows_without_sorted_ids(artifact):
+    # Artifacts written before the sorted ids existed.
+    manifest_path = os.path.join(artifact["path"], MANIFEST_FILE)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for key in ("sorted_ids", "id_rows"):
+        os.remove(os.path.join(artifact["path"], manifest.pop(key)))
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    candidates = Candidates(artifact["path"])
+    assert candidates.rows(["m12", "unknown"]).tolist() == [12, -1]
+
+
+def test_heap_and_mmap_search_agree(artifact):
+    heap, mapped = _catalog(artifact, mmap=False), _catalog(artifact, mmap=True)
+    assert not heap.stats()["index_mmap"] and mapped.stats()["index_mmap"]
+    _assert_same_results(heap, mapped)
+
+    rng = np.random.default_rng(2)
+    heap.add_with_ids([f"new{i}" for i in range(20)], rng.normal(size=(20, DIM)))
+    heap.remove_ids([f"m{i}" for i in range(0, COUNT, 7)] + ["new3"])
+    _assert_same_results(heap, mapped)
+
+    assert heap.compact(force=True)
+    _assert_same_results(heap, mapped)
+
+
+def test_exact_search_matches_brute_force(artifact):
+    catalog = _catalog(artifact, mmap=False)
+    queries = _queries()
+    scores = queries @ artifact["embeddings"].T
+    expected = np.argsort(-scores, axis=1, kind="stable")[:, :5]
+    found = catalog.search_ids(queries, 5, approximate=False)
+    assert [ids.tolist() for ids in found] == artifact["ids"][expected].tolist()
+
+
+def test_delta_log_is_replayed_by_other_instances(artifact):
+    writer = _catalog(artifact, mmap=False)
+    writer.add_with_ids(["new"], np.ones((1, DIM)))
+    writer.remove_ids(["m1", "m2", "unknown"])
+
+    for catalog in (_catalog(artifact, mmap=True), CatalogIndex(artifact["path"])):
+        assert len(catalog) == COUNT - 1
+        assert "new" in catalog
+        assert "m1" not in catalog and "m2" not in catalog
+        assert catalog.stats()["delta_records"] == 3
+
+    # An instance created before the updates picks them up on its next search.
+    reader = _catalog(artifact, mmap=True)
+    writer.remove_ids(["new"])
+    found = reader.search_ids(np.ones((1, DIM), dtype=np.float32), 5)[0]
+    assert "new" not in found.tolist()
+    assert len(reader) == COUNT - 2
+
+
+def test_replace_keeps_one_live_row(artifact):
+    catalog = _catalog(artifact, mmap=True)
+    target = np.zeros((1, DIM), dtype=np.float32)
+    target[0, 0] = 100.0
+    rows = catalog.add_with_ids(["m10"], target)
+
+    assert rows == [COUNT]
+    assert len(catalog) == COUNT
+    assert catalog.search_ids(target, 1, approximate=False)[0].tolist() == ["m10"]
+    assert catalog.search_ids(target, 1)[0].tolist() == ["m10"]
+
+    assert catalog.remove_ids(["m10"]) == 1
+    assert "m10" not in catalog
+    assert catalog.remove_ids(["m10"]) == 0
+
+
+def test_add_rejects_invalid_input(artifact):
+    catalog = _catalog(artifact, mmap=False)
+    with pytest.raises(ValueError):
+        catalog.add_with_ids(["a", "a"], np.zeros((2, DIM)))
+    with pytest.raises(ValueError):
+        catalog.add_with_ids(["a"], np.zeros((1, DIM + 1)))
+
+
+def test_compaction_swaps_the_artifact(artifact):
+    catalog = _catalog(artifact, mmap=True)
+    other = _catalog(artifact, mmap=False)
+    assert not catalog.compact()
+
+    catalog.add_with_ids(["new"], np.ones((1, DIM)))
+    catalog.remove_ids([f"m{i}" for i in range(100)])
+    assert catalog.drift > catalog.drift_threshold
+    assert catalog.compact()
+
+    # The compacted artifact holds the live candidates only, with a retrained index.
+    assert catalog.drift == 0
+    assert len(Candidates(artifact["path"])) == COUNT - 100 + 1
+    assert catalog.stats()["rows"] == len(catalog) == COUNT - 100 + 1
+    assert catalog.index.ntotal == len(catalog)
+    assert not [name for name in os.listdir(os.path.dirname(artifact["path"])) if ".compact-" in name or ".retired-" in name]
+
+    # Other workers reload it on their next access.
+    assert other.stats()["rows"] == len(catalog)
+    assert "new" in other and "m0" not in other
+    _assert_same_results(other, catalog)
+
+
+def test_compaction_keeps_the_catalog_marked_modified(artifact):
+    catalog = _catalog(artifact, mmap=False)
+    assert not catalog.modified
+
+    catalog.add_with_ids(["new"], np.ones((1, DIM)))
+    assert catalog.modified
+    assert catalog.compact(force=True)
+    assert catalog.drift == 0
+    assert catalog.modified
+    assert CatalogIndex(artifact["path"]).modified
+
+
+def test_updates_during_compaction_are_carried_over(artifact, monkeypatch):
+    catalog = _catalog(artifact, mmap=False)
+    other = _catalog(artifact, mmap=True)
+    catalog.remove_ids([f"m{i}" for i in range(100)])
+
+    def build(vectors, nlist=None):
+        # Another worker updates the catalog while the index is being trained.
+        other.add_with_ids(["late", "m200"], np.ones((2, DIM)))
+        other.remove_ids(["m300", "late"])
+        other.add_with_ids(["later"], np.full((1, DIM), 2.0))
+        return build_ivf_index(vectors, nlist)
+
+    monkeypatch.setattr("catalog.build_ivf_index", build)
+    assert catalog.compact()
+
+    # The artifact holds the snapshot; the updates are replayed from its new log.
+    assert len(Candidates(artifact["path"])) == COUNT - 100
+    assert catalog.stats()["delta_records"] == 6
+    expected = {f"m{i}" for i in range(100, COUNT) if i != 300} | {"later"}
+    for reader in (catalog, other, CatalogIndex(artifact["path"])):
+        assert len(reader) == len(expected)
+        assert "late" not in reader and "m300" not in reader
+        assert set(reader.take(np.arange(reader.stats()["rows"]))[reader._live].tolist()) == expected
+    _assert_same_results(catalog, other)
+
+
+def test_compaction_gives_up_after_another_one(artifact, monkeypatch):
+    catalog = _catalog(artifact, mmap=False)
+    other = _catalog(artifact, mmap=False)
+    catalog.remove_ids([f"m{i}" for i in range(100)])
+
+    def build(vectors, nlist=None):
+        monkeypatch.setattr("catalog.build_ivf_index", build_ivf_index)
+        assert other.compact()
+        return build_ivf_index(vectors, nlist)
+
+    monkeypatch.setattr("catalog.build_ivf_index", build)
+    assert not catalog.compact()
+    assert catalog.drift == 0 and len(catalog) == COUNT - 100
+    assert not [name for name in os.listdir(os.path.dirname(artifact["path"])) if ".compact-" in name or ".retired-" in name]
@@ -0,0 +1,58 @@
+import math
+import time
+
+import pytest
+
+from deadline import DEADLINE_EXCEEDED, Deadline, DeadlineExceeded
+
+
+def test_no_deadline():
+    deadline = Deadline()
+    assert deadline.remaining() == math.inf
+    assert not deadline.expired
+    deadline.check("ranking")
+
+
+@pytest.mark.parametrize("timeout", [0, -1.0])
+def test_non_positive_timeout_means_no_deadline(timeout):
+    assert Deadline(timeout).remaining() == math.inf
+
+
+def test_remaining_is_relative_to_the_arrival():
+    deadline = Deadline(1.0, start = time.monotonic() - 0.5)
+    assert 0.0 < deadline.remaining() <= 0.5
+    assert not deadline.expired
+
+    assert Deadline(1.0, start = time.monotonic() - 2.0).expired
+
+
+@pytest.mark.parametrize(
+    "value, default, expected",
+    [
+        ("0.25", None, 0.25),
+        (None, 2.0, 2.0),
+        ("soon", 2.0, 2.0),
+        (None, None, math.inf),
+    ],
+)
+def test_from_header(value, default, expected):
+    remaining = Deadline.from_header(value, default = default).remaining()
+    assert remaining == expected or 0.0 < expected - remaining < 0.1
+
+
+def test_cancel_expires_the_deadline():
+    deadline = Deadline(60.0)
+    deadline.cancel()
+    assert deadline.expired
+
+
+def test_check_raises_and_counts():
+    counter = DEADLINE_EXCEEDED.labels(stage = "search")
+    before = counter._value.get()
+
+    deadline = Deadline(1.0, start = time.monotonic() - 2.0)
+    with pytest.raises(DeadlineExceeded) as exc:
+        deadline.check("search")
+
+    assert exc.value.stage == "search"
+    assert counter._value.get() == before + 1
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from src.model.utils.evaluation import blocked_top_k, retrieval_metrics
+
+
+def test_retrieval_metrics_on_a_catalog_smaller_than_k():
+    rng = np.random.default_rng(0)
+    queries = rng.normal(size=(2, 4)).astype(np.float32)
+    candidates = rng.normal(size=(20, 4)).astype(np.float32)
+    top_k = blocked_top_k(queries, candidates, k=50)
+    assert top_k.shape == (2, 20)
+
+    relevant_users = np.array([0, 1])
+    relevant_items = top_k[[0, 1], [0, 15]]
+    metrics = retrieval_metrics(top_k, relevant_users, relevant_items, n_items=20, ks=(10, 50))
+
+    assert metrics["recall@10"] == 0.5
+    # Every candidate is retrieved: a cut-off above the catalog size finds them all.
+    assert metrics["recall@50"] == metrics["hit_rate@50"] == 1.0
+    assert metrics["mrr@50"] == pytest.approx((1.0 + 1.0 / 16) / 2)
+    assert metrics["ndcg@50"] == pytest.approx((1.0 + 1.0 / np.log2(17)) / 2)
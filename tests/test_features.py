@@ -0,0 +1,110 @@
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import MOVIE_SCHEMA, USER_SCHEMA, FeatureEncoder, python_type, request_model
+
+tf = pytest.importorskip("tensorflow")
+
+USER = {
+    "user_id":               "42",
+    "user_gender":           1,
+    "user_zip_code":         "94110",
+    "user_bucketized_age":   25.0,
+    "user_occupation_label": 3,
+}
+
+
+def _signature(**specs) -> types.SimpleNamespace:
+    # Stands in for a concrete function: only its input signature is read.
+    return types.SimpleNamespace(structured_input_signature=((), specs))
+
+
+def test_encode_records():
+    encoder = FeatureEncoder(USER_SCHEMA)
+    features = encoder.encode([USER, dict(USER, user_id="7", user_gender=0)])
+
+    assert list(features) == list(USER_SCHEMA)
+    assert features["user_id"].dtype == object and features["user_id"].tolist() == ["42", "7"]
+    assert features["user_gender"].dtype == np.int32 and features["user_gender"].tolist() == [1, 0]
+    assert features["user_bucketized_age"].dtype == np.float32
+
+
+def test_encode_request_models():
+    UserModel = request_model("UserModel", USER_SCHEMA)
+    features = FeatureEncoder(USER_SCHEMA).encode([UserModel(**USER)])
+    assert features["user_occupation_label"].tolist() == [3]
+
+
+def test_encode_accepts_ints_for_floats():
+    features = FeatureEncoder(USER_SCHEMA).encode([dict(USER, user_bucketized_age=25)])
+    assert features["user_bucketized_age"].dtype == np.float32
+
+
+def test_encode_rejects_floats_for_ints():
+    with pytest.raises(ValueError, match="user_gender"):
+        FeatureEncoder(USER_SCHEMA).encode([dict(USER, user_gender=1.5)])
+
+
+def test_encode_rejects_numbers_for_strings():
+    with pytest.raises(ValueError, match="user_id"):
+        FeatureEncoder(USER_SCHEMA).encode([dict(USER, user_id=42)])
+
+
+def test_encode_reports_missing_features():
+    user = dict(USER)
+    del user["user_zip_code"]
+    with pytest.raises(ValueError, match="user_zip_code"):
+        FeatureEncoder(USER_SCHEMA).encode([user])
+
+
+def test_encode_subset_and_empty_batch():
+    encoder = FeatureEncoder(USER_SCHEMA, names=["user_gender", "user_id", "k"])
+    assert encoder.names == ["user_id", "user_gender"]
+    assert {name: values.tolist() for name, values in encoder.encode([USER]).items()} == {
+        "user_id": ["42"],
+        "user_gender": [1],
+    }
+
+    empty = encoder.encode([])
+    assert {name: (len(values), values.dtype) for name, values in empty.items()} == {
+        "user_id": (0, np.dtype(object)),
+        "user_gender": (0, np.dtype(np.int32)),
+    }
+
+
+def test_encode_frame_formats_ids():
+    movies = pd.DataFrame({"movie_id": [1, 2], "movie_title": ["a", "b"], "movie_release_year": [1995, 2001]})
+    features = FeatureEncoder(MOVIE_SCHEMA).encode_frame(movies)
+    assert features["movie_id"].tolist() == ["1", "2"]
+    assert features["movie_release_year"].tolist() == ["1995", "2001"]
+
+    with pytest.raises(ValueError, match="movie_title"):
+        FeatureEncoder(MOVIE_SCHEMA).encode_frame(movies.drop(columns=["movie_title"]))
+
+
+def test_to_records_inverts_encode():
+    encoder = FeatureEncoder(USER_SCHEMA)
+    assert encoder.to_records(encoder.encode([USER])) == [USER]
+
+
+def test_for_signature():
+    signature = _signature(
+        user_id=tf.TensorSpec([None], tf.string),
+        user_gender=tf.TensorSpec([None], tf.int32),
+        k=tf.TensorSpec([], tf.int32),
+    )
+    encoder = FeatureEncoder.for_signature(USER_SCHEMA, signature)
+    assert encoder.names == ["user_id", "user_gender"]
+
+
+def test_for_signature_rejects_mismatched_dtypes():
+    signature = _signature(user_gender=tf.TensorSpec([None], tf.float32))
+    with pytest.raises(ValueError, match="user_gender"):
+        FeatureEncoder.for_signature(USER_SCHEMA, signature)
+
+
+def test_python_types():
+    assert [python_type(dtype) for dtype in USER_SCHEMA.values()] == [str, int, str, float, int]
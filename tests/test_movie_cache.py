@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from movie_cache import FIELDS, SCHEMA_KEY, SEPARATOR, MovieCache, decode_movie, encode_movie
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def movies() -> pd.DataFrame:
+    return pd.DataFrame({
+        "movie_id":           [1, 2, 3],
+        "movie_title":        ["Toy Story (1995)", "Heat (1995)", "Amélie (2001)"],
+        "movie_release_year": ["1995", None, "2001"],
+        "genres":             ["Animation", "Action", "Comedy"],
+    })
+
+
+def test_encode_decode_round_trip():
+    movie = {"movie_id": "7", "movie_title": "Se7en", "movie_release_year": np.nan}
+    assert decode_movie(encode_movie(movie).encode("utf-8")) == {
+        "movie_id": "7", "movie_title": "Se7en", "movie_release_year": "",
+    }
+
+
+def test_load_get_delete(client, movies):
+    cache = MovieCache(client = client)
+    assert cache.load(movies, chunk_size = 2) == 3
+
+    found = cache.get_movies(["3", "404", "1"])
+    assert list(found) == ["3", "1"]
+    assert found["3"] == {"movie_id": "3", "movie_title": "Amélie (2001)", "movie_release_year": "2001"}
+    assert cache.get_movie("2") == {"movie_id": "2", "movie_title": "Heat (1995)", "movie_release_year": ""}
+    assert cache.get_movies([]) == {}
+
+    assert cache.delete(["1", "404"]) == 1
+    assert cache.get_movie("1") is None
+    assert cache.delete([]) == 0
+
+
+def test_load_records(client):
+    cache = MovieCache(client = client)
+    assert cache.load_records([{"movie_id": "9", "movie_title": "Alien (1979)", "movie_release_year": "1979"}]) == 1
+    assert cache.get_movie("9")["movie_title"] == "Alien (1979)"
+
+
+def test_schema_is_checked_before_first_use(client, movies):
+    MovieCache(client = client).load(movies)
+    assert client.get(SCHEMA_KEY) == SEPARATOR.join(FIELDS).encode("utf-8")
+
+    other = MovieCache(client = client, fields = ("movie_id", "movie_title"))
+    with pytest.raises(ValueError, match = "stored with fields"):
+        other.get_movies(["1"])
+    with pytest.raises(ValueError):
+        other.get_movie("1")
+    with pytest.raises(ValueError):
+        other.load(movies)
+
+
+def test_creating_a_cache_needs_no_connection():
+    # Nothing listens on this port: the schema is only checked on first use.
+    MovieCache(port = 1)
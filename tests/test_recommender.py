@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+tfrs = pytest.importorskip("tensorflow_recommenders")
+
+from src.model.ranking import PointwiseRanking
+from src.model.recommender import RecommenderModel
+from src.model.retrieval import Retrieval
+
+
+class _Tower(tf.keras.Model):
+    # Dense embedding of a single numeric feature.
+    def __init__(self, feature: str):
+        super().__init__()
+        self.feature = feature
+        self.dense = tf.keras.layers.Dense(4)
+
+    def call(self, inputs):
+        return self.dense(inputs[self.feature])
+
+
+def _batch() -> dict:
+    rng = np.random.default_rng(0)
+    return {
+        "user": tf.constant(rng.normal(size=(8, 3)), dtype=tf.float32),
+        "movie": tf.constant(rng.normal(size=(8, 5)), dtype=tf.float32),
+        "user_rating": tf.constant(rng.integers(1, 6, size=(8, 1)), dtype=tf.float32),
+    }
+
+
+def _models(query_tower=None, candidate_tower=None):
+    tf.keras.utils.set_random_seed(0)
+    query_tower = query_tower or _Tower("user")
+    candidate_tower = candidate_tower or _Tower("movie")
+    ranking = PointwiseRanking(query_tower, candidate_tower, tfrs.tasks.Ranking(loss=tf.keras.losses.MeanSquaredError()))
+    retrieval = Retrieval(query_tower, candidate_tower, tfrs.tasks.Retrieval())
+    return query_tower, candidate_tower, ranking, retrieval
+
+
+def _gradients(loss_fn, variables):
+    with tf.GradientTape() as tape:
+        loss = loss_fn()
+    return loss, tape.gradient(loss, variables)
+
+
+def test_shared_pass_matches_separate_losses():
+    batch = _batch()
+    query_tower, candidate_tower, ranking, retrieval = _models()
+    model = RecommenderModel(query_tower, candidate_tower, ranking, retrieval, ranking_weight=0.8, retrieval_weight=0.2)
+    model(batch)
+
+    variables = model.trainable_variables
+    shared_loss, shared = _gradients(lambda: model.compute_loss(batch, training=True), variables)
+    separate_loss, separate = _gradients(
+        lambda: 0.8 * ranking.compute_loss(batch, training=True) + 0.2 * retrieval.compute_loss(batch, training=True),
+        variables,
+    )
+
+    # Both towers and the rating head receive a gradient.
+    assert len(variables) == 10 and all(g is not None for g in shared)
+    np.testing.assert_allclose(shared_loss.numpy(), separate_loss.numpy(), rtol=1e-6)
+    for a, b in zip(shared, separate):
+        np.testing.assert_allclose(a.numpy(), b.numpy(), rtol=1e-5, atol=1e-7)
+
+
+def test_rejects_models_on_other_towers():
+    query_tower, candidate_tower, ranking, _ = _models()
+    _, _, _, retrieval = _models(candidate_tower=_Tower("movie"))
+    with pytest.raises(ValueError, match="retrieval_model"):
+        RecommenderModel(query_tower, candidate_tower, ranking, retrieval)
+
+    _, _, ranking, retrieval = _models(query_tower=_Tower("user"), candidate_tower=candidate_tower)
+    with pytest.raises(ValueError, match="ranking_model"):
+        RecommenderModel(query_tower, candidate_tower, ranking, retrieval)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from src.model import vocabulary
+from src.model.vocabulary import VocabularyBuilder, _tokenize
+
+
+def test_merges_stay_logarithmic(monkeypatch):
+    merges = []
+
+    def counting_merge(chunks):
+        merges.append(sum(len(keys) for keys, _ in chunks))
+        return merge(chunks)
+
+    merge = vocabulary._merge_counts
+    monkeypatch.setattr(vocabulary, "_MERGE_THRESHOLD", 1_000)
+    monkeypatch.setattr(vocabulary, "_merge_counts", counting_merge)
+
+    builder = VocabularyBuilder(int_features=["movie_id"])
+    for batch in range(200):
+        builder.update({"movie_id": np.arange(batch * 100, (batch + 1) * 100)})
+
+    # Each merge at least doubles the merged vocabulary: 20,000 keys take a
+    # handful of merges, not one per batch once past the threshold.
+    assert 0 < len(merges) <= 6
+    assert sum(merges) < 3 * 20_000
+
+    values = builder.finalize()["movie_id"]
+    assert values.tolist() == list(range(20_000))
+
+
+def test_merged_builders_count_every_value():
+    first, second = VocabularyBuilder(str_features=["user_id"]), VocabularyBuilder(str_features=["user_id"])
+    first.update({"user_id": np.array([b"a", b"b", b"a"])})
+    second.update({"user_id": np.array([b"b", b"c"])})
+    first.merge(second)
+    assert first.finalize()["user_id"].tolist() == [b"a", b"b", b"c"]
+
+
+def test_tokenize_lowercases_unicode():
+    tokens = _tokenize(np.array(["AMÉLIE (2001)".encode("utf-8"), b"Toy-Story!"], dtype=object))
+    assert [token.decode("utf-8") for token in tokens] == ["amélie", "2001", "toystory"]